@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图响应构造
+"""
+
+import json
+import base64
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from flask import Response, request
+from werkzeug.datastructures import MIMEAccept
+
+# 每次编码的原始字节数，必须是3的倍数，保证分块编码拼接后与整体编码一致
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def prefers_image(mimetype: str = 'image/png', accept: Optional[MIMEAccept] = None) -> bool:
+    """
+    根据 Accept 头判断客户端是否希望直接接收图片
+
+    Accept 缺省或为 */* 时仍返回JSON，保持原有行为；
+    只有 image/* 或具体图片类型的优先级高于 application/json 时才返回图片。
+
+    Args:
+        mimetype: 图片MIME类型
+        accept: 解析后的 Accept 头，默认取当前 Flask 请求的
+    """
+    if accept is None:
+        accept = request.accept_mimetypes
+    if not accept or accept.best == '*/*':
+        return False
+    return accept.best_match(['application/json', mimetype]) == mimetype
+
+
+def image_response(data: bytes, mimetype: str = 'image/png',
+                   download_name: Optional[str] = None) -> Response:
+    """
+    直接返回图片字节
+
+    字节对象原样作为响应体，不经过 BytesIO 或 base64 复制。
+
+    Args:
+        data: 图片数据
+        mimetype: 图片MIME类型
+        download_name: 指定时以附件形式下载
+    """
+    response = Response(data, mimetype=mimetype)
+    if download_name:
+        response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    return response
+
+
+def _iter_base64(data: bytes, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+    """对数据分块做base64编码，每次只产生一个分块的编码结果"""
+    view = memoryview(data)
+    for offset in range(0, len(view), chunk_size):
+        yield base64.b64encode(view[offset:offset + chunk_size])
+
+
+def base64_json_response(data: bytes, fields: Dict[str, Any], key: str = 'screenshot',
+                         status: int = 200) -> Response:
+    """
+    以流式方式返回包含base64截图的JSON
+
+    先输出其他字段，再逐块输出base64字符串，最后补上结尾，
+    避免把整张图片的base64字符串和整个JSON同时放进内存。
+
+    Args:
+        data: 截图数据
+        fields: JSON中的其他字段
+        key: base64数据所在的字段名
+        status: HTTP状态码
+    """
+    body, length = base64_json_body(data, fields, key)
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Content-Length'] = str(length)
+    return response
+
+
+def base64_json_body(data: bytes, fields: Dict[str, Any], key: str = 'screenshot') -> Tuple[Iterator[bytes], int]:
+    """
+    分块生成包含base64截图的JSON
+
+    Returns:
+        (逐块产生JSON字节的迭代器, 总字节数)
+    """
+    head = json.dumps(fields, ensure_ascii=False)
+    prefix = (head[:-1] + (', ' if fields else '') + json.dumps(key) + ': "').encode('utf-8')
+    suffix = b'"}'
+    encoded_length = 4 * ((len(data) + 2) // 3)
+
+    def generate() -> Iterator[bytes]:
+        yield prefix
+        yield from _iter_base64(data)
+        yield suffix
+
+    return generate(), len(prefix) + encoded_length + len(suffix)
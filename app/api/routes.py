@@ -4,19 +4,35 @@
 API路由定义
 """
 
+import json
 import time
 import base64
 import logging
-from io import BytesIO
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, current_app, g, request, jsonify, send_file
 from flask_restx import Api, Resource, fields, Namespace
 
-from app.core.screenshot_service import ScreenshotService
+from app.api.responses import base64_json_response, image_response, prefers_image
+from app.core.browser_pool import BrowserPoolTimeout
+from app.core.job_queue import JobQueueFull, ScreenshotJob
+from app.core.metrics import MetricsRegistry, PhaseTimer
+from app.core.runtime import ScreenshotRuntime
+from app.core.screenshot_service import ElementNotFound
+from app.core.image_codec import IMAGE_MIMETYPES, make_thumbnails
+from app.utils.validators import (
+    validate_auto_scroll, validate_block_rules, validate_boolean, validate_cache_mode, validate_clip, validate_full_page, validate_image_format,
+    validate_milliseconds, validate_return_format, validate_scale, validate_thumbnail_widths, validate_wait_strategy,
+    validate_wait_time
+)
+from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+# 瓦片接口的路径前缀，tiles 响应中的地址按此拼接（异步服务中没有 Flask 上下文）
+TILES_URL_PREFIX = '/api/v1/screenshot/tiles'
+
 # 创建蓝图
 api_bp = Blueprint('api', __name__)
 
@@ -40,17 +56,290 @@ api.add_namespace(screenshot_ns)
 api.add_namespace(health_ns)
 api.add_namespace(info_ns)
 
-# 创建全局截图服务实例
-screenshot_service = ScreenshotService()
+
+def get_runtime() -> ScreenshotRuntime:
+    """当前应用的截图服务运行时（由 create_app 创建）"""
+    return current_app.extensions['websnap']
+
+
+@api_bp.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@api_bp.after_app_request
+def _record_request_metrics(response: Response) -> Response:
+    """
+    记录请求数和耗时，按路由模板区分接口，避免路径参数产生过多标签
+    
+    本次请求截过图时附带 Server-Timing 头（响应体在头之后发送，不含 serialize 阶段）。
+    """
+    timer: Optional[PhaseTimer] = g.get('render_timer')
+    if timer is not None:
+        response.headers['Server-Timing'] = timer.server_timing()
+    
+    started = g.get('request_started')
+    if started is not None:
+        runtime = get_runtime()
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        runtime.request_count.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+        runtime.request_duration.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+
+def parse_screenshot_options(data: Dict[str, Any],
+                             render_profiles: Optional[Dict[str, Dict[str, Any]]] = None
+                             ) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    从请求数据中提取 take_screenshot 的参数
+    
+    Args:
+        data: 请求JSON
+        render_profiles: 启用的渲染配置档，默认取当前应用运行时的配置档
+        
+    Returns:
+        (截图参数, 错误信息)
+    """
+    if render_profiles is None:
+        render_profiles = get_runtime().profiles
+    profile_name = data.get('profile', Config.DEFAULT_RENDER_PROFILE)
+    if not isinstance(profile_name, str):
+        return {}, "profile 必须是字符串"
+    profile = render_profiles.get(profile_name)
+    if profile is None:
+        return {}, f"未知或未启用的渲染配置档: {profile_name}，可用: {', '.join(render_profiles)}"
+    
+    # 未指定的参数使用配置档的默认值
+    options = {
+        'profile': profile_name,
+        'wait_time': data.get('wait_time', profile['wait_time']),
+        'full_page': data.get('full_page', True),
+        'full_page_mode': data.get('full_page_mode', 'auto'),
+        'max_height': data.get('max_height', Config.MAX_PAGE_HEIGHT),
+        'auto_scroll': data.get('auto_scroll', False),
+        'auto_scroll_budget': data.get('auto_scroll_budget', Config.AUTO_SCROLL_BUDGET),
+        'viewport_width': data.get('viewport_width'),
+        'viewport_height': data.get('viewport_height'),
+        'wait_strategy': data.get('wait_strategy', profile['wait_strategy']),
+        'wait_for_selector': data.get('wait_for_selector'),
+        'wait_for_function': data.get('wait_for_function'),
+        'network_idle_ms': data.get('network_idle_ms', Config.NETWORK_IDLE_MS),
+        'dom_quiet_ms': data.get('dom_quiet_ms', Config.DOM_QUIET_MS),
+        'image_format': data.get('image_format', 'png'),
+        'quality': data.get('quality'),
+        'scale': data.get('scale', 1.0),
+        'max_width': data.get('max_width'),
+        'selector': data.get('selector'),
+        'clip': data.get('clip'),
+        'block': data.get('block', profile['block']),
+        'isolate': data.get('isolate', Config.DEFAULT_ISOLATE)
+    }
+    
+    # png 没有质量参数；jpeg/webp 未指定时使用默认质量，使等价请求得到相同的缓存键
+    if options['image_format'] == 'png':
+        options['quality'] = None
+    elif options['quality'] is None:
+        options['quality'] = Config.DEFAULT_IMAGE_QUALITY
+    
+    checks = [
+        (validate_wait_time, options['wait_time'], Config.MAX_WAIT_TIME),
+        (validate_wait_strategy, options['wait_strategy']),
+        (validate_milliseconds, options['network_idle_ms'], 'network_idle_ms'),
+        (validate_milliseconds, options['dom_quiet_ms'], 'dom_quiet_ms'),
+        (validate_image_format, options['image_format'], options['quality']),
+        (validate_scale, options['scale'], options['max_width']),
+        (validate_full_page, options['full_page_mode'], options['max_height'], Config.MAX_PAGE_HEIGHT),
+        (validate_auto_scroll, options['auto_scroll'], options['auto_scroll_budget']),
+        (validate_clip, options['clip']),
+        (validate_block_rules, options['block']),
+        (validate_boolean, options['isolate'], 'isolate'),
+        (validate_boolean, data.get('debug_timing', False), 'debug_timing'),
+        (validate_thumbnail_widths, get_thumbnail_widths(data)),
+        (validate_cache_mode, data.get('cache', 'default')),
+        (validate_return_format, data.get('format', 'base64'), bool(Config.TILE_STORE_DIR))
+    ]
+    for validator, *args in checks:
+        _, error = validator(*args)
+        if error:
+            return options, error
+    return options, None
+
+
+def get_thumbnail_widths(data: Dict[str, Any]) -> List[int]:
+    """读取缩略图宽度，thumbnail 可以是单个宽度或宽度列表"""
+    value = data.get('thumbnail')
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def capture_screenshot(url: str, options: Dict[str, Any], cache_mode: str = 'default',
+                       debug_timing: bool = False) -> Optional[bytes]:
+    """
+    截图（经过缓存和相同请求合并）
+    
+    Args:
+        url: 要截图的网址
+        options: take_screenshot 的参数
+        cache_mode: default 读写缓存，bypass 不读不写，refresh 跳过读取但写入新结果
+        debug_timing: 是否读取页面的 Navigation Timing，供响应中的 timing 字段使用
+        
+    Returns:
+        截图的字节数据，失败时返回None
+    """
+    runtime = get_runtime()
+    # 计时器保存在请求上下文中，构造响应时继续记录 encode 和 serialize 阶段
+    g.render_timer = runtime.new_timer(debug_timing)
+    return runtime.capture(url, options, cache_mode, g.render_timer)
+
+
+def build_screenshot_response(url: str, screenshot_data: bytes, return_format: str,
+                              options: Dict[str, Any], thumbnails: Optional[List[int]] = None,
+                              debug_timing: bool = False) -> Response:
+    """
+    构造截图响应
+    
+    format 为 file 时以附件返回图片；format 为 tiles 时切成瓦片金字塔，只返回瓦片地址；
+    Accept 头优先 image/* 时直接返回图片字节；
+    否则返回流式编码的base64 JSON，请求了缩略图时一并放在 thumbnails 字段中。
+    生成缩略图计入 encode 阶段；从构造响应到发送完毕计入 serialize 阶段。
+    
+    Args:
+        url: 截图的网址
+        screenshot_data: 截图数据
+        return_format: 返回格式，base64、file 或 tiles
+        options: 截图参数（用到 image_format 和 quality）
+        thumbnails: 缩略图宽度列表，只在JSON响应中返回
+        debug_timing: 是否在JSON响应中附带 timing 字段（各阶段耗时和页面的 Navigation Timing）
+    """
+    image_format = options['image_format']
+    mimetype = IMAGE_MIMETYPES[image_format]
+    timer: Optional[PhaseTimer] = g.get('render_timer')
+    get_runtime().output_bytes.observe(len(screenshot_data), format=image_format)
+    serialize_started = time.perf_counter()
+    
+    if return_format == 'tiles':
+        manifest = get_runtime().build_tiles(screenshot_data, options, timer)
+        serialize_started = time.perf_counter()
+        fields = build_tiles_fields(url, screenshot_data, manifest)
+        if debug_timing and timer is not None:
+            fields['timing'] = timer.to_dict()
+        response = jsonify(fields)
+    elif return_format == 'file':
+        response = image_response(
+            screenshot_data,
+            mimetype=mimetype,
+            download_name=f'screenshot_{int(time.time())}.{image_format}'
+        )
+    elif prefers_image(mimetype):
+        response = image_response(screenshot_data, mimetype=mimetype)
+    else:
+        fields = {
+            'success': True,
+            'url': url,
+            'size': len(screenshot_data),
+            'mimetype': mimetype
+        }
+        if thumbnails:
+            thumbnails_started = time.perf_counter()
+            fields['thumbnails'] = build_thumbnails(screenshot_data, thumbnails, options)
+            if timer is not None:
+                timer.add('encode', time.perf_counter() - thumbnails_started)
+            serialize_started = time.perf_counter()
+        if debug_timing and timer is not None:
+            fields['timing'] = timer.to_dict()
+        response = base64_json_response(screenshot_data, fields)
+    
+    if timer is not None:
+        # base64 是边发送边编码的，响应关闭时才能得到完整的序列化耗时
+        response.call_on_close(lambda: timer.add('serialize', time.perf_counter() - serialize_started))
+    return response
+
+
+def build_tiles_fields(url: str, screenshot_data: bytes, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """tiles 响应的JSON字段：金字塔的尺寸、层级和各类瓦片地址"""
+    base = f"{TILES_URL_PREFIX}/{manifest['id']}"
+    extension = manifest['extension']
+    return {
+        'success': True,
+        'url': url,
+        'size': len(screenshot_data),
+        'mimetype': IMAGE_MIMETYPES[manifest['format']],
+        'tiles': {
+            'id': manifest['id'],
+            'width': manifest['width'],
+            'height': manifest['height'],
+            'tile_size': manifest['tile_size'],
+            'max_level': manifest['max_level'],
+            'max_zoom': manifest['max_zoom'],
+            'count': manifest['tiles'],
+            'manifest_url': base,
+            'dzi_url': f'{base}/image.dzi',
+            'tile_url': f'{base}/image_files/{{level}}/{{col}}_{{row}}.{extension}',
+            'xyz_url': f'{base}/xyz/{{z}}/{{x}}/{{y}}.{extension}'
+        }
+    }
+
+
+def build_thumbnails(screenshot_data: bytes, widths: List[int], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """从一次截图生成缩略图，返回可直接放入JSON的列表"""
+    return [
+        {
+            'width': thumbnail['width'],
+            'height': thumbnail['height'],
+            'size': len(thumbnail['data']),
+            'screenshot': base64.b64encode(thumbnail['data']).decode('utf-8')
+        }
+        for thumbnail in make_thumbnails(
+            screenshot_data, widths, options['image_format'], options['quality']
+        )
+    ]
+
 
 # 定义数据模型
+clip_model = api.model('Clip', {
+    'x': fields.Float(required=True, description='左上角横坐标'),
+    'y': fields.Float(required=True, description='左上角纵坐标'),
+    'width': fields.Float(required=True, description='宽度'),
+    'height': fields.Float(required=True, description='高度')
+})
+
 screenshot_request_model = api.model('ScreenshotRequest', {
     'url': fields.String(required=True, description='要截图的网址', example='https://platform.kangfx.com'),
-    'wait_time': fields.Integer(min=1, max=60, default=3, description='页面加载等待时间（秒）'),
+    'wait_time': fields.Float(min=0, max=60, default=3, description='页面加载等待时间（秒）'),
     'full_page': fields.Boolean(default=True, description='是否截取完整页面'),
-    'format': fields.String(enum=['base64', 'file'], default='base64', description='返回格式'),
+    'full_page_mode': fields.String(enum=['auto', 'single', 'tiled'], default='auto',
+                                    description='完整页面截图方式：auto按高度自动选择，single一次截图，tiled分段滚动截图后拼接（内存占用与页面高度无关）'),
+    'max_height': fields.Integer(min=1, default=50000, description='完整页面截取的最大高度（CSS像素），超出部分截断'),
+    'auto_scroll': fields.Boolean(default=False,
+                                  description='就绪后逐屏滚动页面触发懒加载内容，每步等待新请求完成，最后回到顶部再截图'),
+    'auto_scroll_budget': fields.Float(min=0.1, max=60, default=10, description='自动滚动的时间预算（秒）'),
+    'format': fields.String(enum=['base64', 'file', 'tiles'], default='base64',
+                            description='返回格式：base64、file，或 tiles（切成瓦片金字塔，只返回瓦片地址）'),
     'viewport_width': fields.Integer(min=320, max=4096, default=1920, description='视口宽度（像素）'),
-    'viewport_height': fields.Integer(min=240, max=4096, default=1080, description='视口高度（像素）')
+    'viewport_height': fields.Integer(min=240, max=4096, default=1080, description='视口高度（像素）'),
+    'wait_strategy': fields.String(enum=['auto', 'fixed'], default='auto',
+                                   description='等待策略：auto为自适应就绪检测（wait_time为上限），fixed为固定等待wait_time秒'),
+    'wait_for_selector': fields.String(description='auto模式下等待出现的CSS选择器', example='#chart'),
+    'wait_for_function': fields.String(description='auto模式下等待返回真值的JS表达式', example='window.appReady === true'),
+    'network_idle_ms': fields.Integer(min=0, max=10000, default=500, description='无进行中请求持续多久视为网络空闲（毫秒）'),
+    'dom_quiet_ms': fields.Integer(min=0, max=10000, default=300, description='DOM持续多久无变化视为静默（毫秒）'),
+    'image_format': fields.String(enum=['png', 'jpeg', 'webp'], default='png', description='图片格式'),
+    'quality': fields.Integer(min=1, max=100, default=80, description='jpeg/webp的压缩质量，png忽略'),
+    'scale': fields.Float(min=0.1, max=2, default=1, description='输出缩放比例，浏览器直接按缩放后的尺寸渲染'),
+    'max_width': fields.Integer(min=16, max=4096, description='输出的最大宽度（像素），超出时等比缩小'),
+    'thumbnail': fields.Raw(description='缩略图宽度，单个整数或整数列表，在JSON响应的thumbnails字段中与原图一起返回',
+                            example=[400, 200]),
+    'selector': fields.String(description='只截取匹配该CSS选择器的第一个元素', example='#chart'),
+    'clip': fields.Nested(clip_model, description='只截取该矩形区域（CSS像素，相对文档左上角）'),
+    'profile': fields.String(description='渲染配置档，如 default、fast、desktop-hq、mobile', example='default'),
+    'isolate': fields.Boolean(default=False, description='在独立的浏览器上下文中截图，不共享Cookie、存储和缓存'),
+    'block': fields.List(fields.String, description='拦截规则：image、media、font、stylesheet、trackers 或URL通配符',
+                         example=['trackers', 'font', '*://ads.example.com/*']),
+    'cache': fields.String(enum=['default', 'bypass', 'refresh'], default='default',
+                           description='缓存控制：default读写缓存，bypass不使用缓存，refresh忽略已有缓存并重新截图'),
+    'debug_timing': fields.Boolean(default=False,
+                                   description='在JSON响应中附带 timing 字段：各阶段耗时和页面的 Navigation Timing')
 })
 
 screenshot_response_model = api.model('ScreenshotResponse', {
@@ -65,6 +354,23 @@ error_response_model = api.model('ErrorResponse', {
     'error': fields.String(description='错误信息')
 })
 
+job_response_model = api.model('JobResponse', {
+    'job_id': fields.String(description='任务ID'),
+    'status': fields.String(enum=['queued', 'running', 'succeeded', 'failed'], description='任务状态'),
+    'url': fields.String(description='截图的网址'),
+    'created_at': fields.Float(description='提交时间戳'),
+    'started_at': fields.Float(description='开始执行时间戳'),
+    'finished_at': fields.Float(description='完成时间戳'),
+    'size': fields.Integer(description='截图数据大小（字节）'),
+    'error': fields.String(description='失败原因')
+})
+
+batch_request_model = api.model('BatchScreenshotRequest', {
+    'items': fields.List(fields.Nested(screenshot_request_model), required=True,
+                         description='截图请求列表，每项参数与单次截图相同（format无效，结果统一为base64）'),
+    'concurrency': fields.Integer(min=1, description='本批次最多同时渲染的数量，不超过浏览器池大小')
+})
+
 health_response_model = api.model('HealthResponse', {
     'status': fields.String(description='服务状态'),
     'service': fields.String(description='服务名称'),
@@ -92,16 +398,17 @@ class ScreenshotResource(Resource):
                 }, 400
             
             url = data['url']
-            wait_time = data.get('wait_time', 3)
-            full_page = data.get('full_page', True)
             return_format = data.get('format', 'base64')
-            viewport_width = data.get('viewport_width')
-            viewport_height = data.get('viewport_height')
+            cache_mode = data.get('cache', 'default')
+            options, error = parse_screenshot_options(data)
+            if error:
+                return {
+                    'success': False,
+                    'error': error
+                }, 400
             
             # 截取截图
-            screenshot_data = screenshot_service.take_screenshot(
-                url, wait_time, full_page, viewport_width, viewport_height
-            )
+            screenshot_data = capture_screenshot(url, options, cache_mode, data.get('debug_timing', False))
             
             if screenshot_data is None:
                 return {
@@ -109,24 +416,22 @@ class ScreenshotResource(Resource):
                     'error': '截图失败，请检查网址是否正确'
                 }, 500
             
-            if return_format == 'base64':
-                # 返回base64编码的图片
-                screenshot_base64 = base64.b64encode(screenshot_data).decode('utf-8')
-                return {
-                    'success': True,
-                    'screenshot': screenshot_base64,
-                    'url': url,
-                    'size': len(screenshot_data)
-                }
-            else:
-                # 返回文件
-                return send_file(
-                    BytesIO(screenshot_data),
-                    mimetype='image/png',
-                    as_attachment=True,
-                    download_name=f'screenshot_{int(time.time())}.png'
-                )
+            return build_screenshot_response(
+                url, screenshot_data, return_format, options, get_thumbnail_widths(data),
+                data.get('debug_timing', False)
+            )
                 
+        except ElementNotFound as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }, 404
+        except BrowserPoolTimeout as e:
+            logger.warning(f"浏览器池繁忙: {e}")
+            return {
+                'success': False,
+                'error': '服务繁忙，请稍后重试'
+            }, 503
         except Exception as e:
             logger.error(f"API错误: {e}")
             return {
@@ -135,6 +440,283 @@ class ScreenshotResource(Resource):
             }, 500
 
 
+def _capture_batch_item(runtime: ScreenshotRuntime, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    """执行批量请求中的一项（在批量线程中运行，没有应用上下文），返回对应的NDJSON记录"""
+    if not isinstance(item, dict) or 'url' not in item:
+        return {'index': index, 'success': False, 'error': '缺少必需参数: url'}
+    
+    url = item['url']
+    cache_mode = item.get('cache', 'default')
+    options, error = parse_screenshot_options(item, runtime.profiles)
+    if error:
+        return {'index': index, 'url': url, 'success': False, 'error': error}
+    
+    timer = runtime.new_timer(item.get('debug_timing', False))
+    try:
+        screenshot_data = runtime.capture(url, options, cache_mode, timer)
+    except ElementNotFound as e:
+        return {'index': index, 'url': url, 'success': False, 'error': str(e)}
+    except BrowserPoolTimeout:
+        return {'index': index, 'url': url, 'success': False, 'error': '服务繁忙，请稍后重试'}
+    except Exception as e:
+        logger.error(f"批量截图失败 {url}: {e}")
+        return {'index': index, 'url': url, 'success': False, 'error': f'服务器内部错误: {str(e)}'}
+    
+    if screenshot_data is None:
+        return {'index': index, 'url': url, 'success': False, 'error': '截图失败，请检查网址是否正确'}
+    runtime.output_bytes.observe(len(screenshot_data), format=options['image_format'])
+    with timer.phase('serialize'):
+        encoded = base64.b64encode(screenshot_data).decode('utf-8')
+    result = {
+        'index': index,
+        'url': url,
+        'success': True,
+        'screenshot': encoded,
+        'size': len(screenshot_data),
+        'mimetype': IMAGE_MIMETYPES[options['image_format']]
+    }
+    thumbnails = get_thumbnail_widths(item)
+    if thumbnails:
+        with timer.phase('encode'):
+            result['thumbnails'] = build_thumbnails(screenshot_data, thumbnails, options)
+    if timer.navigation_timing:
+        result['timing'] = timer.to_dict()
+    return result
+
+
+# 批量截图接口
+@screenshot_ns.route('/batch')
+class BatchScreenshotResource(Resource):
+    @screenshot_ns.expect(batch_request_model)
+    def post(self):
+        """
+        批量截图
+        
+        请求分发到浏览器池并发渲染，每完成一项就以NDJSON（每行一个JSON）返回一行，
+        行内的index对应请求中的位置，顺序按完成先后
+        """
+        data = request.get_json()
+        items = data.get('items') if data else None
+        
+        if not isinstance(items, list) or not items:
+            return {
+                'success': False,
+                'error': '缺少必需参数: items'
+            }, 400
+        
+        if len(items) > Config.BATCH_MAX_ITEMS:
+            return {
+                'success': False,
+                'error': f'单次最多提交 {Config.BATCH_MAX_ITEMS} 项'
+            }, 400
+        
+        concurrency = data['concurrency'] if 'concurrency' in data else Config.BROWSER_POOL_SIZE
+        if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+            return {
+                'success': False,
+                'error': 'concurrency 必须是正整数'
+            }, 400
+        concurrency = min(concurrency, Config.BROWSER_POOL_SIZE, len(items))
+        
+        runtime = get_runtime()
+        
+        def generate():
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='screenshot-batch')
+            try:
+                futures = [
+                    executor.submit(_capture_batch_item, runtime, index, item)
+                    for index, item in enumerate(items)
+                ]
+                for future in as_completed(futures):
+                    yield json.dumps(future.result(), ensure_ascii=False) + '\n'
+            finally:
+                # 客户端断开时取消尚未开始的项，不再占用浏览器
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        return Response(generate(), mimetype='application/x-ndjson', headers={
+            # 避免反向代理缓冲，结果逐行到达客户端
+            'X-Accel-Buffering': 'no',
+            'Cache-Control': 'no-cache'
+        })
+
+
+# 异步任务接口
+@screenshot_ns.route('/jobs')
+class ScreenshotJobListResource(Resource):
+    @screenshot_ns.expect(screenshot_request_model)
+    def post(self):
+        """
+        提交异步截图任务
+        
+        立即返回任务ID，队列已满时返回429并带Retry-After头
+        """
+        data = request.get_json()
+        
+        if not data or 'url' not in data:
+            return {
+                'success': False,
+                'error': '缺少必需参数: url'
+            }, 400
+        
+        url = data['url']
+        return_format = data.get('format', 'base64')
+        cache_mode = data.get('cache', 'default')
+        options, error = parse_screenshot_options(data)
+        if error:
+            return {
+                'success': False,
+                'error': error
+            }, 400
+        
+        try:
+            job = get_runtime().jobs.submit(
+                url, options, cache_mode, return_format, get_thumbnail_widths(data), data.get('debug_timing', False)
+            )
+        except JobQueueFull as e:
+            logger.warning(f"拒绝任务: {e}")
+            return {
+                'success': False,
+                'error': '任务队列已满，请稍后重试'
+            }, 429, {'Retry-After': str(e.retry_after)}
+        
+        return {
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': api.url_for(ScreenshotJobResource, job_id=job.id),
+            'result_url': api.url_for(ScreenshotJobResultResource, job_id=job.id)
+        }, 202
+
+
+@screenshot_ns.route('/jobs/<string:job_id>')
+class ScreenshotJobResource(Resource):
+    @screenshot_ns.response(404, '任务不存在或结果已过期', error_response_model)
+    def get(self, job_id):
+        """查询异步任务状态"""
+        job = get_runtime().jobs.get(job_id)
+        if job is None:
+            return {
+                'success': False,
+                'error': '任务不存在或结果已过期'
+            }, 404
+        
+        return screenshot_ns.marshal(job.to_dict(), job_response_model)
+
+
+@screenshot_ns.route('/jobs/<string:job_id>/result')
+class ScreenshotJobResultResource(Resource):
+    def get(self, job_id):
+        """
+        获取异步任务结果
+        
+        任务未完成时返回202和当前状态，selector 没有匹配到元素时返回404，其他失败返回500
+        """
+        job = get_runtime().jobs.get(job_id)
+        if job is None:
+            return {
+                'success': False,
+                'error': '任务不存在或结果已过期'
+            }, 404
+        
+        if not job.finished:
+            return job.to_dict(), 202, {'Retry-After': str(get_runtime().jobs.retry_after())}
+        
+        if job.status == ScreenshotJob.FAILED:
+            return {
+                'success': False,
+                'error': job.error
+            }, 404 if isinstance(job.exception, ElementNotFound) else 500
+        
+        # 每次读取结果都在副本上记录 encode、serialize，多次轮询不会累加到任务的计时器上
+        g.render_timer = job.timer.copy() if job.timer is not None else None
+        return build_screenshot_response(
+            job.url, job.result, job.return_format, job.options, job.thumbnails, job.debug_timing
+        )
+
+
+TILE_NOT_FOUND = ({
+    'success': False,
+    'error': '瓦片不存在或已过期'
+}, 404)
+
+
+def send_tile_file(path: str, mimetype: str) -> Response:
+    """
+    发送瓦片存储中的文件
+    
+    金字塔按内容寻址，生成后不再改变，允许客户端和代理在保留时间内缓存。
+    """
+    response = send_file(path, mimetype=mimetype, max_age=Config.TILE_STORE_TTL, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={Config.TILE_STORE_TTL}, immutable'
+    return response
+
+
+def get_tile_manifest(pyramid_id: str, extension: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """读取金字塔的 manifest，未启用瓦片存储、金字塔不存在或扩展名不符时返回None"""
+    tiles = get_runtime().tiles
+    manifest = tiles.get(pyramid_id) if tiles is not None else None
+    if manifest is None or (extension is not None and extension != manifest['extension']):
+        return None
+    return manifest
+
+
+# 瓦片接口
+@screenshot_ns.route('/tiles/<string:pyramid_id>')
+class TilePyramidResource(Resource):
+    @screenshot_ns.response(404, '瓦片不存在或已过期', error_response_model)
+    def get(self, pyramid_id):
+        """查询瓦片金字塔的尺寸和层级"""
+        manifest = get_tile_manifest(pyramid_id)
+        if manifest is None:
+            return TILE_NOT_FOUND
+        return manifest
+
+
+@screenshot_ns.route('/tiles/<string:pyramid_id>/image.dzi')
+class TilePyramidDziResource(Resource):
+    @screenshot_ns.response(404, '瓦片不存在或已过期', error_response_model)
+    def get(self, pyramid_id):
+        """DeepZoom 描述文件，可直接作为 OpenSeadragon 的 tileSources"""
+        path = get_runtime().tiles.file_path(pyramid_id, 'image.dzi') if get_tile_manifest(pyramid_id) else None
+        if path is None:
+            return TILE_NOT_FOUND
+        return send_tile_file(path, 'application/xml')
+
+
+@screenshot_ns.route('/tiles/<string:pyramid_id>/image_files/<int:level>/<int:col>_<int:row>.<string:extension>')
+class TileResource(Resource):
+    @screenshot_ns.response(404, '瓦片不存在或已过期', error_response_model)
+    def get(self, pyramid_id, level, col, row, extension):
+        """
+        获取 DeepZoom 瓦片
+        
+        第 level 层（0 为1x1像素，max_level 为原图）第 row 行第 col 列的瓦片
+        """
+        manifest = get_tile_manifest(pyramid_id, extension)
+        path = get_runtime().tiles.tile_path(pyramid_id, level, col, row) if manifest else None
+        if path is None:
+            return TILE_NOT_FOUND
+        return send_tile_file(path, IMAGE_MIMETYPES[manifest['format']])
+
+
+@screenshot_ns.route('/tiles/<string:pyramid_id>/xyz/<int:z>/<int:x>/<int:y>.<string:extension>')
+class XyzTileResource(Resource):
+    @screenshot_ns.response(404, '瓦片不存在或已过期', error_response_model)
+    def get(self, pyramid_id, z, x, y, extension):
+        """
+        按 XYZ 编号获取瓦片
+        
+        第0级是整张图能放进一个瓦片的层级，max_zoom 级为原图，瓦片从左上角开始编号
+        """
+        manifest = get_tile_manifest(pyramid_id, extension)
+        path = None
+        if manifest is not None and z <= manifest['max_zoom']:
+            path = get_runtime().tiles.tile_path(pyramid_id, manifest['top_level'] + z, x, y)
+        if path is None:
+            return TILE_NOT_FOUND
+        return send_tile_file(path, IMAGE_MIMETYPES[manifest['format']])
+
+
 # 健康检查接口
 @health_ns.route('/health')
 class HealthResource(Resource):
@@ -148,6 +730,28 @@ class HealthResource(Resource):
         }
 
 
+# 就绪检查接口
+@health_ns.route('/ready')
+class ReadinessResource(Resource):
+    def get(self):
+        """
+        就绪检查接口
+        
+        浏览器池启动并预热完成后返回200，否则返回503；尚未启动时触发启动
+        """
+        runtime = get_runtime()
+        runtime.start()
+        body = {
+            'status': runtime.status,
+            'service': 'websnap',
+            'startup_seconds': runtime.startup_seconds,
+            'timestamp': time.time()
+        }
+        if runtime.error:
+            body['error'] = runtime.error
+        return body, 200 if runtime.ready else 503
+
+
 # API信息接口
 @info_ns.route('/')
 class InfoResource(Resource):
@@ -158,15 +762,44 @@ class InfoResource(Resource):
             'version': '1.0.0',
             'endpoints': {
                 'POST /api/v1/screenshot/screenshot': '截取网页截图',
+                'POST /api/v1/screenshot/batch': '批量截图，结果以NDJSON流式返回',
+                'POST /api/v1/screenshot/jobs': '提交异步截图任务',
+                'GET /api/v1/screenshot/jobs/<job_id>': '查询异步任务状态',
+                'GET /api/v1/screenshot/jobs/<job_id>/result': '获取异步任务结果',
+                'GET /api/v1/screenshot/tiles/<id>': '查询瓦片金字塔信息',
+                'GET /api/v1/screenshot/tiles/<id>/image.dzi': 'DeepZoom 描述文件',
+                'GET /api/v1/screenshot/tiles/<id>/image_files/<level>/<col>_<row>.<ext>': '获取 DeepZoom 瓦片',
+                'GET /api/v1/screenshot/tiles/<id>/xyz/<z>/<x>/<y>.<ext>': '按 XYZ 编号获取瓦片',
                 'GET /api/v1/health/health': '健康检查',
+                'GET /api/v1/health/ready': '就绪检查，浏览器预热完成前返回503',
                 'GET /api/v1/info/': 'API说明',
+                'GET /metrics': 'Prometheus 格式的运行指标',
                 'GET /docs/': 'Swagger API文档'
             },
             'usage': {
                 'url': '要截图的网址（必需）',
-                'wait_time': '等待时间，默认3秒（可选）',
+                'wait_time': '等待时间，默认3秒；auto策略下为最长等待时间（可选）',
+                'wait_strategy': '等待策略，auto或fixed，默认auto（可选）',
+                'wait_for_selector': '等待出现的CSS选择器（可选）',
+                'wait_for_function': '等待返回真值的JS表达式（可选）',
+                'image_format': '图片格式，png、jpeg或webp，默认png（可选）',
+                'quality': 'jpeg/webp的压缩质量1-100，默认80（可选）',
+                'scale': '输出缩放比例0.1-2，默认1（可选）',
+                'max_width': '输出的最大宽度，超出时等比缩小（可选）',
+                'thumbnail': '缩略图宽度，整数或整数列表（可选）',
+                'selector': '只截取匹配的元素，CSS选择器（可选）',
+                'clip': '只截取矩形区域，{x, y, width, height}（可选）',
+                'profile': '渲染配置档，默认default（可选）',
+                'isolate': '是否在独立的浏览器上下文中截图，默认false（可选）',
+                'block': '拦截规则列表，资源类型、trackers或URL通配符（可选）',
+                'cache': '缓存控制，default、bypass或refresh，默认default（可选）',
+                'debug_timing': '是否在JSON响应中附带耗时明细和页面的Navigation Timing，默认false（可选）',
                 'full_page': '是否截取完整页面，默认true（可选）',
-                'format': '返回格式，base64或file，默认base64（可选）',
+                'full_page_mode': '完整页面截图方式，auto、single或tiled，默认auto（可选）',
+                'max_height': '完整页面截取的最大高度（CSS像素），默认50000（可选）',
+                'auto_scroll': '是否在截图前逐屏滚动以触发懒加载内容，默认false（可选）',
+                'auto_scroll_budget': '自动滚动的时间预算（秒），默认10（可选）',
+                'format': '返回格式，base64、file或tiles，默认base64（可选）',
                 'viewport_width': '视口宽度，默认1920（可选）',
                 'viewport_height': '视口高度，默认1080（可选）'
             },
@@ -177,7 +810,8 @@ class InfoResource(Resource):
                 'format': 'base64',
                 'viewport_width': 1920,
                 'viewport_height': 1080
-            }
+            },
+            'profiles': list(get_runtime().profiles)
         }
 
 
@@ -195,16 +829,17 @@ def take_screenshot_legacy():
             }), 400
         
         url = data['url']
-        wait_time = data.get('wait_time', 3)
-        full_page = data.get('full_page', True)
         return_format = data.get('format', 'base64')
-        viewport_width = data.get('viewport_width')
-        viewport_height = data.get('viewport_height')
+        cache_mode = data.get('cache', 'default')
+        options, error = parse_screenshot_options(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
         
         # 截取截图
-        screenshot_data = screenshot_service.take_screenshot(
-            url, wait_time, full_page, viewport_width, viewport_height
-        )
+        screenshot_data = capture_screenshot(url, options, cache_mode, data.get('debug_timing', False))
         
         if screenshot_data is None:
             return jsonify({
@@ -212,24 +847,22 @@ def take_screenshot_legacy():
                 'error': '截图失败，请检查网址是否正确'
             }), 500
         
-        if return_format == 'base64':
-            # 返回base64编码的图片
-            screenshot_base64 = base64.b64encode(screenshot_data).decode('utf-8')
-            return jsonify({
-                'success': True,
-                'screenshot': screenshot_base64,
-                'url': url,
-                'size': len(screenshot_data)
-            })
-        else:
-            # 返回文件
-            return send_file(
-                BytesIO(screenshot_data),
-                mimetype='image/png',
-                as_attachment=True,
-                download_name=f'screenshot_{int(time.time())}.png'
-            )
+        return build_screenshot_response(
+            url, screenshot_data, return_format, options, get_thumbnail_widths(data),
+            data.get('debug_timing', False)
+        )
             
+    except ElementNotFound as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except BrowserPoolTimeout as e:
+        logger.warning(f"浏览器池繁忙: {e}")
+        return jsonify({
+            'success': False,
+            'error': '服务繁忙，请稍后重试'
+        }), 503
     except Exception as e:
         logger.error(f"API错误: {e}")
         return jsonify({
@@ -244,6 +877,18 @@ def health_check_legacy():
     return HealthResource().get()
 
 
+@api_bp.route('/ready', methods=['GET'])
+def readiness_check_legacy():
+    """兼容性就绪检查接口"""
+    return ReadinessResource().get()
+
+
+@api_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 格式的运行指标"""
+    return Response(get_runtime().metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
+
 @api_bp.route('/', methods=['GET'])
 def index_legacy():
     """兼容性首页接口"""
@@ -264,18 +909,19 @@ def test_screenshot():
             }), 400
         
         url = data['url']
-        wait_time = data.get('wait_time', 3)
-        full_page = data.get('full_page', True)
         return_format = data.get('format', 'base64')
-        viewport_width = data.get('viewport_width')
-        viewport_height = data.get('viewport_height')
+        cache_mode = data.get('cache', 'default')
+        options, error = parse_screenshot_options(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
         
         print(f"Taking screenshot of: {url}")
         
         # 截取截图
-        screenshot_data = screenshot_service.take_screenshot(
-            url, wait_time, full_page, viewport_width, viewport_height
-        )
+        screenshot_data = capture_screenshot(url, options, cache_mode, data.get('debug_timing', False))
         
         print(f"Screenshot data size: {len(screenshot_data) if screenshot_data else 'None'}")
         
@@ -285,26 +931,23 @@ def test_screenshot():
                 'error': '截图失败，请检查网址是否正确'
             }), 500
         
-        if return_format == 'base64':
-            # 返回base64编码的图片
-            screenshot_base64 = base64.b64encode(screenshot_data).decode('utf-8')
-            result = {
-                'success': True,
-                'screenshot': screenshot_base64,
-                'url': url,
-                'size': len(screenshot_data)
-            }
-            print(f"Returning result with size: {len(screenshot_data)}")
-            return jsonify(result)
-        else:
-            # 返回文件
-            return send_file(
-                BytesIO(screenshot_data),
-                mimetype='image/png',
-                as_attachment=True,
-                download_name=f'screenshot_{int(time.time())}.png'
-            )
+        print(f"Returning result with size: {len(screenshot_data)}")
+        return build_screenshot_response(
+            url, screenshot_data, return_format, options, get_thumbnail_widths(data),
+            data.get('debug_timing', False)
+        )
             
+    except ElementNotFound as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except BrowserPoolTimeout as e:
+        logger.warning(f"浏览器池繁忙: {e}")
+        return jsonify({
+            'success': False,
+            'error': '服务繁忙，请稍后重试'
+        }), 503
     except Exception as e:
         logger.error(f"API错误: {e}")
         print(f"Exception: {e}")
@@ -10,6 +10,7 @@ from flask import Flask
 from flask_cors import CORS
 
 from app.api.routes import api_bp
+from app.core.runtime import ScreenshotRuntime
 from config.settings import config
 
 
@@ -17,6 +18,9 @@ def create_app(config_name: str = 'default'):
     """
     创建Flask应用实例
     
+    截图服务运行时保存在 app.extensions['websnap'] 中，创建应用时不启动浏览器，
+    由调用方在开始服务前调用 start()（或在第一次截图时按需启动）。
+    
     Args:
         config_name: 配置名称
         
@@ -47,6 +51,11 @@ def create_app(config_name: str = 'default'):
             "methods": ["GET", "POST", "OPTIONS"],
             "allow_headers": config_class.CORS_HEADERS
         },
+        r"/ready": {
+            "origins": config_class.CORS_ORIGINS,
+            "methods": ["GET", "OPTIONS"],
+            "allow_headers": config_class.CORS_HEADERS
+        },
         r"/health": {
             "origins": config_class.CORS_ORIGINS,
             "methods": ["GET", "OPTIONS"],
@@ -59,6 +68,9 @@ def create_app(config_name: str = 'default'):
         }
     })
     
+    # 创建截图服务运行时（不启动浏览器）
+    app.extensions['websnap'] = ScreenshotRuntime(config_class)
+    
     # 注册蓝图
     app.register_blueprint(api_bp)
     
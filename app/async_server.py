@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步服务前端（aiohttp）
+
+截图接口在事件循环中处理：等待浏览器名额、等待相同请求的结果、向慢速客户端发送响应都只是挂起的协程，
+不占用线程；其余接口（异步任务、批量截图、健康检查、Swagger 等）通过 WSGI 桥接交给 Flask 应用，
+行为与 Flask 服务器一致。
+"""
+
+import io
+import sys
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app.api.responses import base64_json_body, prefers_image
+from app.api.routes import build_thumbnails, build_tiles_fields, get_thumbnail_widths, parse_screenshot_options
+from app.core.browser_pool import BrowserPoolTimeout
+from app.core.image_codec import IMAGE_MIMETYPES
+from app.core.metrics import PhaseTimer
+from app.core.screenshot_service import ElementNotFound
+
+logger = logging.getLogger(__name__)
+
+# 在事件循环中原生处理的截图接口，其余路径都交给 Flask
+SCREENSHOT_PATHS = ['/screenshot', '/api/v1/screenshot/screenshot']
+
+# 逐跳响应头由 aiohttp 自己处理，不从 WSGI 响应中转发
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
+
+class AsyncServer:
+    """
+    异步服务前端
+
+    截图请求的并发量只受浏览器数量限制，与线程数无关；WSGI 桥接线程只在执行 Flask 视图时占用，
+    响应分块在单独的流式线程中读取（批量截图的 NDJSON 每一行都要等截图完成），
+    长时间的流式响应不会占满桥接线程，健康检查和指标接口始终有空闲线程处理。
+    向客户端发送数据由事件循环完成。
+    """
+
+    def __init__(self, flask_app):
+        """
+        Args:
+            flask_app: create_app 创建的 Flask 应用，截图服务运行时从中获取
+        """
+        self.flask_app = flask_app
+        self.runtime = flask_app.extensions['websnap']
+        self.config = self.runtime.config
+        self._wsgi_executor = ThreadPoolExecutor(
+            max_workers=self.config.ASYNC_WSGI_THREADS, thread_name_prefix='wsgi'
+        )
+        self._stream_executor = ThreadPoolExecutor(
+            max_workers=self.config.ASYNC_STREAM_THREADS, thread_name_prefix='wsgi-stream'
+        )
+
+        self.app = web.Application(client_max_size=self.config.MAX_CONTENT_LENGTH)
+        for path in SCREENSHOT_PATHS:
+            self.app.router.add_post(path, self.screenshot)
+        self.app.router.add_route('*', '/{path:.*}', self.wsgi)
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+
+    async def _on_startup(self, app: web.Application):
+        self.runtime.start()
+
+    async def _on_cleanup(self, app: web.Application):
+        await asyncio.get_running_loop().run_in_executor(None, self.runtime.close)
+        self._wsgi_executor.shutdown(wait=False)
+        self._stream_executor.shutdown(wait=False)
+
+    def _cors_headers(self, request: web.Request) -> Dict[str, str]:
+        """与 Flask-CORS 的配置保持一致的跨域响应头（预检请求由 Flask 处理）"""
+        origin = request.headers.get('Origin')
+        if not origin:
+            return {}
+        if '*' in self.config.CORS_ORIGINS:
+            return {'Access-Control-Allow-Origin': '*'}
+        if origin in self.config.CORS_ORIGINS:
+            return {'Access-Control-Allow-Origin': origin, 'Vary': 'Origin'}
+        return {}
+
+    def _error(self, request: web.Request, message: str, status: int,
+               timer: Optional[PhaseTimer] = None) -> web.Response:
+        headers = self._cors_headers(request)
+        if timer is not None:
+            headers['Server-Timing'] = timer.server_timing()
+        return web.json_response({'success': False, 'error': message}, status=status, headers=headers)
+
+    async def screenshot(self, request: web.Request) -> web.StreamResponse:
+        """截图接口，请求参数和响应格式与 Flask 版本相同"""
+        started = time.perf_counter()
+        response = await self._screenshot(request)
+        self.runtime.request_count.inc(endpoint=request.path, method=request.method, status=str(response.status))
+        self.runtime.request_duration.observe(time.perf_counter() - started, endpoint=request.path)
+        return response
+
+    async def _screenshot(self, request: web.Request) -> web.StreamResponse:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or 'url' not in data:
+            return self._error(request, '缺少必需参数: url', 400)
+
+        url = data['url']
+        return_format = data.get('format', 'base64')
+        cache_mode = data.get('cache', 'default')
+        debug_timing = data.get('debug_timing', False)
+        options, error = parse_screenshot_options(data, self.runtime.profiles)
+        if error:
+            return self._error(request, error, 400)
+
+        timer = self.runtime.new_timer(debug_timing)
+        try:
+            screenshot_data = await self.runtime.capture_async(url, options, cache_mode, timer)
+        except ElementNotFound as e:
+            return self._error(request, str(e), 404, timer)
+        except BrowserPoolTimeout as e:
+            logger.warning(f"浏览器池繁忙: {e}")
+            return self._error(request, '服务繁忙，请稍后重试', 503, timer)
+        except Exception as e:
+            logger.error(f"API错误: {e}")
+            return self._error(request, f'服务器内部错误: {str(e)}', 500, timer)
+
+        if screenshot_data is None:
+            return self._error(request, '截图失败，请检查网址是否正确', 500, timer)
+
+        return await self._send_screenshot(
+            request, url, screenshot_data, return_format, options,
+            get_thumbnail_widths(data), debug_timing, timer
+        )
+
+    async def _send_screenshot(self, request: web.Request, url: str, screenshot_data: bytes,
+                               return_format: str, options: Dict[str, Any], thumbnails: List[int],
+                               debug_timing: bool, timer: PhaseTimer) -> web.StreamResponse:
+        """发送截图响应，格式规则与 build_screenshot_response 相同"""
+        image_format = options['image_format']
+        mimetype = IMAGE_MIMETYPES[image_format]
+        self.runtime.output_bytes.observe(len(screenshot_data), format=image_format)
+        headers = self._cors_headers(request)
+        accept = parse_accept_header(request.headers.get('Accept'), MIMEAccept)
+
+        if return_format == 'tiles':
+            # 切瓦片需要解码整张图并编码大量瓦片，在线程池中执行
+            manifest = await asyncio.get_running_loop().run_in_executor(
+                None, self.runtime.build_tiles, screenshot_data, options, timer
+            )
+            serialize_started = time.perf_counter()
+            fields = build_tiles_fields(url, screenshot_data, manifest)
+            if debug_timing:
+                fields['timing'] = timer.to_dict()
+            headers['Server-Timing'] = timer.server_timing()
+            response = web.json_response(fields, headers=headers)
+            await response.prepare(request)
+            await response.write_eof()
+        elif return_format == 'file' or prefers_image(mimetype, accept):
+            if return_format == 'file':
+                headers['Content-Disposition'] = f'attachment; filename=screenshot_{int(time.time())}.{image_format}'
+            headers['Server-Timing'] = timer.server_timing()
+            serialize_started = time.perf_counter()
+            response = web.Response(body=screenshot_data, content_type=mimetype, headers=headers)
+            await response.prepare(request)
+            await response.write_eof()
+        else:
+            fields = {
+                'success': True,
+                'url': url,
+                'size': len(screenshot_data),
+                'mimetype': mimetype
+            }
+            if thumbnails:
+                # 缩略图的缩放和编码是CPU密集操作，不放在事件循环中执行
+                with timer.phase('encode'):
+                    fields['thumbnails'] = await asyncio.get_running_loop().run_in_executor(
+                        None, build_thumbnails, screenshot_data, thumbnails, options
+                    )
+            if debug_timing:
+                fields['timing'] = timer.to_dict()
+            headers['Server-Timing'] = timer.server_timing()
+
+            serialize_started = time.perf_counter()
+            body, length = base64_json_body(screenshot_data, fields)
+            response = web.StreamResponse(headers=headers)
+            response.content_type = 'application/json'
+            response.content_length = length
+            await response.prepare(request)
+            for chunk in body:
+                await response.write(chunk)
+            await response.write_eof()
+
+        timer.add('serialize', time.perf_counter() - serialize_started)
+        return response
+
+    async def wsgi(self, request: web.Request) -> web.StreamResponse:
+        """把请求交给 Flask 应用处理，响应分块在流式线程中读取、在事件循环中发送"""
+        loop = asyncio.get_running_loop()
+        environ = self._environ(request, await request.read())
+        status, headers, result, iterator, first = await loop.run_in_executor(
+            self._wsgi_executor, self._call_wsgi, environ
+        )
+
+        code, _, reason = status.partition(' ')
+        response = web.StreamResponse(status=int(code), reason=reason or None)
+        for name, value in headers:
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                response.headers.add(name, value)
+        try:
+            await response.prepare(request)
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    await response.write(chunk)
+                chunk = await loop.run_in_executor(self._stream_executor, next, iterator, None)
+            await response.write_eof()
+        finally:
+            # 触发 Flask 的 call_on_close 回调，客户端中途断开时也会执行
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self._stream_executor, result.close)
+        return response
+
+    def _call_wsgi(self, environ: Dict[str, Any]) -> Tuple[str, List[Tuple[str, str]], Any, Iterator[bytes], Optional[bytes]]:
+        """
+        执行 WSGI 应用，得到状态和响应头
+
+        Flask 在返回前就调用了 start_response，响应体全部留给流式线程读取；
+        生成器形式的 WSGI 应用在取出第一个分块前不会调用 start_response，这时先取出第一个分块。
+        """
+        started: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            started['status'] = status
+            started['headers'] = headers
+
+            def write(data: bytes):
+                raise RuntimeError("WSGI 桥接不支持 write()")
+            return write
+
+        result = self.flask_app(environ, start_response)
+        iterator = iter(result)
+        first = b'' if 'status' in started else next(iterator, None)
+        return started['status'], started['headers'], result, iterator, first
+
+    @staticmethod
+    def _environ(request: web.Request, body: bytes) -> Dict[str, Any]:
+        """按 PEP 3333 构造 WSGI environ"""
+        sockname = request.transport.get_extra_info('sockname') if request.transport is not None else None
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            # PEP 3333 要求路径以 latin-1 解码的原始字节表示
+            'PATH_INFO': request.path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': request.query_string,
+            'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': str(sockname[0]) if sockname else 'localhost',
+            'SERVER_PORT': str(sockname[1]) if sockname else '80',
+            'SERVER_PROTOCOL': f'HTTP/{request.version.major}.{request.version.minor}',
+            'REMOTE_ADDR': request.remote or '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': request.scheme,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in request.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                continue
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+def run_async_server(flask_app, host: str, port: int):
+    """
+    以异步前端运行服务，阻塞直到收到退出信号
+
+    浏览器池在事件循环启动后于后台启动，退出时关闭。
+    """
+    server = AsyncServer(flask_app)
+    web.run_app(server.app, host=host, port=port, access_log=None,
+                print=lambda message: logger.info(message))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求拦截规则
+"""
+
+from typing import Dict, Iterable, List
+
+# 按资源类型拦截时使用的URL通配符（Network.setBlockedURLs 只能按URL匹配，这里按扩展名归类）
+RESOURCE_TYPE_PATTERNS: Dict[str, List[str]] = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+    'media': ['mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'mov', 'm3u8'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'stylesheet': ['css']
+}
+
+# 内置的广告、统计和跟踪脚本域名
+TRACKER_DOMAINS: List[str] = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googletagservices.com',
+    'googlesyndication.com',
+    'googleadservices.com',
+    'doubleclick.net',
+    'adservice.google.com',
+    'connect.facebook.net',
+    'facebook.com/tr',
+    'analytics.twitter.com',
+    'static.ads-twitter.com',
+    'ads.linkedin.com',
+    'snap.licdn.com',
+    'bat.bing.com',
+    'clarity.ms',
+    'hotjar.com',
+    'mouseflow.com',
+    'fullstory.com',
+    'segment.com',
+    'segment.io',
+    'mixpanel.com',
+    'amplitude.com',
+    'heapanalytics.com',
+    'newrelic.com',
+    'nr-data.net',
+    'scorecardresearch.com',
+    'quantserve.com',
+    'taboola.com',
+    'outbrain.com',
+    'criteo.com',
+    'criteo.net',
+    'adnxs.com',
+    'amazon-adsystem.com',
+    'moatads.com',
+    'hm.baidu.com',
+    'cnzz.com',
+    'umeng.com',
+    'growingio.com'
+]
+
+# block 中代表内置跟踪器列表的规则名
+TRACKERS = 'trackers'
+
+
+def _extension_patterns(extensions: Iterable[str]) -> List[str]:
+    patterns = []
+    for extension in extensions:
+        patterns.append(f'*.{extension}')
+        patterns.append(f'*.{extension}?*')
+    return patterns
+
+
+def build_blocked_urls(rules: Iterable[str]) -> List[str]:
+    """
+    把请求中的拦截规则展开为 Network.setBlockedURLs 使用的URL通配符
+
+    Args:
+        rules: 规则列表，每项可以是资源类型（image、media、font、stylesheet）、
+               trackers（内置跟踪器列表）或URL通配符（如 *://ads.example.com/*）
+
+    Returns:
+        去重后的URL通配符列表，顺序与规则顺序一致
+    """
+    patterns: List[str] = []
+    for rule in rules:
+        if rule in RESOURCE_TYPE_PATTERNS:
+            patterns.extend(_extension_patterns(RESOURCE_TYPE_PATTERNS[rule]))
+        elif rule == TRACKERS:
+            patterns.extend(f'*{domain}*' for domain in TRACKER_DOMAINS)
+        else:
+            patterns.append(rule)
+    return list(dict.fromkeys(patterns))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器实例池
+"""
+
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, List, Optional
+
+from app.core.screenshot_service import ScreenshotService
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolTimeout(Exception):
+    """在限定时间内没有可用的浏览器实例"""
+
+
+class BrowserPool:
+    """
+    浏览器实例池
+
+    维护固定数量的 ScreenshotService（每个持有独立的 WebDriver），
+    每次截图独占一个实例，用完归还，避免多个请求线程争用同一个标签页。
+    归还时发现浏览器已卡死或达到回收条件会在后台重启；健康检查线程定期探测空闲实例，
+    重启已退出、无响应或内存超限的浏览器。
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 30,
+                 viewport_width: int = 1920, viewport_height: int = 1080,
+                 health_interval: Optional[float] = None, **service_options):
+        """
+        初始化浏览器池
+
+        Args:
+            size: 浏览器实例数量
+            timeout: 借出实例时的最长等待时间（秒）
+            viewport_width: 默认视口宽度
+            viewport_height: 默认视口高度
+            health_interval: 健康检查间隔（秒），为空时不启动健康检查线程
+            service_options: 传给 ScreenshotService 的其他参数（chrome_options、user_agent、max_pages 等）
+        """
+        if size < 1:
+            raise ValueError("浏览器池大小必须大于0")
+
+        self.size = size
+        self.timeout = timeout
+        self.viewport_width = viewport_width
+        self.viewport_height = viewport_height
+        self._services: List[ScreenshotService] = []
+        self._idle: "queue.Queue[ScreenshotService]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stopped = threading.Event()
+        self.restarts = 0
+
+        # 并行启动浏览器，启动时间约等于单个浏览器的启动时间
+        with ThreadPoolExecutor(max_workers=size, thread_name_prefix='browser-launch') as executor:
+            futures = [
+                executor.submit(ScreenshotService, viewport_width, viewport_height, **service_options)
+                for _ in range(size)
+            ]
+        errors = []
+        for future in futures:
+            try:
+                service = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            self._services.append(service)
+            self._idle.put(service)
+        if errors:
+            self.close()
+            raise errors[0]
+
+        if health_interval:
+            threading.Thread(
+                target=self._health_loop, args=(health_interval,),
+                name='browser-pool-health', daemon=True
+            ).start()
+
+        logger.info(f"浏览器池初始化完成，实例数: {size}")
+
+    @property
+    def idle_count(self) -> int:
+        """当前空闲实例数"""
+        return self._idle.qsize()
+
+    @property
+    def busy_count(self) -> int:
+        """当前被借出的实例数"""
+        return self.size - self._idle.qsize()
+
+    def warm_up(self, fixture_url: Optional[str] = None):
+        """并行预热所有实例，应在开始接收请求之前调用"""
+        services = [self.checkout() for _ in range(self.size)]
+        try:
+            with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='browser-warmup') as executor:
+                futures = [executor.submit(service.warm_up, fixture_url) for service in services]
+            for future in futures:
+                if future.exception() is not None:
+                    logger.warning(f"浏览器预热失败: {future.exception()}")
+        finally:
+            for service in services:
+                self.checkin(service)
+
+    def checkout(self, timeout: Optional[float] = None) -> ScreenshotService:
+        """
+        借出一个空闲实例
+
+        Args:
+            timeout: 最长等待时间（秒），默认使用池的配置
+
+        Returns:
+            独占使用的截图服务实例
+
+        Raises:
+            BrowserPoolTimeout: 等待超时
+        """
+        if self._closed:
+            raise RuntimeError("浏览器池已关闭")
+
+        wait = self.timeout if timeout is None else timeout
+        try:
+            return self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise BrowserPoolTimeout(f"等待空闲浏览器超时（{wait}秒）")
+
+    def checkin(self, service: ScreenshotService):
+        """
+        归还实例
+
+        Args:
+            service: 之前借出的截图服务实例
+        """
+        if self._closed:
+            service.close()
+            return
+
+        reason = service.recycle_reason()
+        if reason:
+            # 重启需要几秒，放到后台进行，不阻塞当前请求
+            threading.Thread(target=self._restart, args=(service, reason), daemon=True).start()
+            return
+        self._idle.put(service)
+
+    def _restart(self, service: ScreenshotService, reason: str):
+        """重启实例后放回空闲队列；启动失败时也放回，下次归还或健康检查时再试"""
+        logger.warning(f"重启浏览器实例（{reason}）")
+        try:
+            service.restart()
+        except Exception as e:
+            logger.error(f"重启浏览器实例失败: {e}")
+        with self._lock:
+            self.restarts += 1
+        if self._closed:
+            service.close()
+        else:
+            self._idle.put(service)
+
+    def _health_loop(self, interval: float):
+        """定期检查空闲实例，只检查当前空闲的，不影响正在使用的实例"""
+        while not self._stopped.wait(interval):
+            for _ in range(self._idle.qsize()):
+                try:
+                    service = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                reason = service.recycle_reason(deep=True)
+                if reason:
+                    self._restart(service, reason)
+                else:
+                    self._idle.put(service)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[ScreenshotService]:
+        """借出实例的上下文管理器，退出时自动归还"""
+        service = self.checkout(timeout)
+        try:
+            yield service
+        finally:
+            self.checkin(service)
+
+    def take_screenshot(self, *args, **kwargs) -> Optional[bytes]:
+        """
+        在独占的浏览器实例上截图，参数与 ScreenshotService.take_screenshot 相同
+
+        传入 timer 时，等待空闲实例的时间记为 queue_wait 阶段。
+
+        Raises:
+            BrowserPoolTimeout: 没有可用实例
+        """
+        timer = kwargs.get('timer')
+        with timer.phase('queue_wait') if timer is not None else nullcontext():
+            service = self.checkout()
+        try:
+            return service.take_screenshot(*args, **kwargs)
+        finally:
+            self.checkin(service)
+
+    def close(self):
+        """关闭池中所有浏览器实例"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stopped.set()
+
+        for service in self._services:
+            try:
+                service.close()
+            except Exception as e:
+                logger.warning(f"关闭浏览器实例失败: {e}")
+        self._services = []
+        logger.info("浏览器池已关闭")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片编码工具
+"""
+
+import os
+import zlib
+import struct
+import logging
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 支持的输出格式及对应的MIME类型
+IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp'
+}
+
+_PIL_FORMATS = {
+    'png': 'PNG',
+    'jpeg': 'JPEG',
+    'webp': 'WEBP'
+}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    编码线程池
+
+    Pillow 编码时释放GIL，线程数按CPU核数设置即可并行编码，
+    同时限制同一时刻的编码任务数，避免大量请求同时编码把CPU占满。
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix='image-encoder'
+            )
+        return _executor
+
+
+def encode_image(image: Image.Image, image_format: str = 'png', quality: Optional[int] = None) -> bytes:
+    """
+    把 PIL 图片编码为指定格式
+
+    Args:
+        image: PIL图片
+        image_format: png、jpeg 或 webp
+        quality: jpeg/webp 的质量（1-100），png 忽略
+
+    Returns:
+        编码后的字节数据
+    """
+    params = {}
+    if image_format == 'png':
+        params['optimize'] = False
+    else:
+        params['quality'] = quality or 80
+        if image_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+    buffer = BytesIO()
+    image.save(buffer, _PIL_FORMATS[image_format], **params)
+    return buffer.getvalue()
+
+
+def output_scale(width: float, scale: float = 1.0, max_width: Optional[int] = None) -> float:
+    """
+    计算输出缩放比例
+
+    Args:
+        width: 原始宽度
+        scale: 请求的缩放比例
+        max_width: 输出的最大宽度
+
+    Returns:
+        实际使用的缩放比例
+    """
+    if max_width and width * scale > max_width:
+        return max_width / width
+    return scale
+
+
+def resize_image(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    缩放图片
+
+    使用双线性插值并开启 reducing_gap：缩小倍数较大时先按整数倍快速降采样，
+    再做一次插值，速度远快于直接用 LANCZOS，缩略图质量也足够。
+    """
+    if image.size == size:
+        return image
+    return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def _transcode(data: bytes, image_format: str, quality: Optional[int],
+               scale: float, max_width: Optional[int], crop: Optional[Tuple[int, int, int, int]]) -> bytes:
+    with Image.open(BytesIO(data)) as image:
+        if crop is not None:
+            image = image.crop(crop)
+        ratio = output_scale(image.width, scale, max_width)
+        if ratio != 1:
+            size = (max(1, round(image.width * ratio)), max(1, round(image.height * ratio)))
+            return encode_image(resize_image(image, size), image_format, quality)
+        return encode_image(image, image_format, quality)
+
+
+def transcode(data: bytes, image_format: str, quality: Optional[int] = None,
+              scale: float = 1.0, max_width: Optional[int] = None,
+              crop: Optional[Tuple[int, int, int, int]] = None) -> bytes:
+    """
+    在编码线程池中把PNG数据转成目标格式，可同时裁剪和缩放
+
+    Args:
+        data: 原始图片数据（通常为PNG）
+        image_format: 目标格式
+        quality: jpeg/webp 的质量
+        scale: 缩放比例
+        max_width: 输出的最大宽度
+        crop: 裁剪区域 (left, top, right, bottom)，先裁剪再缩放
+
+    Returns:
+        转码后的字节数据
+    """
+    return _get_executor().submit(
+        _transcode, data, image_format, quality, scale, max_width, crop
+    ).result()
+
+
+def _make_thumbnails(data: bytes, widths: List[int], image_format: str,
+                     quality: Optional[int]) -> List[Dict[str, Any]]:
+    thumbnails = []
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        source = image
+        # 超过原图宽度的按原图宽度处理，去重后从大到小生成，
+        # 每个缩略图都从上一个缩小而来，避免每次都处理原图
+        for width in sorted({min(width, image.width) for width in widths}, reverse=True):
+            height = max(1, round(image.height * width / image.width))
+            source = resize_image(source, (width, height))
+            thumbnails.append({
+                'width': width,
+                'height': height,
+                'data': encode_image(source, image_format, quality)
+            })
+    return thumbnails
+
+
+def make_thumbnails(data: bytes, widths: List[int], image_format: str = 'png',
+                    quality: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    从一次截图生成多个宽度的缩略图
+
+    Args:
+        data: 原始截图数据
+        widths: 缩略图宽度列表，超过原图宽度的按原图宽度处理（只生成一次）
+        image_format: 缩略图格式
+        quality: jpeg/webp 的质量
+
+    Returns:
+        按宽度从大到小排列的 {'width', 'height', 'data'} 列表
+    """
+    return _get_executor().submit(_make_thumbnails, data, widths, image_format, quality).result()
+
+
+class PngStripWriter:
+    """
+    按条带逐段写入的PNG编码器
+
+    每写入一段就把像素压缩进 IDAT 数据并释放，内存中只保留当前一段，
+    拼接高度很大的图片时内存占用与总高度无关。只输出8位RGB，每行使用 None 过滤。
+    """
+
+    # 累积到这个大小再写出一个 IDAT 块
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, output: BinaryIO, width: int, height: int, compress_level: int = 6):
+        """
+        Args:
+            output: 写入PNG数据的文件对象
+            width: 图片宽度（像素）
+            height: 图片总高度（像素），写入的行数不足时 close 用白色补齐
+            compress_level: zlib 压缩级别
+        """
+        self.output = output
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+
+        output.write(PNG_SIGNATURE)
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        self.output.write(struct.pack('>I', len(data)))
+        self.output.write(kind)
+        self.output.write(data)
+        self.output.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def _compress(self, data) -> None:
+        self._pending += self._compressor.compress(data)
+        if len(self._pending) >= self.CHUNK_SIZE:
+            self._write_chunk(b'IDAT', bytes(self._pending))
+            self._pending.clear()
+
+    def write(self, image: Image.Image):
+        """
+        追加一段图片，宽度必须与PNG宽度相同，超出总高度的行被丢弃
+
+        Raises:
+            ValueError: 宽度不一致
+        """
+        if image.width != self.width:
+            raise ValueError(f"条带宽度 {image.width} 与图片宽度 {self.width} 不一致")
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        rows = min(image.height, self.height - self.rows_written)
+        stride = self.width * 3
+        pixels = memoryview(image.tobytes())
+        for row in range(rows):
+            self._compress(b'\x00')
+            self._compress(pixels[row * stride:(row + 1) * stride])
+        self.rows_written += rows
+
+    def close(self):
+        """补齐剩余的行并写入结束块"""
+        if self.rows_written < self.height:
+            blank = b'\x00' + b'\xff' * (self.width * 3)
+            for _ in range(self.height - self.rows_written):
+                self._compress(blank)
+            self.rows_written = self.height
+        self._pending += self._compressor.flush()
+        self._write_chunk(b'IDAT', bytes(self._pending))
+        self._pending.clear()
+        self._write_chunk(b'IEND', b'')
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步截图任务队列
+"""
+
+import math
+import time
+import uuid
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """任务队列已满"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ScreenshotJob:
+    """一个异步截图任务"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    def __init__(self, url: str, options: Dict[str, Any], cache_mode: str = 'default',
+                 return_format: str = 'base64', thumbnails: Optional[List[int]] = None,
+                 debug_timing: bool = False):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.options = options
+        self.cache_mode = cache_mode
+        self.return_format = return_format
+        self.thumbnails = thumbnails or []
+        self.debug_timing = debug_timing
+        # 执行时由处理函数设置的阶段计时器
+        self.timer: Optional[Any] = None
+        self.status = self.QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[bytes] = None
+        self.error: Optional[str] = None
+        # 执行失败时抛出的异常，结果接口据此区分请求本身的错误
+        self.exception: Optional[Exception] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务状态（不含截图数据）"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'url': self.url,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'size': len(self.result) if self.result is not None else None,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """
+    异步任务管理器
+
+    任务进入有界队列，由固定数量的工作线程取出执行；队列满时拒绝新任务。
+    完成的任务在 result_ttl 秒内可查询和下载结果，之后被清理。
+    """
+
+    def __init__(self, handler: Callable[[ScreenshotJob], Optional[bytes]],
+                 max_queue: int = 100, workers: int = 2, result_ttl: float = 600):
+        """
+        初始化任务管理器
+
+        Args:
+            handler: 执行任务的函数，返回截图字节数据，失败返回None
+            max_queue: 队列中最多等待的任务数
+            workers: 工作线程数
+            result_ttl: 结果保留时间（秒）
+        """
+        self.handler = handler
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._queue: "queue.Queue[Optional[ScreenshotJob]]" = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, ScreenshotJob] = {}
+        self._lock = threading.Lock()
+        # 最近任务耗时的指数移动平均，用于估算 Retry-After
+        self._avg_duration = 5.0
+        self._workers: List[threading.Thread] = []
+
+        for index in range(workers):
+            worker = threading.Thread(target=self._run, name=f'screenshot-job-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    @property
+    def queue_depth(self) -> int:
+        """排队中的任务数"""
+        return self._queue.qsize()
+
+    def retry_after(self) -> int:
+        """按当前积压估算客户端应等待的秒数"""
+        backlog = self.queue_depth / max(1, len(self._workers))
+        return max(1, math.ceil(backlog * self._avg_duration))
+
+    def submit(self, url: str, options: Dict[str, Any], cache_mode: str = 'default',
+               return_format: str = 'base64', thumbnails: Optional[List[int]] = None,
+               debug_timing: bool = False) -> ScreenshotJob:
+        """
+        提交任务
+
+        Raises:
+            JobQueueFull: 队列已满
+        """
+        self._purge_expired()
+        job = ScreenshotJob(url, options, cache_mode, return_format, thumbnails, debug_timing)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise JobQueueFull(f"任务队列已满（{self.max_queue}）", self.retry_after())
+
+        logger.info(f"任务已提交: {job.id} {url}")
+        return job
+
+    def get(self, job_id: str) -> Optional[ScreenshotJob]:
+        """查询任务，不存在或结果已过期时返回None"""
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self):
+        """工作线程主循环"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            job.status = ScreenshotJob.RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = self.handler(job)
+                if job.result is None:
+                    job.error = '截图失败，请检查网址是否正确'
+            except Exception as e:
+                logger.error(f"任务执行失败 {job.id}: {e}")
+                job.error = str(e)
+                job.exception = e
+            job.finished_at = time.time()
+            job.status = ScreenshotJob.SUCCEEDED if job.result is not None else ScreenshotJob.FAILED
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (job.finished_at - job.started_at)
+
+    def _purge_expired(self):
+        """清理结果已过期的任务"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and now - job.finished_at > self.result_ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def close(self):
+        """停止工作线程，未执行的任务被丢弃"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._workers:
+            self._queue.put(None)
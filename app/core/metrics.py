@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标（Prometheus 文本格式，不依赖第三方库）
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# 耗时直方图的默认分桶（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 字节数直方图的默认分桶：1KB 到 32MB，每档翻倍
+BYTES_BUCKETS = tuple(1024 * 2 ** power for power in range(16))
+
+LabelValues = Tuple[str, ...]
+GaugeValue = Union[float, Iterable[Tuple[Dict[str, str], float]]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _Metric:
+    """指标基类"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}'
+        ] + self.samples()
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每组标签：[各分桶计数（非累计）, 总和, 总数]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """记录代码块耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    抓取时才读取的指标（gauge 或 counter）
+
+    回调返回单个数值，或 [(标签, 数值), ...]，返回None时不输出。
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Optional[GaugeValue]],
+                 labels: Sequence[str] = (), kind: str = 'gauge'):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self._callback = callback
+
+    def samples(self) -> List[str]:
+        value = self._callback()
+        if value is None:
+            return []
+        if isinstance(value, (int, float)):
+            return [f'{self.name} {_format_value(value)}']
+        return [f'{self.name}{_format_labels(self.label_names, self._key(labels))} {_format_value(sample)}'
+                for labels, sample in value]
+
+
+class MetricsRegistry:
+    """指标集合，负责按 Prometheus 文本格式输出"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], Optional[GaugeValue]],
+              labels: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, labels, 'gauge'))
+
+    def counter_callback(self, name: str, documentation: str, callback: Callable[[], Optional[GaugeValue]],
+                         labels: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, labels, 'counter'))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class PhaseTimer:
+    """
+    记录一次截图各阶段的耗时
+
+    同一阶段可以多次计时，耗时累加。每个阶段结束时调用 sink（如写入直方图）。
+    """
+
+    def __init__(self, sink: Optional[Callable[[str, float], None]] = None,
+                 navigation_timing: bool = False):
+        """
+        Args:
+            sink: 每个阶段结束时调用，参数为 (阶段名, 秒数)
+            navigation_timing: 是否读取页面的 Navigation Timing（需要额外一次浏览器调用）
+        """
+        self.durations: Dict[str, float] = {}
+        self.navigation_timing = navigation_timing
+        # 页面的 Navigation Timing（毫秒），只有实际渲染且 navigation_timing 为真时才有
+        self.navigation: Optional[Dict[str, Any]] = None
+        # 截图来源：hit（缓存）、miss（实际渲染）、shared（合并到相同请求）
+        self.result: Optional[str] = None
+        self._sink = sink
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        if self._sink is not None:
+            self._sink(name, seconds)
+
+    def copy(self) -> 'PhaseTimer':
+        """
+        复制已记录的耗时，之后在副本上计时不影响原计时器
+
+        已记录的阶段不会再次写入 sink，只有副本上新记录的阶段会。
+        """
+        timer = PhaseTimer(self._sink, self.navigation_timing)
+        timer.durations = dict(self.durations)
+        timer.navigation = self.navigation
+        timer.result = self.result
+        return timer
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing 响应头的值
+
+        各阶段耗时以毫秒表示，total 为已记录阶段的总和，cache 描述截图来源。
+        """
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.durations.items()]
+        entries.append(f'total;dur={sum(self.durations.values()) * 1000:.1f}')
+        if self.result:
+            entries.append(f'cache;desc={self.result}')
+        return ', '.join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可放入JSON响应的耗时明细（毫秒）"""
+        return {
+            'result': self.result,
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.durations.items()},
+            'total_ms': round(sum(self.durations.values()) * 1000, 1),
+            'navigation': self.navigation
+        }
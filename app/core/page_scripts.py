@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+注入页面的JavaScript脚本
+"""
+
+from typing import Optional
+
+# 在每个新文档创建时注入（Page.addScriptToEvaluateOnNewDocument），
+# 记录进行中的 fetch/XHR 数量、最近一次网络活动和最近一次DOM变化的时间
+READINESS_INSTRUMENTATION_JS = """
+(function () {
+    if (window.__websnap) {
+        return;
+    }
+    var state = window.__websnap = {
+        inflight: 0,
+        lastNetwork: Date.now(),
+        lastMutation: Date.now()
+    };
+
+    function touch() {
+        state.lastNetwork = Date.now();
+    }
+
+    function done() {
+        state.inflight = Math.max(0, state.inflight - 1);
+        touch();
+    }
+
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            state.inflight++;
+            touch();
+            return originalFetch.apply(this, arguments).then(function (response) {
+                done();
+                return response;
+            }, function (error) {
+                done();
+                throw error;
+            });
+        };
+    }
+
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.inflight++;
+        touch();
+        this.addEventListener('loadend', done);
+        return originalSend.apply(this, arguments);
+    };
+
+    try {
+        new PerformanceObserver(touch).observe({type: 'resource'});
+    } catch (e) {}
+
+    new MutationObserver(function () {
+        state.lastMutation = Date.now();
+    }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+})();
+"""
+
+# 读取页面就绪状态，arguments[0] 为等待的CSS选择器；等待的JS表达式由 readiness_state_js 写入脚本
+READINESS_STATE_JS = """
+var state = window.__websnap;
+var now = Date.now();
+var selectorReady = true;
+var functionReady = true;
+
+if (arguments[0]) {
+    try {
+        selectorReady = document.querySelector(arguments[0]) !== null;
+    } catch (e) {
+        selectorReady = false;
+    }
+}
+try {
+    functionReady = !!(function () {
+        return (
+/*WAIT_FOR_FUNCTION*/true
+        );
+    })();
+} catch (e) {
+    functionReady = false;
+}
+
+return {
+    readyState: document.readyState,
+    instrumented: !!state,
+    inflight: state ? state.inflight : 0,
+    networkIdleFor: state ? now - state.lastNetwork : null,
+    domQuietFor: state ? now - state.lastMutation : null,
+    selectorReady: selectorReady,
+    functionReady: functionReady
+};
+"""
+
+
+def readiness_state_js(wait_for_function: Optional[str] = None) -> str:
+    """
+    生成读取就绪状态的脚本
+
+    等待的JS表达式直接写入脚本文本，随 execute_script 执行，不受页面 CSP 的影响；
+    在页面中用 new Function 求值时，禁止 unsafe-eval 的页面会抛出 EvalError，条件永远不满足。
+    表达式单独占一行，末尾的行注释不会影响脚本的其余部分。
+    """
+    if not wait_for_function:
+        return READINESS_STATE_JS
+    return READINESS_STATE_JS.replace('/*WAIT_FOR_FUNCTION*/true', wait_for_function)
+
+
+# 读取元素在页面中的位置（CSS像素，相对文档左上角），arguments[0] 为CSS选择器
+ELEMENT_RECT_JS = """
+var element = document.querySelector(arguments[0]);
+if (!element) {
+    return null;
+}
+var rect = element.getBoundingClientRect();
+return {
+    x: rect.left + window.scrollX,
+    y: rect.top + window.scrollY,
+    width: rect.width,
+    height: rect.height
+};
+"""
+
+# 读取主文档的 Navigation Timing（毫秒），各时间点相对导航开始，浏览器不支持时返回null
+NAVIGATION_TIMING_JS = """
+var entries = performance.getEntriesByType ? performance.getEntriesByType('navigation') : [];
+var nav = entries[0];
+if (!nav) {
+    return null;
+}
+
+function ms(value) {
+    return Math.round(Math.max(0, value) * 10) / 10;
+}
+
+return {
+    redirect: ms(nav.redirectEnd - nav.redirectStart),
+    dns: ms(nav.domainLookupEnd - nav.domainLookupStart),
+    connect: ms(nav.connectEnd - nav.connectStart),
+    tls: nav.secureConnectionStart > 0 ? ms(nav.connectEnd - nav.secureConnectionStart) : 0,
+    request: ms(nav.responseStart - nav.requestStart),
+    ttfb: ms(nav.responseStart - nav.startTime),
+    download: ms(nav.responseEnd - nav.responseStart),
+    dom_content_loaded: ms(nav.domContentLoadedEventEnd - nav.startTime),
+    load: nav.loadEventEnd > 0 ? ms(nav.loadEventEnd - nav.startTime) : null,
+    transfer_size: nav.transferSize,
+    protocol: nav.nextHopProtocol || null,
+    status: nav.responseStatus || null
+};
+"""
+
+# 滚动到指定位置（arguments[0] 为文档纵坐标），等两帧让滚动触发的布局和绘制完成，
+# 通过回调返回实际滚动位置（页面底部附近的滚动会被截断）
+SCROLL_TO_JS = """
+var done = arguments[arguments.length - 1];
+document.documentElement.style.scrollBehavior = 'auto';
+window.scrollTo(0, arguments[0]);
+requestAnimationFrame(function () {
+    requestAnimationFrame(function () {
+        done(window.scrollY);
+    });
+});
+"""
+
+# 分段截图时隐藏固定定位的元素、把粘性定位改为普通定位，避免页头页脚在每一段中重复出现；
+# 粘性元素仍占原来的位置，布局不变。返回处理的元素数量
+HIDE_FIXED_ELEMENTS_JS = """
+var changed = window.__websnapFixed = [];
+var elements = document.querySelectorAll('body *');
+for (var i = 0; i < elements.length; i++) {
+    var element = elements[i];
+    var position = getComputedStyle(element).position;
+    if (position === 'fixed') {
+        changed.push([element, 'visibility', element.style.getPropertyValue('visibility'),
+                      element.style.getPropertyPriority('visibility')]);
+        element.style.setProperty('visibility', 'hidden', 'important');
+    } else if (position === 'sticky' || position === '-webkit-sticky') {
+        changed.push([element, 'position', element.style.getPropertyValue('position'),
+                      element.style.getPropertyPriority('position')]);
+        element.style.setProperty('position', 'static', 'important');
+    }
+}
+return changed.length;
+"""
+
+# 恢复 HIDE_FIXED_ELEMENTS_JS 修改过的样式
+RESTORE_FIXED_ELEMENTS_JS = """
+var changed = window.__websnapFixed || [];
+for (var i = 0; i < changed.length; i++) {
+    var item = changed[i];
+    item[0].style.setProperty(item[1], item[2], item[3]);
+}
+window.__websnapFixed = null;
+"""
+
+# 自动滚动时读取的状态：进行中的 fetch/XHR、最近的网络活动，以及已进入视口附近但尚未加载完成的图片数量
+# （loading=lazy 的图片和 IntersectionObserver 设置的 src 都在这里体现），另返回当前滚动位置和页面高度
+AUTO_SCROLL_STATE_JS = """
+var state = window.__websnap;
+var limit = window.innerHeight * 2;
+var pendingImages = 0;
+for (var i = 0; i < document.images.length; i++) {
+    var image = document.images[i];
+    if (image.complete || !image.currentSrc && !image.getAttribute('src')) {
+        continue;
+    }
+    var rect = image.getBoundingClientRect();
+    if (rect.bottom >= -window.innerHeight && rect.top <= limit) {
+        pendingImages++;
+    }
+}
+return {
+    instrumented: !!state,
+    inflight: state ? state.inflight : 0,
+    networkIdleFor: state ? Date.now() - state.lastNetwork : null,
+    pendingImages: pendingImages,
+    scrollY: window.scrollY,
+    viewportHeight: window.innerHeight,
+    scrollHeight: Math.max(document.documentElement.scrollHeight, document.body ? document.body.scrollHeight : 0)
+};
+"""
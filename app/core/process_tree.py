@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器进程树工具（基于 /proc，仅 Linux 可用）
+"""
+
+import os
+import signal
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _parent_map() -> Dict[int, int]:
+    """读取所有进程的父进程ID"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格和括号，从最后一个右括号之后开始解析
+        fields = stat[stat.rfind(')') + 2:].split()
+        parents[int(entry)] = int(fields[1])
+    return parents
+
+
+def process_tree(pid: int) -> List[int]:
+    """
+    获取进程及其所有子孙进程
+
+    Returns:
+        进程ID列表（包含 pid 本身），/proc 不可用时只返回 [pid]
+    """
+    if not os.path.isdir('/proc'):
+        return [pid]
+
+    children: Dict[int, List[int]] = {}
+    for child, parent in _parent_map().items():
+        children.setdefault(parent, []).append(child)
+
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """
+    进程树的常驻内存（RSS）总和
+
+    Returns:
+        字节数，/proc 不可用时返回None
+    """
+    if not os.path.isdir('/proc'):
+        return None
+
+    total = 0
+    for member in process_tree(pid):
+        try:
+            with open(f'/proc/{member}/statm') as f:
+                total += int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def kill_process_tree(pid: int):
+    """强制结束进程及其所有子孙进程"""
+    for member in reversed(process_tree(pid)):
+        try:
+            os.kill(member, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            continue
+        except OSError as e:
+            logger.warning(f"结束进程 {member} 失败: {e}")
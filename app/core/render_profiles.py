@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染配置档
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_profiles(config) -> Dict[str, Dict[str, Any]]:
+    """
+    按配置展开启用的渲染配置档，未设置的项使用全局默认值
+
+    Args:
+        config: 配置类，读取 RENDER_PROFILES、ENABLED_RENDER_PROFILES 和各项默认值
+
+    Returns:
+        {配置档名称: 完整配置}，默认配置档总是包含在内
+
+    Raises:
+        ValueError: 启用了未定义的配置档
+    """
+    names = [config.DEFAULT_RENDER_PROFILE] + [
+        name for name in config.ENABLED_RENDER_PROFILES if name != config.DEFAULT_RENDER_PROFILE
+    ]
+
+    profiles = {}
+    for name in names:
+        if name not in config.RENDER_PROFILES:
+            raise ValueError(f"未定义的渲染配置档: {name}")
+        profile = config.RENDER_PROFILES[name]
+        profiles[name] = {
+            'chrome_options': config.CHROME_OPTIONS + profile.get('chrome_options', []),
+            'user_agent': profile.get('user_agent', config.USER_AGENT),
+            'viewport_width': profile.get('viewport_width', config.DEFAULT_VIEWPORT_WIDTH),
+            'viewport_height': profile.get('viewport_height', config.DEFAULT_VIEWPORT_HEIGHT),
+            'wait_strategy': profile.get('wait_strategy', config.DEFAULT_WAIT_STRATEGY),
+            'wait_time': profile.get('wait_time', config.DEFAULT_WAIT_TIME),
+            'block': profile.get('block', config.DEFAULT_BLOCK),
+            'pool_size': profile.get('pool_size', config.BROWSER_POOL_SIZE)
+        }
+    return profiles
+
+
+class RenderProfileRegistry:
+    """
+    按配置档管理渲染后端
+
+    每个配置档有独立的、预先启动的浏览器池，请求按 profile 参数路由到对应的池。
+    接口与 BrowserPool 一致，可以直接替换单个池使用。
+    """
+
+    def __init__(self, profiles: Dict[str, Dict[str, Any]],
+                 factory: Callable[[Dict[str, Any]], Any], default: str = 'default'):
+        """
+        为每个配置档创建渲染后端
+
+        Args:
+            profiles: resolve_profiles 返回的配置档
+            factory: 根据单个配置档创建 BrowserPool 或 RenderWorkerPool 的函数
+            default: 请求未指定配置档时使用的名称
+        """
+        self.profiles = profiles
+        self.default = default
+        self._pools: Dict[str, Any] = {}
+
+        # 各配置档的浏览器池并行启动
+        with ThreadPoolExecutor(max_workers=len(profiles), thread_name_prefix='profile-launch') as executor:
+            futures = {name: executor.submit(factory, profile) for name, profile in profiles.items()}
+        errors = []
+        for name, future in futures.items():
+            try:
+                self._pools[name] = future.result()
+                logger.info(f"渲染配置档 {name} 已就绪，实例数: {profiles[name]['pool_size']}")
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            self.close()
+            raise errors[0]
+
+    def get(self, name: Optional[str] = None):
+        """
+        获取配置档对应的渲染后端
+
+        Raises:
+            KeyError: 配置档不存在或未启用
+        """
+        return self._pools[name or self.default]
+
+    def pools(self) -> Dict[str, Any]:
+        """{配置档名称: 渲染后端}"""
+        return dict(self._pools)
+
+    @property
+    def size(self) -> int:
+        """所有配置档的实例总数"""
+        return sum(pool.size for pool in self._pools.values())
+
+    @property
+    def restarts(self) -> int:
+        """所有配置档的浏览器重启次数"""
+        return sum(pool.restarts for pool in self._pools.values())
+
+    @property
+    def idle_count(self) -> int:
+        """所有配置档的空闲实例数"""
+        return sum(pool.idle_count for pool in self._pools.values())
+
+    @property
+    def busy_count(self) -> int:
+        """所有配置档的忙碌实例数"""
+        return sum(pool.busy_count for pool in self._pools.values())
+
+    def warm_up(self, fixture_url: Optional[str] = None):
+        """并行预热所有配置档的浏览器"""
+        with ThreadPoolExecutor(max_workers=len(self._pools), thread_name_prefix='profile-warmup') as executor:
+            futures = {name: executor.submit(pool.warm_up, fixture_url) for name, pool in self._pools.items()}
+        for name, future in futures.items():
+            if future.exception() is not None:
+                logger.warning(f"配置档 {name} 预热失败: {future.exception()}")
+
+    def take_screenshot(self, url: str, profile: Optional[str] = None, **kwargs) -> Optional[bytes]:
+        """
+        在指定配置档的浏览器池中截图，其他参数与 ScreenshotService.take_screenshot 相同
+
+        Raises:
+            KeyError: 配置档不存在或未启用
+            BrowserPoolTimeout: 没有可用实例
+        """
+        return self.get(profile).take_screenshot(url, **kwargs)
+
+    def close(self):
+        """关闭所有配置档的渲染后端"""
+        for name, pool in self._pools.items():
+            try:
+                pool.close()
+            except Exception as e:
+                logger.warning(f"关闭配置档 {name} 的浏览器池失败: {e}")
+        self._pools = {}
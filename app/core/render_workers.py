@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程隔离的渲染工作进程池
+"""
+
+import os
+import queue
+import signal
+import logging
+import threading
+import multiprocessing
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from app.core.browser_pool import BrowserPoolTimeout
+from app.core.metrics import PhaseTimer
+from app.core.screenshot_service import ElementNotFound, ScreenshotService
+
+logger = logging.getLogger(__name__)
+
+
+class RenderWorkerError(Exception):
+    """工作进程崩溃、超时或通信失败"""
+
+
+def _maintain(service, deep: bool) -> bool:
+    """按需重启工作进程内的浏览器，返回是否重启"""
+    reason = service.recycle_reason(deep)
+    if not reason:
+        return False
+    logger.warning(f"重启浏览器（{reason}）")
+    try:
+        service.restart()
+    except Exception as e:
+        logger.error(f"重启浏览器失败: {e}")
+    return True
+
+
+def _worker_main(conn, viewport_width: int, viewport_height: int, service_options: Dict[str, Any],
+                 health_interval: Optional[float] = None):
+    """
+    工作进程入口
+
+    每个工作进程持有独立的 Chromium 和 ScreenshotService。
+    请求参数通过管道以 pickle 形式接收，截图结果用 send_bytes 原样写回，
+    避免对大块 PNG 数据做额外的序列化。
+    每次截图后检查回收条件，空闲超过 health_interval 秒时做一次存活探测和内存检查。
+    各阶段耗时随状态一起写回，由父进程计入指标。
+    """
+    # 成为进程组组长，便于父进程连同 chromedriver / Chromium 子进程一起清理
+    if hasattr(os, 'setsid'):
+        try:
+            os.setsid()
+        except OSError:
+            pass
+
+    try:
+        service = ScreenshotService(viewport_width, viewport_height, **service_options)
+    except Exception as e:
+        conn.send({'ok': False, 'error': f'WebDriver 初始化失败: {e}'})
+        conn.close()
+        return
+    conn.send({'ok': True})
+    restarts = 0
+
+    try:
+        while True:
+            if health_interval and not conn.poll(health_interval):
+                restarts += _maintain(service, deep=True)
+                continue
+            try:
+                kwargs = conn.recv()
+            except EOFError:
+                break
+            if kwargs is None:
+                break
+
+            timer = PhaseTimer(navigation_timing=kwargs.pop('navigation_timing', False))
+            not_found = None
+            try:
+                screenshot = service.take_screenshot(timer=timer, **kwargs)
+            except ElementNotFound as e:
+                screenshot, not_found = None, str(e)
+            if screenshot is None:
+                conn.send({'ok': False, 'error': '截图失败', 'not_found': not_found, 'restarts': restarts,
+                           'timings': timer.durations, 'navigation': timer.navigation})
+            else:
+                conn.send({'ok': True, 'size': len(screenshot), 'restarts': restarts,
+                           'timings': timer.durations, 'navigation': timer.navigation})
+                conn.send_bytes(screenshot)
+            restarts += _maintain(service, deep=False)
+    finally:
+        service.close()
+        conn.close()
+
+
+class _RenderWorker:
+    """单个工作进程的父进程侧句柄"""
+
+    def __init__(self, ctx, index: int, viewport_width: int, viewport_height: int,
+                 service_options: Dict[str, Any], health_interval: Optional[float] = None):
+        parent_conn, child_conn = ctx.Pipe()
+        self.index = index
+        # 工作进程内部重启浏览器的次数，随每次渲染结果上报
+        self.restarts = 0
+        self.conn = parent_conn
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, viewport_width, viewport_height, service_options, health_interval),
+            name=f'render-worker-{index}',
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float):
+        """等待工作进程完成浏览器初始化"""
+        if not self.conn.poll(timeout):
+            raise RenderWorkerError(f"工作进程 {self.index} 启动超时")
+        status = self.conn.recv()
+        if not status.get('ok'):
+            raise RenderWorkerError(status.get('error', f"工作进程 {self.index} 启动失败"))
+
+    def render(self, kwargs: Dict[str, Any], timeout: float,
+               timer: Optional[PhaseTimer] = None) -> Optional[bytes]:
+        """
+        把一次截图任务交给工作进程
+
+        Args:
+            kwargs: take_screenshot 的参数
+            timeout: 等待结果的最长时间（秒）
+            timer: 阶段计时器，工作进程上报的各阶段耗时会计入其中
+
+        Returns:
+            截图字节数据，页面本身截图失败时返回None
+
+        Raises:
+            RenderWorkerError: 工作进程超时、崩溃或管道断开
+            ElementNotFound: selector 没有匹配到可截图的元素
+        """
+        try:
+            self.conn.send(kwargs)
+            if not self.conn.poll(timeout):
+                raise RenderWorkerError(f"工作进程 {self.index} 渲染超时（{timeout}秒）")
+            status = self.conn.recv()
+            self.restarts = status.get('restarts', self.restarts)
+            if timer is not None:
+                for phase, seconds in status.get('timings', {}).items():
+                    timer.add(phase, seconds)
+                timer.navigation = status.get('navigation')
+            if status.get('not_found'):
+                raise ElementNotFound(status['not_found'])
+            if not status.get('ok'):
+                logger.error(f"工作进程 {self.index} {status.get('error')}")
+                return None
+            return self.conn.recv_bytes()
+        except (EOFError, OSError) as e:
+            raise RenderWorkerError(f"工作进程 {self.index} 异常退出: {e}")
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self, timeout: float = 10):
+        """正常关闭工作进程"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        """强制结束工作进程及其浏览器子进程"""
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+class RenderWorkerPool:
+    """
+    渲染工作进程池
+
+    接口与 BrowserPool 一致。每个工作进程独占一个浏览器，
+    某个页面导致的卡死或崩溃只会影响对应进程，该进程会被结束并自动补充。
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 30, render_timeout: float = 120,
+                 viewport_width: int = 1920, viewport_height: int = 1080,
+                 startup_timeout: float = 60, health_interval: Optional[float] = None,
+                 **service_options):
+        """
+        初始化工作进程池
+
+        Args:
+            size: 工作进程数量
+            timeout: 等待空闲工作进程的最长时间（秒）
+            render_timeout: 单次渲染的最长时间（秒），超时的进程会被结束；请求的看门狗时间更长时按看门狗时间延长
+            viewport_width: 默认视口宽度
+            viewport_height: 默认视口高度
+            startup_timeout: 工作进程启动浏览器的最长时间（秒）
+            health_interval: 工作进程空闲时的健康检查间隔（秒），为空时只在截图后检查回收条件
+            service_options: 传给 ScreenshotService 的其他参数（chrome_options、user_agent、max_pages 等）
+        """
+        if size < 1:
+            raise ValueError("工作进程数量必须大于0")
+
+        self.size = size
+        self.timeout = timeout
+        self.render_timeout = render_timeout
+        self.viewport_width = viewport_width
+        self.viewport_height = viewport_height
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+        self.service_options = service_options
+        self._replaced = 0
+        # 工作进程池通常在后台启动线程中创建，多线程进程直接 fork 可能继承被其他线程持有的锁而死锁；
+        # 工作进程改由 forkserver 派生（不支持时用 spawn），入口 _worker_main 是可导入的模块级函数
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if self._ctx.get_start_method() == 'forkserver':
+            # forkserver 预先导入截图服务（selenium 等），派生的工作进程不必各自导入
+            self._ctx.set_forkserver_preload(['app.core.screenshot_service'])
+        self._idle: "queue.Queue[_RenderWorker]" = queue.Queue()
+        self._workers: List[_RenderWorker] = []
+        self._lock = threading.Lock()
+        self._next_index = 0
+        self._closed = False
+
+        try:
+            # 先全部启动再统一等待，浏览器并行初始化
+            workers = [self._start_worker() for _ in range(size)]
+            for worker in workers:
+                worker.wait_ready(startup_timeout)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+
+        logger.info(f"渲染工作进程池初始化完成，进程数: {size}")
+
+    def _start_worker(self) -> _RenderWorker:
+        with self._lock:
+            index = self._next_index
+            self._next_index += 1
+            worker = _RenderWorker(
+                self._ctx, index, self.viewport_width, self.viewport_height,
+                self.service_options, self.health_interval
+            )
+            self._workers.append(worker)
+        return worker
+
+    def _replace_worker(self, worker: _RenderWorker):
+        """结束故障进程并补充一个新进程"""
+        worker.kill()
+        with self._lock:
+            self._replaced += 1 + worker.restarts
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if self._closed:
+            return
+
+        try:
+            new_worker = self._start_worker()
+            new_worker.wait_ready(self.startup_timeout)
+            self._idle.put(new_worker)
+            logger.info(f"已用工作进程 {new_worker.index} 替换故障进程 {worker.index}")
+        except Exception as e:
+            logger.error(f"补充工作进程失败: {e}")
+
+    @property
+    def restarts(self) -> int:
+        """浏览器重启次数（包括工作进程内的重启和故障进程的替换）"""
+        with self._lock:
+            return self._replaced + sum(worker.restarts for worker in self._workers)
+
+    @property
+    def idle_count(self) -> int:
+        """当前空闲进程数"""
+        return self._idle.qsize()
+
+    @property
+    def busy_count(self) -> int:
+        """当前忙碌进程数"""
+        return max(0, len(self._workers) - self._idle.qsize())
+
+    def warm_up(self, fixture_url: Optional[str] = None):
+        """并行预热所有工作进程（各截取一次本地测试页面），应在开始接收请求之前调用"""
+        if not fixture_url:
+            return
+        threads = [
+            threading.Thread(target=self.take_screenshot, args=(fixture_url,),
+                             kwargs={'wait_time': 5, 'full_page': False})
+            for _ in range(self.size)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def take_screenshot(self, url: str, wait_time: int = 3, full_page: bool = True,
+                        viewport_width: int = None, viewport_height: int = None,
+                        **kwargs) -> Optional[bytes]:
+        """
+        在独立的工作进程中截图，参数与 ScreenshotService.take_screenshot 相同
+
+        计时器不能跨进程传递：等待空闲进程的时间在父进程记为 queue_wait，
+        其余阶段由工作进程计时后上报。
+
+        Returns:
+            截图的字节数据，失败时返回None
+
+        Raises:
+            BrowserPoolTimeout: 没有空闲的工作进程
+        """
+        if self._closed:
+            raise RuntimeError("工作进程池已关闭")
+
+        # 渲染超时不短于工作进程内看门狗的时间，否则等待时间长的请求会在看门狗之前被结束；
+        # 在取出工作进程之前计算，参数有误时直接出错，不会占住工作进程
+        render_timeout = self.render_timeout
+        call_timeout = ScreenshotService.call_budget(
+            self.service_options.get('call_timeout'), self.service_options.get('page_load_timeout'),
+            wait_time, kwargs.get('auto_scroll', False), kwargs.get('auto_scroll_budget', 10),
+            self.service_options.get('max_wait_time')
+        )
+        if call_timeout:
+            render_timeout = max(render_timeout, call_timeout + ScreenshotService.CALL_TIMEOUT_MARGIN)
+
+        timer = kwargs.pop('timer', None)
+        try:
+            with timer.phase('queue_wait') if timer is not None else nullcontext():
+                worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise BrowserPoolTimeout(f"等待空闲工作进程超时（{self.timeout}秒）")
+
+        kwargs.update(
+            navigation_timing=timer is not None and timer.navigation_timing,
+            url=url,
+            wait_time=wait_time,
+            full_page=full_page,
+            viewport_width=viewport_width,
+            viewport_height=viewport_height
+        )
+        try:
+            screenshot = worker.render(kwargs, render_timeout, timer)
+        except RenderWorkerError as e:
+            logger.error(f"{e}，正在重启该进程")
+            # 补充进程需要启动浏览器，放到后台进行，不阻塞当前请求
+            threading.Thread(target=self._replace_worker, args=(worker,), daemon=True).start()
+            return None
+        except ElementNotFound:
+            self._release(worker)
+            raise
+
+        self._release(worker)
+        return screenshot
+
+    def _release(self, worker: _RenderWorker):
+        """归还工作进程，池已关闭时直接结束"""
+        if self._closed:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def close(self):
+        """关闭所有工作进程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+            self._workers = []
+
+        for worker in workers:
+            try:
+                worker.stop()
+            except Exception as e:
+                logger.warning(f"关闭工作进程 {worker.index} 失败: {e}")
+        logger.info("渲染工作进程池已关闭")
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图服务运行时
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.browser_pool import BrowserPool, BrowserPoolTimeout
+from app.core.job_queue import JobManager, ScreenshotJob
+from app.core.metrics import BYTES_BUCKETS, MetricsRegistry, PhaseTimer
+from app.core.render_profiles import RenderProfileRegistry, resolve_profiles
+from app.core.render_workers import RenderWorkerPool
+from app.core.screenshot_cache import ScreenshotCache, make_cache_key
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+from app.core.tile_pyramid import TileStore
+
+logger = logging.getLogger(__name__)
+
+# 预热时加载的本地页面
+WARMUP_FIXTURE = Path(__file__).resolve().parent / 'fixtures' / 'warmup.html'
+
+
+class ScreenshotRuntime:
+    """
+    截图服务运行时
+
+    持有渲染后端、截图缓存、相同请求合并、异步任务管理器和运行指标，由应用工厂创建并保存在
+    app.extensions['websnap'] 中。创建时不启动浏览器；start() 在后台并行启动各配置档的
+    浏览器池并预热，全部完成后才视为就绪。未显式启动时，第一次使用渲染后端会触发启动。
+    """
+
+    STOPPED = 'stopped'
+    STARTING = 'starting'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, config):
+        """
+        初始化运行时（不启动浏览器）
+
+        Args:
+            config: 配置类
+        """
+        self.config = config
+        self.profiles = resolve_profiles(config)
+        self.cache = ScreenshotCache(
+            memory_max_bytes=config.CACHE_MEMORY_MAX_BYTES,
+            ttl=config.CACHE_TTL,
+            disk_dir=config.CACHE_DISK_DIR or None,
+            disk_max_bytes=config.CACHE_DISK_MAX_BYTES
+        ) if config.CACHE_ENABLED else None
+        # 瓦片金字塔存储，未配置目录时不支持 tiles 输出
+        self.tiles = TileStore(
+            config.TILE_STORE_DIR, config.TILE_STORE_TTL, config.TILE_SIZE
+        ) if config.TILE_STORE_DIR else None
+        # 合并相同参数的并发截图请求，只渲染一次
+        self.inflight = SingleFlight()
+        # 异步任务管理器，工作线程数与浏览器数一致
+        self.jobs = JobManager(
+            handler=self._run_job,
+            max_queue=config.JOB_QUEUE_SIZE,
+            workers=config.BROWSER_POOL_SIZE,
+            result_ttl=config.JOB_RESULT_TTL
+        )
+        self.status = self.STOPPED
+        self.error: Optional[str] = None
+        self.startup_seconds: Optional[float] = None
+        self._renderer: Optional[RenderProfileRegistry] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        # 异步服务使用：事件循环中的请求合并、每个配置档的浏览器名额和执行渲染的线程
+        self.async_inflight = AsyncSingleFlight()
+        self._gates: Dict[str, asyncio.Semaphore] = {}
+        self._render_executor: Optional[ThreadPoolExecutor] = None
+        self._async_waiting = 0
+        self._init_metrics()
+
+    def _init_metrics(self):
+        """注册运行指标，池和队列的状态在抓取时读取"""
+        metrics = self.metrics = MetricsRegistry()
+        self.request_count = metrics.counter(
+            'websnap_http_requests_total', 'HTTP 请求数', ['endpoint', 'method', 'status'])
+        self.request_duration = metrics.histogram(
+            'websnap_http_request_duration_seconds', 'HTTP 请求耗时（秒）', ['endpoint'])
+        self.capture_count = metrics.counter(
+            'websnap_captures_total', '截图次数，result 为 hit、miss、shared 或 error', ['result'])
+        self.phase_duration = metrics.histogram(
+            'websnap_render_phase_seconds',
+            '截图各阶段耗时（秒）：admission_wait、queue_wait、setup、layout、navigate、readiness、scroll、capture、encode、serialize',
+            ['phase'])
+        self.output_bytes = metrics.histogram(
+            'websnap_output_bytes', '响应中图片的字节数', ['format'], buckets=BYTES_BUCKETS)
+
+        metrics.gauge('websnap_ready', '浏览器池是否已启动并完成预热', lambda: int(self.ready))
+        metrics.gauge('websnap_pool_size', '浏览器实例数', lambda: self._pool_stat('size'), ['profile'])
+        metrics.gauge('websnap_pool_busy', '忙碌的浏览器实例数', lambda: self._pool_stat('busy_count'), ['profile'])
+        metrics.gauge('websnap_pool_idle', '空闲的浏览器实例数', lambda: self._pool_stat('idle_count'), ['profile'])
+        metrics.counter_callback('websnap_browser_restarts_total', '浏览器重启次数',
+                                 lambda: self._pool_stat('restarts'), ['profile'])
+        metrics.gauge('websnap_job_queue_depth', '排队中的异步任务数', lambda: self.jobs.queue_depth)
+        metrics.gauge('websnap_inflight_renders', '正在进行的渲染数（合并后）',
+                      lambda: self.inflight.in_flight + self.async_inflight.in_flight)
+        metrics.gauge('websnap_async_waiting', '异步服务中等待浏览器名额的请求数',
+                      lambda: self._async_waiting)
+        if self.cache is not None:
+            metrics.counter_callback('websnap_cache_hits_total', '缓存命中次数', lambda: self.cache.hits)
+            metrics.counter_callback('websnap_cache_misses_total', '缓存未命中次数', lambda: self.cache.misses)
+            metrics.gauge('websnap_cache_hit_ratio', '缓存命中率', lambda: self.cache.hit_ratio)
+
+    def _pool_stat(self, attribute: str):
+        """按配置档读取浏览器池的状态，尚未启动时不输出"""
+        if self._renderer is None:
+            return None
+        return [({'profile': name}, getattr(pool, attribute))
+                for name, pool in self._renderer.pools().items()]
+
+    def new_timer(self, navigation_timing: bool = False) -> PhaseTimer:
+        """
+        创建阶段计时器，每个阶段结束时计入 websnap_render_phase_seconds
+
+        Args:
+            navigation_timing: 是否同时读取页面的 Navigation Timing
+        """
+        return PhaseTimer(
+            sink=lambda phase, seconds: self.phase_duration.observe(seconds, phase=phase),
+            navigation_timing=navigation_timing
+        )
+
+    def build_tiles(self, screenshot_data: bytes, options: Dict[str, Any],
+                    timer: Optional[PhaseTimer] = None) -> Dict[str, Any]:
+        """
+        把截图切成瓦片金字塔写入瓦片存储，内容相同的截图复用已有的金字塔，耗时计入 encode 阶段
+
+        Args:
+            screenshot_data: 截图数据
+            options: 截图参数，瓦片使用其中的 image_format 和 quality
+
+        Returns:
+            金字塔的 manifest
+        """
+        with timer.phase('encode') if timer is not None else nullcontext():
+            return self.tiles.build(screenshot_data, options['image_format'], options['quality'])
+
+    def _run_job(self, job: ScreenshotJob) -> Optional[bytes]:
+        """执行异步任务，计时器保存在任务上，下载结果时用于 Server-Timing"""
+        job.timer = self.new_timer(job.debug_timing)
+        return self.capture(job.url, job.options, job.cache_mode, job.timer)
+
+    @property
+    def ready(self) -> bool:
+        """浏览器池是否已启动并完成预热"""
+        return self.status == self.READY
+
+    def start(self, wait: bool = False):
+        """
+        在后台启动浏览器池，已启动或正在启动时不做任何事
+
+        Args:
+            wait: 是否等待启动完成
+        """
+        with self._lock:
+            if self.status in (self.STOPPED, self.FAILED):
+                self.status = self.STARTING
+                self.error = None
+                self._ready.clear()
+                threading.Thread(target=self._boot, name='websnap-startup', daemon=True).start()
+        if wait:
+            self._ready.wait()
+
+    def _boot(self):
+        """并行启动所有配置档的浏览器池并预热"""
+        started = time.perf_counter()
+        try:
+            renderer = RenderProfileRegistry(
+                self.profiles, self._create_renderer, self.config.DEFAULT_RENDER_PROFILE
+            )
+            if self.config.WARMUP_ENABLED:
+                renderer.warm_up(self.config.WARMUP_URL or WARMUP_FIXTURE.as_uri())
+            self._renderer = renderer
+            self.startup_seconds = time.perf_counter() - started
+            self.status = self.READY
+            logger.info(f"截图服务已就绪，启动耗时 {self.startup_seconds:.2f} 秒")
+        except Exception as e:
+            self.error = str(e)
+            self.status = self.FAILED
+            logger.error(f"截图服务启动失败: {e}")
+        finally:
+            self._ready.set()
+
+    def _create_renderer(self, profile: Dict[str, Any]):
+        """
+        为一个渲染配置档创建渲染后端
+
+        Returns:
+            thread 模式返回 BrowserPool（进程内浏览器池），
+            process 模式返回 RenderWorkerPool（每个浏览器运行在独立的工作进程中）
+        """
+        config = self.config
+        service_options = {
+            'chrome_options': profile['chrome_options'],
+            'user_agent': profile['user_agent'],
+            'binary_location': config.CHROME_BINARY,
+            'page_load_timeout': config.PAGE_LOAD_TIMEOUT,
+            'call_timeout': config.BROWSER_CALL_TIMEOUT,
+            'max_wait_time': config.MAX_WAIT_TIME,
+            'max_pages': config.BROWSER_MAX_PAGES,
+            'max_rss_bytes': config.BROWSER_MAX_RSS_MB * 1024 * 1024
+        }
+        if config.RENDER_MODE == 'process':
+            return RenderWorkerPool(
+                size=profile['pool_size'],
+                timeout=config.BROWSER_POOL_TIMEOUT,
+                render_timeout=config.RENDER_TIMEOUT,
+                viewport_width=profile['viewport_width'],
+                viewport_height=profile['viewport_height'],
+                health_interval=config.BROWSER_HEALTH_INTERVAL,
+                **service_options
+            )
+        return BrowserPool(
+            size=profile['pool_size'],
+            timeout=config.BROWSER_POOL_TIMEOUT,
+            viewport_width=profile['viewport_width'],
+            viewport_height=profile['viewport_height'],
+            health_interval=config.BROWSER_HEALTH_INTERVAL,
+            **service_options
+        )
+
+    @property
+    def renderer(self) -> RenderProfileRegistry:
+        """
+        渲染后端，尚未就绪时按需启动并等待
+
+        Raises:
+            BrowserPoolTimeout: 在 BROWSER_POOL_TIMEOUT 秒内没有完成启动
+            RuntimeError: 浏览器启动失败
+        """
+        if self._renderer is not None:
+            return self._renderer
+
+        self.start()
+        if not self._ready.wait(self.config.BROWSER_POOL_TIMEOUT):
+            raise BrowserPoolTimeout("浏览器正在启动，请稍后重试")
+        if self._renderer is None:
+            raise RuntimeError(f"浏览器启动失败: {self.error}")
+        return self._renderer
+
+    def capture(self, url: str, options: Dict[str, Any], cache_mode: str = 'default',
+                timer: Optional[PhaseTimer] = None) -> Optional[bytes]:
+        """
+        截图（经过缓存和相同请求合并）
+
+        Args:
+            url: 要截图的网址
+            options: take_screenshot 的参数
+            cache_mode: default 读写缓存，bypass 不读不写，refresh 跳过读取但写入新结果
+            timer: 阶段计时器，只有真正执行渲染的请求会记录各阶段耗时
+
+        Returns:
+            截图的字节数据，失败时返回None
+        """
+        key = make_cache_key(url, options)
+        cached = self._read_cache(url, key, cache_mode, timer)
+        if cached is not None:
+            return cached
+
+        try:
+            screenshot_data, shared = self.inflight.do(
+                key, lambda: self._render(url, options, key, cache_mode, timer)
+            )
+        except Exception:
+            self.capture_count.inc(result='error')
+            raise
+        return self._finish_capture(url, screenshot_data, shared, timer)
+
+    async def capture_async(self, url: str, options: Dict[str, Any], cache_mode: str = 'default',
+                            timer: Optional[PhaseTimer] = None) -> Optional[bytes]:
+        """
+        在事件循环中截图，参数和返回值与 capture 相同
+
+        排队等待浏览器的请求和合并到相同请求的请求都只是挂起的协程，不占用线程；
+        只有拿到浏览器名额的请求才会交给渲染线程执行，渲染线程数等于浏览器总数。
+
+        Raises:
+            BrowserPoolTimeout: 在 BROWSER_POOL_TIMEOUT 秒内没有空闲的浏览器
+        """
+        loop = asyncio.get_running_loop()
+        key = make_cache_key(url, options)
+        # 磁盘缓存和按需启动浏览器可能阻塞，放到默认线程池中执行
+        cached = await loop.run_in_executor(None, self._read_cache, url, key, cache_mode, timer)
+        if cached is not None:
+            return cached
+
+        try:
+            screenshot_data, shared = await self.async_inflight.do(
+                key, lambda: self._render_async(url, options, key, cache_mode, timer)
+            )
+        except Exception:
+            self.capture_count.inc(result='error')
+            raise
+        return self._finish_capture(url, screenshot_data, shared, timer)
+
+    async def _render_async(self, url: str, options: Dict[str, Any], key: str, cache_mode: str,
+                            timer: Optional[PhaseTimer]) -> Optional[bytes]:
+        """
+        等待配置档的浏览器名额，再在渲染线程中截图
+
+        等待名额的时间记为 admission_wait 阶段；拿到名额后浏览器池内的等待仍记为 queue_wait，
+        两者分开计时，同一段等待不会在 queue_wait 中记录两次。
+        """
+        loop = asyncio.get_running_loop()
+        renderer = self._renderer or await loop.run_in_executor(None, lambda: self.renderer)
+        profile = options.get('profile') or renderer.default
+        gate = self._gates.get(profile)
+        if gate is None:
+            gate = self._gates[profile] = asyncio.Semaphore(renderer.get(profile).size)
+        if self._render_executor is None:
+            self._render_executor = ThreadPoolExecutor(max_workers=renderer.size, thread_name_prefix='async-render')
+
+        started = time.perf_counter()
+        self._async_waiting += 1
+        try:
+            await asyncio.wait_for(gate.acquire(), self.config.BROWSER_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise BrowserPoolTimeout(f"等待空闲浏览器超时（{self.config.BROWSER_POOL_TIMEOUT}秒）")
+        finally:
+            self._async_waiting -= 1
+        if timer is not None:
+            timer.add('admission_wait', time.perf_counter() - started)
+        try:
+            return await loop.run_in_executor(
+                self._render_executor, self._render, url, options, key, cache_mode, timer
+            )
+        finally:
+            gate.release()
+
+    def _read_cache(self, url: str, key: str, cache_mode: str, timer: Optional[PhaseTimer]) -> Optional[bytes]:
+        """按缓存模式读取缓存，未命中或不读缓存时返回None"""
+        if self.cache is None or cache_mode in ('bypass', 'refresh'):
+            return None
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"缓存命中: {url}")
+            self.capture_count.inc(result='hit')
+            if timer is not None:
+                timer.result = 'hit'
+        return cached
+
+    def _render(self, url: str, options: Dict[str, Any], key: str, cache_mode: str,
+                timer: Optional[PhaseTimer]) -> Optional[bytes]:
+        """实际渲染并按缓存模式写入缓存"""
+        screenshot_data = self.renderer.take_screenshot(url, timer=timer, **options)
+        if self.cache is not None and cache_mode != 'bypass' and screenshot_data is not None:
+            self.cache.set(key, screenshot_data)
+        return screenshot_data
+
+    def _finish_capture(self, url: str, screenshot_data: Optional[bytes], shared: bool,
+                        timer: Optional[PhaseTimer]) -> Optional[bytes]:
+        """记录截图结果"""
+        if shared:
+            logger.info(f"合并到进行中的相同请求: {url}")
+        result = 'shared' if shared else 'miss'
+        if timer is not None:
+            timer.result = result
+        self.capture_count.inc(result=result if screenshot_data is not None else 'error')
+        return screenshot_data
+
+    def close(self):
+        """停止任务线程并关闭所有浏览器"""
+        self.jobs.close()
+        if self.status == self.STARTING:
+            self._ready.wait()
+        if self._render_executor is not None:
+            self._render_executor.shutdown(wait=False)
+            self._render_executor = None
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
+        self.status = self.STOPPED
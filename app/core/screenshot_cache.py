@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图结果缓存（内存LRU + 磁盘两级）
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化URL，使等价的地址得到相同的缓存键
+
+    补全协议，协议和主机名转小写，去掉默认端口和片段，查询参数按键排序。
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        规范化后的URL
+    """
+    if '://' not in url:
+        url = 'https://' + url
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username + (f':{parts.password}' if parts.password else '')
+        host = f'{userinfo}@{host}'
+
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def make_cache_key(url: str, options: Dict[str, Any]) -> str:
+    """
+    生成缓存键
+
+    Args:
+        url: 要截图的网址
+        options: take_screenshot 的参数（视口、完整页面、等待设置等）
+
+    Returns:
+        缓存键（十六进制SHA-256）
+    """
+    key_data = json.dumps({'url': normalize_url(url), 'options': options},
+                          sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """按总字节数限制容量的内存LRU缓存"""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, data = entry
+            if time.time() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes, stored_at: Optional[float] = None):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (stored_at or time.time(), data)
+            self.current_bytes += len(data)
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: str):
+        _, data = self._entries.pop(key)
+        self.current_bytes -= len(data)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    磁盘缓存
+
+    每个条目一个文件，文件修改时间即写入时间，用于判断TTL；
+    访问时间用于在总大小超限时淘汰最久未使用的条目。
+    """
+
+    # 超限淘汰时清理到容量的这个比例，避免每次写入都触发目录扫描
+    EVICT_TARGET_RATIO = 0.9
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current_bytes = sum(entry[1] for entry in self._scan())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.bin')
+
+    def _scan(self):
+        """遍历缓存文件，返回 (路径, 大小, 最近访问时间, 写入时间)"""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.bin'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, max(stat.st_atime, stat.st_mtime), stat.st_mtime
+
+    def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        """
+        Returns:
+            (写入时间, 数据)，不存在或已过期时返回None
+        """
+        path = self._path(key)
+        try:
+            stored_at = os.stat(path).st_mtime
+            if time.time() - stored_at > self.ttl:
+                self._delete(path)
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 只更新访问时间，保留修改时间作为写入时间
+            os.utime(path, (time.time(), stored_at))
+            return stored_at, data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"读取磁盘缓存失败: {e}")
+            return None
+
+    def set(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                previous = os.path.getsize(path)
+            except FileNotFoundError:
+                previous = 0
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            # 原子替换，并发读取不会看到写了一半的文件
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入磁盘缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self.current_bytes += len(data) - previous
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+
+    def _delete(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self.current_bytes -= size
+
+    def _evict(self):
+        """删除过期条目和最久未使用的条目，直到低于目标容量（调用方持有锁）"""
+        now = time.time()
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(entry[1] for entry in entries)
+        target = self.max_bytes * self.EVICT_TARGET_RATIO
+        removed = 0
+
+        for path, size, _, stored_at in entries:
+            if total <= target and now - stored_at <= self.ttl:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        self.current_bytes = total
+        logger.info(f"磁盘缓存淘汰 {removed} 个条目，当前大小: {total} bytes")
+
+
+class ScreenshotCache:
+    """
+    两级截图缓存
+
+    先查内存LRU，未命中再查磁盘；磁盘命中的数据会被提升到内存。
+    写入时同时写两级。
+    """
+
+    def __init__(self, memory_max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600,
+                 disk_dir: Optional[str] = None, disk_max_bytes: int = 1024 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            memory_max_bytes: 内存层最大字节数
+            ttl: 缓存有效期（秒）
+            disk_dir: 磁盘层目录，为空时不启用磁盘层
+            disk_max_bytes: 磁盘层最大字节数
+        """
+        self.ttl = ttl
+        self.memory = MemoryCache(memory_max_bytes, ttl)
+        self.disk = DiskCache(disk_dir, disk_max_bytes, ttl) if disk_dir else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存，未命中返回None"""
+        data = self.memory.get(key)
+        if data is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                stored_at, data = entry
+                self.memory.set(key, data, stored_at)
+
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes):
+        """写入缓存"""
+        self.memory.set(key, data)
+        if self.disk is not None:
+            self.disk.set(key, data)
+
+    @property
+    def hit_ratio(self) -> float:
+        """缓存命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
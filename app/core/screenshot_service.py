@@ -4,11 +4,17 @@
 网页截图服务核心类
 """
 
+import math
 import time
+import threading
+import base64
 import logging
-from typing import Optional
+from io import BytesIO
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 
+from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -16,14 +22,96 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from app.core.blocklist import build_blocked_urls
+from app.core.image_codec import PngStripWriter, output_scale, resize_image, transcode
+from app.core.metrics import PhaseTimer
+from app.core.page_scripts import (
+    AUTO_SCROLL_STATE_JS, ELEMENT_RECT_JS, HIDE_FIXED_ELEMENTS_JS, NAVIGATION_TIMING_JS, READINESS_INSTRUMENTATION_JS,
+    RESTORE_FIXED_ELEMENTS_JS, SCROLL_TO_JS, readiness_state_js
+)
+from app.core.process_tree import kill_process_tree, process_tree_rss
+
 logger = logging.getLogger(__name__)
 
+# 未指定时使用的 Chromium 启动参数
+DEFAULT_CHROME_OPTIONS = [
+    '--headless',  # 无头模式
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor'
+]
+
+DEFAULT_USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+
+
+class ElementNotFound(Exception):
+    """selector 没有匹配到可截图的元素（不存在或尺寸为0）"""
+
 
 class ScreenshotService:
     """网页截图服务类"""
     
-    def __init__(self, viewport_width: int = 1920, viewport_height: int = 1080):
+    # 就绪检测的轮询间隔（秒）
+    READINESS_POLL_INTERVAL = 0.1
+    
+    # full_page_mode 为 auto 时，输出高度超过该值（Chromium 的最大纹理尺寸）改用分段截图
+    TILED_CAPTURE_THRESHOLD = 16384
+    
+    # 自动滚动时每一步等待新请求完成的最长时间（秒），以及网络持续空闲多久（毫秒）视为已完成
+    AUTO_SCROLL_STEP_TIMEOUT = 2.0
+    AUTO_SCROLL_SETTLE_MS = 150
+    
+    # 就绪后等待 body 元素出现的最长时间（秒）
+    BODY_WAIT_TIMEOUT = 10
+    
+    # 看门狗时间在请求自身的时间预算之外留出的余量（秒），用于截图和编码
+    CALL_TIMEOUT_MARGIN = 30
+    
+    # 等待时间和自动滚动预算的上限（秒），超出的按上限处理，看门狗时间因此总是有界
+    MAX_WAIT_TIME = 60
+    MAX_AUTO_SCROLL_BUDGET = 60
+    
+    def __init__(self, viewport_width: int = 1920, viewport_height: int = 1080,
+                 chrome_options: Optional[List[str]] = None, user_agent: Optional[str] = None,
+                 binary_location: str = '/usr/bin/chromium', page_load_timeout: Optional[float] = None,
+                 call_timeout: Optional[float] = None, max_pages: Optional[int] = None,
+                 max_rss_bytes: Optional[int] = None, max_wait_time: Optional[float] = None):
+        """
+        初始化截图服务并启动浏览器
+        
+        Args:
+            viewport_width: 默认视口宽度
+            viewport_height: 默认视口高度
+            chrome_options: Chromium 启动参数，默认使用 DEFAULT_CHROME_OPTIONS
+            user_agent: User-Agent，默认使用 DEFAULT_USER_AGENT
+            binary_location: Chromium 可执行文件路径
+            page_load_timeout: 页面加载超时（秒），超时后停止加载并继续截图
+            call_timeout: 单次截图的看门狗时间（秒），超时视为浏览器卡死，强制结束浏览器进程；
+                请求自身的时间预算更长时按预算延长（见 call_budget）
+            max_pages: 渲染多少个页面后重启浏览器，用于回收缓慢增长的内存
+            max_rss_bytes: 浏览器进程树的内存上限（字节），超出后重启浏览器
+            max_wait_time: 等待时间的上限（秒），默认 MAX_WAIT_TIME
+        """
         self.driver = None
+        self.chrome_options = list(DEFAULT_CHROME_OPTIONS if chrome_options is None else chrome_options)
+        self.user_agent = user_agent or DEFAULT_USER_AGENT
+        self.binary_location = binary_location
+        self.page_load_timeout = page_load_timeout
+        self.call_timeout = call_timeout
+        self.max_pages = max_pages
+        self.max_rss_bytes = max_rss_bytes
+        self.max_wait_time = max_wait_time or self.MAX_WAIT_TIME
+        self.pages_served = 0
+        self._hung = False
+        # 当前截图的阶段计时器，实例同一时刻只服务一个请求
+        self._timer: Optional[PhaseTimer] = None
+        self.readiness_instrumented = False
+        self.blocked_urls: List[str] = []
         self.viewport_width = viewport_width
         self.viewport_height = viewport_height
         self.setup_driver()
@@ -32,39 +120,715 @@ class ScreenshotService:
         """初始化Chromium WebDriver"""
         try:
             chrome_options = Options()
-            chrome_options.add_argument('--headless')  # 无头模式
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--disable-web-security')
-            chrome_options.add_argument('--disable-features=VizDisplayCompositor')
+            for argument in self.chrome_options:
+                chrome_options.add_argument(argument)
             chrome_options.add_argument(f'--window-size={self.viewport_width},{self.viewport_height}')
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+            chrome_options.add_argument(f'--user-agent={self.user_agent}')
             
             # 使用Chromium
-            chrome_options.binary_location = '/usr/bin/chromium'
+            chrome_options.binary_location = self.binary_location
             self.driver = webdriver.Chrome(options=chrome_options)
+            if self.page_load_timeout:
+                self.driver.set_page_load_timeout(self.page_load_timeout)
+                self.driver.set_script_timeout(self.page_load_timeout)
+            self._install_readiness_instrumentation()
             logger.info("Chromium WebDriver 初始化成功")
             
         except Exception as e:
             logger.error(f"WebDriver 初始化失败: {e}")
             raise
     
+    def warm_up(self, fixture_url: Optional[str] = None):
+        """
+        预热浏览器
+        
+        先打开空白页，再完整截取一次本地测试页面，让渲染进程、字体、合成和图片编码
+        在启动阶段完成初始化，第一个真实请求不再承担这些开销。
+        """
+        self.driver.get('about:blank')
+        if fixture_url:
+            started = time.perf_counter()
+            if self.take_screenshot(fixture_url, wait_time=5, full_page=False) is None:
+                logger.warning(f"预热页面截图失败: {fixture_url}")
+            else:
+                logger.info(f"预热完成，耗时 {time.perf_counter() - started:.2f} 秒")
+            self.driver.get('about:blank')
+    
+    def _browser_pid(self) -> Optional[int]:
+        """chromedriver 进程ID，Chromium 是它的子进程"""
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        return getattr(process, 'pid', None)
+    
+    def _kill_browser(self):
+        """强制结束 chromedriver 及其启动的 Chromium 进程"""
+        pid = self._browser_pid()
+        if pid:
+            kill_process_tree(pid)
+    
+    @classmethod
+    def call_budget(cls, call_timeout: Optional[float], page_load_timeout: Optional[float],
+                    wait_time: float, auto_scroll: bool = False, auto_scroll_budget: float = 10,
+                    max_wait_time: Optional[float] = None) -> Optional[float]:
+        """
+        单次截图的看门狗时间
+        
+        请求自身的时间预算（页面加载、就绪等待、等待 body、自动滚动）加上 CALL_TIMEOUT_MARGIN，
+        不小于 call_timeout；等待时间和滚动预算较大的请求不会在正常执行时被看门狗结束。
+        等待时间和滚动预算先按上限截断，看门狗时间不会因请求参数而无限延长。
+        
+        Args:
+            call_timeout: 配置的看门狗时间（秒），为空时不启用看门狗
+            page_load_timeout: 页面加载超时（秒）
+            wait_time: 请求的等待时间（秒）
+            auto_scroll: 是否自动滚动
+            auto_scroll_budget: 自动滚动的时间预算（秒）
+            max_wait_time: 等待时间的上限（秒），默认 MAX_WAIT_TIME
+            
+        Returns:
+            看门狗时间（秒），不启用时返回None
+        """
+        if not call_timeout:
+            return None
+        budget = (page_load_timeout or 0) + min(wait_time, max_wait_time or cls.MAX_WAIT_TIME) + cls.BODY_WAIT_TIMEOUT
+        if auto_scroll:
+            budget += min(auto_scroll_budget, cls.MAX_AUTO_SCROLL_BUDGET)
+        return max(call_timeout, budget + cls.CALL_TIMEOUT_MARGIN)
+    
+    @contextmanager
+    def _watchdog(self, timeout: Optional[float]) -> Iterator[None]:
+        """
+        看门狗：超时后结束浏览器进程，使卡住的 WebDriver 调用立即出错返回
+        
+        之后 is_alive 返回False，由浏览器池负责重启。
+        """
+        if not timeout:
+            yield
+            return
+        
+        def expire():
+            self._hung = True
+            logger.error(f"浏览器超过 {timeout} 秒无响应，强制结束")
+            self._kill_browser()
+        
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        finally:
+            timer.cancel()
+    
+    def memory_usage(self) -> Optional[int]:
+        """浏览器进程树的常驻内存（字节），无法获取时返回None"""
+        pid = self._browser_pid()
+        return process_tree_rss(pid) if pid else None
+    
+    def is_alive(self, probe_timeout: float = 10) -> bool:
+        """
+        存活探测：chromedriver 进程仍在运行，且能在限定时间内执行一段脚本
+        """
+        if self.driver is None or self._hung:
+            return False
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        if process is not None and hasattr(process, 'poll') and process.poll() is not None:
+            return False
+        try:
+            with self._watchdog(probe_timeout):
+                self.driver.execute_script('return 1;')
+        except Exception:
+            return False
+        return not self._hung
+    
+    def recycle_reason(self, deep: bool = False) -> Optional[str]:
+        """
+        判断浏览器是否需要重启
+        
+        Args:
+            deep: 是否执行存活探测和内存检查；为False时只做不访问浏览器的快速检查
+            
+        Returns:
+            需要重启的原因，不需要时返回None
+        """
+        if self.driver is None:
+            return '浏览器未运行'
+        if self._hung:
+            return '浏览器无响应'
+        if self.max_pages and self.pages_served >= self.max_pages:
+            return f'已渲染 {self.pages_served} 个页面'
+        if not deep:
+            return None
+        if not self.is_alive():
+            return '存活探测失败'
+        if self.max_rss_bytes:
+            rss = self.memory_usage()
+            if rss and rss > self.max_rss_bytes:
+                return f'内存占用 {rss // (1024 * 1024)}MB 超过上限'
+        return None
+    
+    def restart(self):
+        """关闭当前浏览器（无法正常关闭时强制结束）并重新启动"""
+        try:
+            if self._hung:
+                raise RuntimeError('浏览器无响应')
+            self.close()
+        except Exception as e:
+            logger.warning(f"正常关闭浏览器失败，强制结束: {e}")
+            self._kill_browser()
+            self.driver = None
+        
+        self.pages_served = 0
+        self.blocked_urls = []
+        self._hung = False
+        self.setup_driver()
+    
+    def _phase(self, name: str):
+        """当前截图某个阶段的计时上下文，未传入计时器时不计时"""
+        return self._timer.phase(name) if self._timer is not None else nullcontext()
+    
+    def _isolation(self, isolate: bool):
+        """isolate 为真时返回隔离的浏览器上下文，否则返回空上下文"""
+        return self._isolated_context() if isolate else nullcontext()
+    
+    @contextmanager
+    def _isolated_context(self) -> Iterator[None]:
+        """
+        在一次性的浏览器上下文中执行
+        
+        通过 Target.createBrowserContext 创建独立的上下文（Cookie、存储、缓存互不共享），
+        在其中打开新标签页并切换过去，结束后切回原标签页并销毁该上下文，耗时只有几毫秒，
+        无需重启浏览器。浏览器不支持时退化为结束后清除 Cookie、缓存和存储。
+        """
+        main_handle = self.driver.current_window_handle
+        handles = set(self.driver.window_handles)
+        context_id = None
+        try:
+            with self._phase('setup'):
+                context_id = self.driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+                target_id = self.driver.execute_cdp_cmd('Target.createTarget', {
+                    'url': 'about:blank',
+                    'browserContextId': context_id
+                })['targetId']
+                # ChromeDriver 的窗口句柄就是 targetId，个别版本不一致时按新增的句柄查找
+                if target_id not in self.driver.window_handles:
+                    target_id = (set(self.driver.window_handles) - handles).pop()
+                self.driver.switch_to.window(target_id)
+        except Exception as e:
+            logger.warning(f"创建隔离的浏览器上下文失败，改为截图后清除浏览数据: {e}")
+            if context_id is not None:
+                self._dispose_context(main_handle, context_id)
+            try:
+                yield
+            finally:
+                self._clear_browsing_data()
+            return
+        
+        # 新标签页有自己的 DevTools 会话，需要重新注入就绪检测脚本，拦截规则也从空开始
+        saved_state = (self.blocked_urls, self.readiness_instrumented)
+        self.blocked_urls = []
+        self._install_readiness_instrumentation()
+        try:
+            yield
+        finally:
+            self.blocked_urls, self.readiness_instrumented = saved_state
+            self._dispose_context(main_handle, context_id)
+    
+    def _dispose_context(self, main_handle: str, context_id: str):
+        """切回原标签页并销毁浏览器上下文（连同其中的标签页）"""
+        try:
+            self.driver.switch_to.window(main_handle)
+            self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except Exception as e:
+            logger.warning(f"销毁浏览器上下文失败: {e}")
+    
+    def _clear_browsing_data(self):
+        """清除 Cookie、缓存和当前页面来源的存储"""
+        try:
+            self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            self.driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            origin = self.driver.execute_script('return window.location.origin;')
+            if origin and origin != 'null':
+                self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': 'all'
+                })
+        except Exception as e:
+            logger.warning(f"清除浏览数据失败: {e}")
+    
+    def _install_readiness_instrumentation(self):
+        """注入就绪检测脚本，之后每次导航的新文档都会自动执行"""
+        try:
+            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+                'source': READINESS_INSTRUMENTATION_JS
+            })
+            self.readiness_instrumented = True
+        except Exception as e:
+            self.readiness_instrumented = False
+            logger.warning(f"注入就绪检测脚本失败，将只根据 readyState 判断: {e}")
+    
+    def _set_blocked_urls(self, patterns: List[str]):
+        """
+        设置拦截的URL通配符，与当前设置相同时不发送命令
+        
+        每次截图都会设置一次，空列表即解除上一个请求留下的拦截规则。
+        """
+        if patterns == self.blocked_urls:
+            return
+        if not self.blocked_urls:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+        self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+        self.blocked_urls = patterns
+        if patterns:
+            logger.info(f"拦截 {len(patterns)} 条URL规则")
+    
+    def _wait_until_ready(self, max_wait: float, wait_for_selector: Optional[str] = None,
+                          wait_for_function: Optional[str] = None,
+                          network_idle_ms: int = 500, dom_quiet_ms: int = 300) -> bool:
+        """
+        等待页面就绪
+        
+        综合 document.readyState、网络空闲、DOM静默以及可选的选择器/JS条件判断，
+        全部满足即返回；max_wait 只是上限。
+        
+        Args:
+            max_wait: 最长等待时间（秒）
+            wait_for_selector: 需要出现的CSS选择器
+            wait_for_function: 需要返回真值的JS表达式
+            network_idle_ms: 没有进行中请求且持续多久（毫秒）视为网络空闲
+            dom_quiet_ms: DOM持续多久（毫秒）没有变化视为静默
+            
+        Returns:
+            是否在超时前就绪
+        """
+        start = time.monotonic()
+        deadline = start + max_wait
+        script = readiness_state_js(wait_for_function)
+        
+        while True:
+            try:
+                state = self.driver.execute_script(script, wait_for_selector)
+            except WebDriverException:
+                # 页面仍在跳转时脚本可能执行失败，下一轮再试
+                state = None
+            
+            if state and self._is_ready(state, network_idle_ms, dom_quiet_ms):
+                logger.info(f"页面就绪，等待 {time.monotonic() - start:.2f}s")
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"页面在 {max_wait}s 内未就绪，继续截图，最后状态: {state}")
+                return False
+            time.sleep(min(self.READINESS_POLL_INTERVAL, remaining))
+    
+    @staticmethod
+    def _is_ready(state: dict, network_idle_ms: int, dom_quiet_ms: int) -> bool:
+        """根据页面状态判断是否就绪"""
+        if state.get('readyState') != 'complete':
+            return False
+        if not (state.get('selectorReady') and state.get('functionReady')):
+            return False
+        if not state.get('instrumented'):
+            return True
+        return (state.get('inflight', 0) == 0
+                and state.get('networkIdleFor', 0) >= network_idle_ms
+                and state.get('domQuietFor', 0) >= dom_quiet_ms)
+    
+    def _auto_scroll(self, budget: float, max_height: Optional[int] = None) -> bool:
+        """
+        按视口高度逐步滚动页面，触发懒加载的图片和 IntersectionObserver 内容
+        
+        每一步滚动后等两帧让页面发起请求，再等到这一步触发的请求完成（没有进行中的 fetch/XHR、
+        视口附近的图片都已加载，最长 AUTO_SCROLL_STEP_TIMEOUT 秒）才滚动下一步，而不是固定等待。
+        到达底部（或 max_height）且页面不再增长时停止，全程不超过 budget 秒，最后滚回顶部。
+        
+        Args:
+            budget: 滚动的时间预算（秒）
+            max_height: 只滚动到该高度（CSS像素）
+            
+        Returns:
+            是否在时间预算内滚动到了底部
+        """
+        deadline = time.monotonic() + budget
+        steps = 0
+        reached_bottom = False
+        try:
+            previous_y = -1
+            while True:
+                state = self._wait_scroll_settled(min(deadline, time.monotonic() + self.AUTO_SCROLL_STEP_TIMEOUT))
+                bottom = min(state['scrollHeight'], max_height) if max_height else state['scrollHeight']
+                if state['scrollY'] + state['viewportHeight'] >= bottom:
+                    reached_bottom = True
+                    break
+                # 页面不随窗口滚动（如内容在内部滚动容器中）时不再继续
+                if state['scrollY'] <= previous_y or time.monotonic() >= deadline:
+                    break
+                previous_y = state['scrollY']
+                self.driver.execute_async_script(SCROLL_TO_JS, state['scrollY'] + state['viewportHeight'])
+                steps += 1
+        finally:
+            self.driver.execute_async_script(SCROLL_TO_JS, 0)
+        
+        # 回到顶部后页面可能调整布局或补充请求，再短暂等待一次
+        self._wait_scroll_settled(min(deadline, time.monotonic() + self.AUTO_SCROLL_STEP_TIMEOUT))
+        if reached_bottom:
+            logger.info(f"自动滚动完成，{steps} 步")
+        else:
+            logger.warning(f"自动滚动在 {budget}s 内未到达页面底部，已滚动 {steps} 步")
+        return reached_bottom
+    
+    def _wait_scroll_settled(self, deadline: float) -> dict:
+        """
+        等待滚动触发的请求完成，到达 deadline（time.monotonic 时间）时不再等待
+        
+        Returns:
+            最后一次读取的页面状态（AUTO_SCROLL_STATE_JS）
+        """
+        while True:
+            state = self.driver.execute_script(AUTO_SCROLL_STATE_JS)
+            settled = state['pendingImages'] == 0 and (
+                not state['instrumented']
+                or (state['inflight'] == 0 and state['networkIdleFor'] >= self.AUTO_SCROLL_SETTLE_MS)
+            )
+            remaining = deadline - time.monotonic()
+            if settled or remaining <= 0:
+                return state
+            time.sleep(min(self.READINESS_POLL_INTERVAL, remaining))
+    
+    def _capture(self, image_format: str = 'png', quality: Optional[int] = None,
+                 clip: Optional[dict] = None, beyond_viewport: bool = False) -> bytes:
+        """
+        通过 DevTools 的 Page.captureScreenshot 截图，由浏览器直接编码为目标格式
+        
+        Args:
+            image_format: png、jpeg 或 webp
+            quality: jpeg/webp 的质量（1-100）
+            clip: 截图区域（CSS像素），为空时截取当前视口
+            beyond_viewport: 是否允许截取视口以外的内容
+            
+        Returns:
+            图片字节数据
+        """
+        params = {'format': image_format, 'fromSurface': True}
+        if image_format != 'png':
+            params['quality'] = quality or 80
+        if clip is not None:
+            params['clip'] = clip
+        if beyond_viewport:
+            params['captureBeyondViewport'] = True
+        
+        with self._phase('capture'):
+            result = self.driver.execute_cdp_cmd('Page.captureScreenshot', params)
+            return base64.b64decode(result['data'])
+    
+    def _layout_metrics(self) -> Tuple[dict, dict]:
+        """
+        读取页面布局尺寸（CSS像素）
+        
+        Returns:
+            (布局视口, 内容尺寸)
+        """
+        with self._phase('layout'):
+            metrics = self.driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+        viewport = metrics.get('cssLayoutViewport') or metrics['layoutViewport']
+        content = metrics.get('cssContentSize') or metrics['contentSize']
+        return viewport, content
+    
+    def _device_pixel_ratio(self) -> float:
+        """
+        页面的设备像素比（desktop-hq、mobile 等配置档为2）
+        
+        截图按设备像素输出：clip 的 CSS 尺寸 × clip.scale × 设备像素比。
+        """
+        try:
+            ratio = self.driver.execute_script('return window.devicePixelRatio;')
+        except WebDriverException as e:
+            logger.warning(f"读取设备像素比失败，按1处理: {e}")
+            return 1.0
+        return float(ratio) if ratio else 1.0
+    
+    def _viewport_png(self) -> bytes:
+        """通过 WebDriver 截取当前视口（DevTools 不可用时的退路）"""
+        with self._phase('capture'):
+            return self.driver.get_screenshot_as_png()
+    
+    def _encode_png(self, png: bytes, image_format: str, quality: Optional[int],
+                    scale: float = 1.0, max_width: Optional[int] = None,
+                    crop: Optional[Tuple[int, int, int, int]] = None) -> bytes:
+        """WebDriver 只能返回原尺寸的PNG，需要其他格式、缩放或裁剪时用 Pillow 处理"""
+        if image_format == 'png' and scale == 1 and not max_width and crop is None:
+            return png
+        with self._phase('encode'):
+            return transcode(png, image_format, quality, scale, max_width, crop)
+    
+    def _capture_viewport(self, image_format: str = 'png', quality: Optional[int] = None,
+                          scale: float = 1.0, max_width: Optional[int] = None) -> bytes:
+        """
+        截取当前视口
+        
+        需要缩放时用 clip 的 scale 让浏览器直接按目标尺寸渲染。scale 相对于设备像素输出，
+        max_width 是实际像素宽度，计算时计入设备像素比。
+        DevTools 不可用（或不支持目标格式）时退回到 WebDriver 截图加 Pillow 处理。
+        """
+        try:
+            if scale == 1 and not max_width:
+                return self._capture(image_format, quality)
+            
+            viewport, _ = self._layout_metrics()
+            width = viewport['clientWidth']
+            clip = {
+                'x': viewport['pageX'],
+                'y': viewport['pageY'],
+                'width': width,
+                'height': viewport['clientHeight'],
+                'scale': output_scale(width * self._device_pixel_ratio(), scale, max_width)
+            }
+            return self._capture(image_format, quality, clip)
+        except WebDriverException as e:
+            logger.warning(f"DevTools 截图失败，改用 WebDriver 截图: {e}")
+        return self._encode_png(self._viewport_png(), image_format, quality, scale, max_width)
+    
+    def _capture_full_page(self, image_format: str = 'png', quality: Optional[int] = None,
+                           scale: float = 1.0, max_width: Optional[int] = None,
+                           mode: str = 'auto', max_height: Optional[int] = None) -> bytes:
+        """
+        截取完整页面
+        
+        通过 DevTools 的 Page.captureScreenshot（captureBeyondViewport）按测量出的
+        内容高度直接截图，宽度保持当前视口宽度，不需要调整窗口大小和等待重新布局。
+        页面很高时一次截图会超出 Chromium 的纹理尺寸并占用大量内存，改为分段截图。
+        DevTools 不可用时退回到调整窗口大小的方式。
+        
+        Args:
+            mode: auto 按页面高度自动选择，single 一次截图，tiled 分段截图后拼接
+            max_height: 截取的最大高度（CSS像素），超出部分截断
+        
+        Returns:
+            图片字节数据
+        """
+        try:
+            viewport, content = self._layout_metrics()
+            width = viewport['clientWidth']
+            height = max(math.ceil(content['height']), viewport['clientHeight'])
+            if max_height:
+                height = min(height, max_height)
+            # clip.scale 之外浏览器还会乘以设备像素比，缩放比例和纹理尺寸都按设备像素计算
+            device_pixel_ratio = self._device_pixel_ratio()
+            ratio = output_scale(width * device_pixel_ratio, scale, max_width)
+            
+            if mode == 'tiled' or (
+                mode == 'auto' and height * ratio * device_pixel_ratio > self.TILED_CAPTURE_THRESHOLD
+            ):
+                return self._capture_tiled(width, viewport['clientHeight'], height, ratio, image_format, quality)
+            
+            screenshot = self._capture(
+                image_format, quality,
+                clip={'x': 0, 'y': 0, 'width': width, 'height': height, 'scale': ratio},
+                beyond_viewport=True
+            )
+            logger.info(f"完整页面尺寸: {width}x{height}，缩放: {ratio:.3f}")
+            return screenshot
+        except WebDriverException as e:
+            logger.warning(f"DevTools 完整页面截图失败，改为调整窗口大小: {e}")
+        
+        width = self.driver.get_window_size()['width']
+        total_height = self.driver.execute_script("return document.body.scrollHeight")
+        if max_height:
+            total_height = min(total_height, max_height)
+        with self._phase('layout'):
+            self.driver.set_window_size(width, total_height)
+            time.sleep(1)
+        return self._encode_png(self._viewport_png(), image_format, quality, scale, max_width)
+    
+    def _capture_tiled(self, width: int, segment_height: int, height: int, ratio: float,
+                       image_format: str = 'png', quality: Optional[int] = None) -> bytes:
+        """
+        分段截取完整页面并逐段拼接
+        
+        按视口高度逐段滚动截图，每段解码后立即写入流式PNG编码器，内存中只保留当前一段，
+        占用与页面总高度无关。第一段之后隐藏固定定位的元素（并取消粘性定位），
+        页头等元素只在顶部出现一次。jpeg/webp 需要在拼接完成后整体转码。
+        
+        Args:
+            width: 页面宽度（CSS像素）
+            segment_height: 每段高度（视口高度，CSS像素）
+            height: 截取的总高度（CSS像素）
+            ratio: clip 的缩放比例（浏览器还会再乘以设备像素比）
+        
+        Returns:
+            图片字节数据
+        """
+        output = BytesIO()
+        writer: Optional[PngStripWriter] = None
+        hidden = False
+        try:
+            for top in range(0, height, segment_height):
+                bottom = min(top + segment_height, height)
+                if top > 0 and not hidden:
+                    self.driver.execute_script(HIDE_FIXED_ELEMENTS_JS)
+                    hidden = True
+                
+                strip = self._capture_strip(top, bottom, width, ratio)
+                with self._phase('encode'):
+                    if writer is None:
+                        # 按第一段的实际宽度换算输出尺寸，兼容设备像素比不为1的配置档
+                        pixels = strip.width / width
+                        writer = PngStripWriter(output, strip.width, round(height * pixels))
+                    rows = round(bottom * pixels) - round(top * pixels)
+                    if rows > 0:
+                        writer.write(resize_image(strip, (writer.width, rows)))
+                strip.close()
+            
+            with self._phase('encode'):
+                writer.close()
+        finally:
+            if hidden:
+                try:
+                    self.driver.execute_script(RESTORE_FIXED_ELEMENTS_JS)
+                except WebDriverException as e:
+                    logger.warning(f"恢复固定定位元素失败: {e}")
+        
+        logger.info(f"分段截图完成: {width}x{height}，{math.ceil(height / segment_height)} 段，"
+                    f"缩放: {ratio:.3f}")
+        return self._encode_png(output.getvalue(), image_format, quality)
+    
+    def _capture_strip(self, top: int, bottom: int, width: int, ratio: float) -> Image.Image:
+        """
+        滚动到 top 并截取 [top, bottom) 这一段（CSS像素）
+        
+        DevTools 不可用时截取视口后按实际滚动位置裁剪。
+        
+        Returns:
+            解码后的图片
+        """
+        scroll_y = self.driver.execute_async_script(SCROLL_TO_JS, top) or 0
+        clip = {'x': 0, 'y': top, 'width': width, 'height': bottom - top, 'scale': ratio}
+        try:
+            data = self._capture('png', clip=clip)
+            crop = None
+        except WebDriverException as e:
+            logger.warning(f"DevTools 分段截图失败，改为截取视口后裁剪: {e}")
+            data = self._viewport_png()
+            crop = (top - scroll_y, bottom - scroll_y)
+        
+        with self._phase('encode'):
+            image = Image.open(BytesIO(data))
+            image.load()
+            if crop is not None:
+                # WebDriver 截图按设备像素输出，CSS 偏移换算成图片像素后裁剪
+                pixels = image.width / width
+                image = image.crop((0, round(crop[0] * pixels), image.width, round(crop[1] * pixels)))
+                if ratio != 1:
+                    image = resize_image(image, (max(1, round(image.width * ratio)), max(1, round(image.height * ratio))))
+        return image
+    
+    def _navigation_timing(self) -> Optional[dict]:
+        """读取当前页面的 Navigation Timing（毫秒），读取失败时返回None"""
+        try:
+            return self.driver.execute_script(NAVIGATION_TIMING_JS)
+        except WebDriverException as e:
+            logger.warning(f"读取 Navigation Timing 失败: {e}")
+            return None
+    
+    def _element_region(self, selector: str) -> Optional[dict]:
+        """
+        获取元素在页面中的区域
+        
+        Returns:
+            {'x', 'y', 'width', 'height'}（CSS像素），元素不存在或尺寸为0时返回None
+        """
+        region = self.driver.execute_script(ELEMENT_RECT_JS, selector)
+        if not region or region['width'] <= 0 or region['height'] <= 0:
+            return None
+        return region
+    
+    def _capture_region(self, region: dict, image_format: str = 'png', quality: Optional[int] = None,
+                        scale: float = 1.0, max_width: Optional[int] = None) -> bytes:
+        """
+        截取页面中的一个矩形区域，只渲染和编码该区域
+        
+        DevTools 不可用时把区域滚动到视口左上角，截取视口后用 Pillow 裁剪（按设备像素比换算），
+        此时超出视口的部分会被截断。
+        
+        Args:
+            region: {'x', 'y', 'width', 'height'}，相对文档左上角的CSS像素
+        """
+        device_pixel_ratio = self._device_pixel_ratio()
+        clip = {
+            'x': region['x'],
+            'y': region['y'],
+            'width': region['width'],
+            'height': region['height'],
+            'scale': output_scale(region['width'] * device_pixel_ratio, scale, max_width)
+        }
+        try:
+            screenshot = self._capture(image_format, quality, clip, beyond_viewport=True)
+            logger.info(f"区域截图: {region['width']}x{region['height']}@({region['x']},{region['y']})")
+            return screenshot
+        except WebDriverException as e:
+            logger.warning(f"DevTools 区域截图失败，改为截取视口后裁剪: {e}")
+        
+        offset = self.driver.execute_script(
+            "window.scrollTo(arguments[0], arguments[1]);"
+            "return [arguments[0] - window.scrollX, arguments[1] - window.scrollY];",
+            region['x'], region['y']
+        )
+        # 视口截图是设备像素，CSS 像素的区域需要乘以设备像素比
+        left, top = offset[0] * device_pixel_ratio, offset[1] * device_pixel_ratio
+        crop = (
+            int(left), int(top),
+            math.ceil(left + region['width'] * device_pixel_ratio),
+            math.ceil(top + region['height'] * device_pixel_ratio)
+        )
+        return self._encode_png(self._viewport_png(), image_format, quality, scale, max_width, crop)
+    
     def take_screenshot(self, url: str, wait_time: int = 3, full_page: bool = True, 
-                       viewport_width: int = None, viewport_height: int = None) -> Optional[bytes]:
+                       viewport_width: int = None, viewport_height: int = None,
+                       wait_strategy: str = 'auto', wait_for_selector: Optional[str] = None,
+                       wait_for_function: Optional[str] = None, network_idle_ms: int = 500,
+                       dom_quiet_ms: int = 300, image_format: str = 'png',
+                       quality: Optional[int] = None, scale: float = 1.0,
+                       max_width: Optional[int] = None, selector: Optional[str] = None,
+                       clip: Optional[dict] = None,
+                       block: Optional[List[str]] = None, isolate: bool = False,
+                       full_page_mode: str = 'auto', max_height: Optional[int] = None,
+                       auto_scroll: bool = False, auto_scroll_budget: float = 10,
+                       timer: Optional[PhaseTimer] = None) -> Optional[bytes]:
         """
         截取网页截图
         
         Args:
             url: 要截图的网址
-            wait_time: 等待页面加载的时间（秒）
+            wait_time: 等待页面加载的时间（秒），auto 模式下为最长等待时间
             full_page: 是否截取完整页面
             viewport_width: 视口宽度，如果指定则临时修改
             viewport_height: 视口高度，如果指定则临时修改
+            wait_strategy: 等待策略，auto 为自适应就绪检测，fixed 为固定等待 wait_time 秒
+            wait_for_selector: auto 模式下需要出现的CSS选择器
+            wait_for_function: auto 模式下需要返回真值的JS表达式
+            network_idle_ms: auto 模式下网络空闲的判定时长（毫秒）
+            dom_quiet_ms: auto 模式下DOM静默的判定时长（毫秒）
+            image_format: 输出格式，png、jpeg 或 webp
+            quality: jpeg/webp 的质量（1-100），默认80
+            scale: 输出缩放比例（相对于设备像素输出），由浏览器按缩放后的尺寸渲染
+            max_width: 输出的最大宽度（像素），超出时按比例缩小
+            selector: 只截取匹配该CSS选择器的第一个元素，优先于 clip 和 full_page
+            clip: 只截取该矩形区域 {'x', 'y', 'width', 'height'}（CSS像素），优先于 full_page
+            block: 拦截规则，资源类型（image、media、font、stylesheet）、trackers（内置跟踪器列表）或URL通配符
+            isolate: 在独立的浏览器上下文（类似隐身窗口）中截图，Cookie、localStorage、缓存不与其他请求共享
+            full_page_mode: 完整页面的截图方式，auto 按高度自动选择，single 一次截图，tiled 分段截图后拼接
+            max_height: 完整页面截取的最大高度（CSS像素），超出部分截断
+            auto_scroll: 就绪后先逐屏滚动页面，触发懒加载内容，完成后回到顶部再截图
+            auto_scroll_budget: 自动滚动的时间预算（秒）
+            timer: 阶段计时器，记录 setup、layout、navigate、readiness、scroll、capture、encode 各阶段耗时，
+                计时器要求时还会读取页面的 Navigation Timing
             
         Returns:
             截图的字节数据，失败时返回None
+            
+        Raises:
+            ElementNotFound: selector 没有匹配到可截图的元素
         """
+        self._timer = timer
         try:
             # 验证URL格式
             parsed_url = urlparse(url)
@@ -73,47 +837,95 @@ class ScreenshotService:
             
             logger.info(f"开始截取网页: {url}")
             
-            # 如果指定了视口大小，则临时修改窗口大小
-            if viewport_width is not None and viewport_height is not None:
-                self.driver.set_window_size(viewport_width, viewport_height)
-                logger.info(f"设置视口大小: {viewport_width}x{viewport_height}")
+            # 等待时间和滚动预算不超过上限，与看门狗时间的计算一致
+            wait_time = min(wait_time, self.max_wait_time)
+            auto_scroll_budget = min(auto_scroll_budget, self.MAX_AUTO_SCROLL_BUDGET)
             
-            # 访问网页
-            self.driver.get(url)
-            
-            # 等待页面加载
-            time.sleep(wait_time)
-            
-            # 等待页面元素加载完成
-            try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "body"))
-                )
-            except TimeoutException:
-                logger.warning("页面加载超时，继续截图")
-            
-            # 设置窗口大小
-            if full_page:
-                # 获取页面总高度
-                total_height = self.driver.execute_script("return document.body.scrollHeight")
-                self.driver.set_window_size(1920, total_height)
-                time.sleep(1)
-            
-            # 截取截图
-            screenshot = self.driver.get_screenshot_as_png()
-            logger.info(f"截图成功，大小: {len(screenshot)} bytes")
-            
-            return screenshot
+            # isolate 时在一次性的浏览器上下文中完成整个截图过程，看门狗防止浏览器卡死
+            self.pages_served += 1
+            call_timeout = self.call_budget(
+                self.call_timeout, self.page_load_timeout, wait_time,
+                auto_scroll, auto_scroll_budget, self.max_wait_time
+            )
+            with self._watchdog(call_timeout), self._isolation(isolate):
+                # 如果指定了视口大小，则临时修改窗口大小；否则恢复默认大小，
+                # 避免沿用上一个请求（或完整页面截图）留下的窗口尺寸
+                with self._phase('layout'):
+                    if viewport_width is not None and viewport_height is not None:
+                        self.driver.set_window_size(viewport_width, viewport_height)
+                        logger.info(f"设置视口大小: {viewport_width}x{viewport_height}")
+                    else:
+                        self.driver.set_window_size(self.viewport_width, self.viewport_height)
+                
+                # 设置请求拦截规则
+                with self._phase('setup'):
+                    self._set_blocked_urls(build_blocked_urls(block or []))
+                
+                # 访问网页
+                with self._phase('navigate'):
+                    self.driver.get(url)
+                
+                with self._phase('readiness'):
+                    # 等待页面加载
+                    if wait_strategy == 'fixed':
+                        time.sleep(wait_time)
+                    else:
+                        self._wait_until_ready(
+                            wait_time, wait_for_selector, wait_for_function,
+                            network_idle_ms, dom_quiet_ms
+                        )
+                    
+                    # 等待页面元素加载完成
+                    try:
+                        WebDriverWait(self.driver, self.BODY_WAIT_TIMEOUT).until(
+                            EC.presence_of_element_located((By.TAG_NAME, "body"))
+                        )
+                    except TimeoutException:
+                        logger.warning("页面加载超时，继续截图")
+                
+                if auto_scroll:
+                    with self._phase('scroll'):
+                        try:
+                            self._auto_scroll(auto_scroll_budget, max_height)
+                        except WebDriverException as e:
+                            logger.warning(f"自动滚动失败，直接截图: {e}")
+                
+                if self._timer is not None and self._timer.navigation_timing:
+                    self._timer.navigation = self._navigation_timing()
+                
+                # 截取截图
+                if selector:
+                    region = self._element_region(selector)
+                    if region is None:
+                        raise ElementNotFound(f"选择器 {selector} 没有匹配到可截图的元素（不存在或尺寸为0）")
+                    screenshot = self._capture_region(region, image_format, quality, scale, max_width)
+                elif clip:
+                    screenshot = self._capture_region(clip, image_format, quality, scale, max_width)
+                elif full_page:
+                    screenshot = self._capture_full_page(
+                        image_format, quality, scale, max_width, full_page_mode, max_height
+                    )
+                else:
+                    screenshot = self._capture_viewport(image_format, quality, scale, max_width)
+                logger.info(f"截图成功，格式: {image_format}，大小: {len(screenshot)} bytes")
+                
+                return screenshot
             
+        except ElementNotFound as e:
+            logger.warning(str(e))
+            raise
         except WebDriverException as e:
             logger.error(f"WebDriver 错误: {e}")
             return None
         except Exception as e:
             logger.error(f"截图失败: {e}")
             return None
+        finally:
+            self._timer = None
     
     def close(self):
         """关闭WebDriver"""
         if self.driver:
             self.driver.quit()
+            self.driver = None
             logger.info("WebDriver 已关闭")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同请求的合并执行（single-flight）
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    """一次正在执行的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用
+
+    同一个键同时只执行一次，执行期间到达的调用等待并共享同一个结果（或异常）。
+    执行结束后键即被移除，之后的调用会重新执行，结果的复用交给缓存负责。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 调用的键，相同的键视为相同的请求
+            fn: 实际执行的函数
+
+        Returns:
+            (结果, 是否共享了其他调用的结果)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    @property
+    def in_flight(self) -> int:
+        """正在执行的调用数"""
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight 的协程版本，只能在同一个事件循环中使用
+
+    等待结果的调用只是挂起的协程，不占用线程。实际执行放在独立的任务中，
+    发起调用的协程被取消（如客户端断开）时，其他等待者仍能拿到结果。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 调用的键，相同的键视为相同的请求
+            fn: 实际执行的协程函数
+
+        Returns:
+            (结果, 是否共享了其他调用的结果)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: str, task: asyncio.Future):
+        del self._calls[key]
+        # 所有等待者都已取消时，避免事件循环报告异常未被读取
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """正在执行的调用数"""
+        return len(self._calls)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+瓦片金字塔存储（DeepZoom 布局）
+"""
+
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+from app.core.image_codec import encode_image, resize_image
+
+logger = logging.getLogger(__name__)
+
+# 瓦片扩展名，jpeg 按 DeepZoom 的习惯使用 jpg
+TILE_EXTENSIONS = {
+    'png': 'png',
+    'jpeg': 'jpg',
+    'webp': 'webp'
+}
+
+DZI_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" Overlap="0" Format="{ext}">'
+    '<Size Width="{width}" Height="{height}"/></Image>\n'
+)
+
+
+def pyramid_levels(width: int, height: int, tile_size: int) -> Dict[str, int]:
+    """
+    计算金字塔层级
+
+    DeepZoom 第0层为1x1像素，最高层（max_level）为原图，每层边长是上一层的一半（向上取整）。
+    XYZ 的第0级是整张图片能放进一个瓦片的最高层（top_level），max_zoom 级对应原图。
+
+    Returns:
+        {'max_level', 'top_level', 'max_zoom'}
+    """
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    top_level = max(0, max_level - max(0, math.ceil(math.log2(max(width, height) / tile_size))))
+    return {'max_level': max_level, 'top_level': top_level, 'max_zoom': max_level - top_level}
+
+
+def level_size(width: int, height: int, max_level: int, level: int) -> tuple:
+    """DeepZoom 某一层的图片尺寸"""
+    factor = 2 ** (max_level - level)
+    return max(1, math.ceil(width / factor)), max(1, math.ceil(height / factor))
+
+
+class TileStore:
+    """
+    瓦片金字塔存储
+
+    每个金字塔一个目录，按截图内容和瓦片参数的哈希命名，内容相同时直接复用；
+    目录内是 image.dzi、manifest.json 和 image_files/<层级>/<列>_<行>.<扩展名>，
+    可以直接交给 OpenSeadragon 等查看器。超过有效期的金字塔在之后生成时被清理。
+    """
+
+    # 两次过期清理之间的最短间隔（秒）
+    CLEANUP_INTERVAL = 60
+
+    def __init__(self, directory: str, ttl: float, tile_size: int = 256):
+        """
+        Args:
+            directory: 存储目录
+            ttl: 金字塔的保留时间（秒）
+            tile_size: 瓦片边长（像素）
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.tile_size = tile_size
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def pyramid_id(self, data: bytes, image_format: str, quality: Optional[int]) -> str:
+        """由截图内容和瓦片参数计算金字塔ID（十六进制SHA-256）"""
+        digest = hashlib.sha256(f'{self.tile_size}:{image_format}:{quality}:'.encode('utf-8'))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, pyramid_id: str) -> str:
+        return os.path.join(self.directory, pyramid_id)
+
+    def get(self, pyramid_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取金字塔的描述信息
+
+        Returns:
+            manifest，不存在、ID不合法或已过期时返回None
+        """
+        if len(pyramid_id) != 64 or any(char not in '0123456789abcdef' for char in pyramid_id):
+            return None
+        path = os.path.join(self._path(pyramid_id), 'manifest.json')
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取瓦片金字塔失败: {e}")
+            return None
+
+    def file_path(self, pyramid_id: str, *parts: str) -> Optional[str]:
+        """金字塔目录中文件的路径，金字塔不存在或文件不存在时返回None"""
+        if self.get(pyramid_id) is None:
+            return None
+        path = os.path.join(self._path(pyramid_id), *parts)
+        return path if os.path.isfile(path) else None
+
+    def tile_path(self, pyramid_id: str, level: int, col: int, row: int) -> Optional[str]:
+        """DeepZoom 瓦片的路径，不存在时返回None"""
+        manifest = self.get(pyramid_id)
+        if manifest is None:
+            return None
+        path = os.path.join(self._path(pyramid_id), 'image_files', str(level), f"{col}_{row}.{manifest['extension']}")
+        return path if os.path.isfile(path) else None
+
+    def build(self, data: bytes, image_format: str = 'png', quality: Optional[int] = None) -> Dict[str, Any]:
+        """
+        从一张截图生成瓦片金字塔，已存在时直接返回
+
+        先写到临时目录，完成后整体改名，读取方不会看到生成了一半的金字塔。
+
+        Args:
+            data: 截图数据
+            image_format: 瓦片格式，png、jpeg 或 webp
+            quality: jpeg/webp 的质量
+
+        Returns:
+            manifest：{'id', 'width', 'height', 'tile_size', 'format', 'extension',
+            'max_level', 'top_level', 'max_zoom', 'tiles', 'created_at'}
+        """
+        pyramid_id = self.pyramid_id(data, image_format, quality)
+        manifest = self.get(pyramid_id)
+        if manifest is not None:
+            # 再次请求相同内容时延长保留时间
+            os.utime(os.path.join(self._path(pyramid_id), 'manifest.json'))
+            return manifest
+
+        self._cleanup()
+        path = self._path(pyramid_id)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            manifest = self._write(tmp_path, pyramid_id, data, image_format, quality)
+            if os.path.isdir(path):
+                # 过期的同名金字塔，内容相同，直接替换
+                shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        except OSError:
+            # 其他线程已生成了相同的金字塔
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            existing = self.get(pyramid_id)
+            if existing is None:
+                raise
+            return existing
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        logger.info(f"生成瓦片金字塔 {pyramid_id[:12]}: {manifest['width']}x{manifest['height']}，"
+                    f"{manifest['tiles']} 个瓦片")
+        return manifest
+
+    def _write(self, directory: str, pyramid_id: str, data: bytes, image_format: str,
+               quality: Optional[int]) -> Dict[str, Any]:
+        """把各层瓦片写入目录，从原图逐层缩小一半"""
+        extension = TILE_EXTENSIONS[image_format]
+        tile_size = self.tile_size
+        tiles = 0
+
+        with Image.open(BytesIO(data)) as source:
+            width, height = source.size
+            levels = pyramid_levels(width, height, tile_size)
+            image = source.convert('RGB')
+
+        for level in range(levels['max_level'], -1, -1):
+            level_image = resize_image(image, level_size(width, height, levels['max_level'], level))
+            level_dir = os.path.join(directory, 'image_files', str(level))
+            os.makedirs(level_dir)
+            for row in range(math.ceil(level_image.height / tile_size)):
+                for col in range(math.ceil(level_image.width / tile_size)):
+                    box = (col * tile_size, row * tile_size,
+                           min((col + 1) * tile_size, level_image.width),
+                           min((row + 1) * tile_size, level_image.height))
+                    with open(os.path.join(level_dir, f'{col}_{row}.{extension}'), 'wb') as f:
+                        f.write(encode_image(level_image.crop(box), image_format, quality))
+                    tiles += 1
+            # 下一层从这一层缩小，不再保留更大的图
+            image = level_image
+
+        manifest = {
+            'id': pyramid_id,
+            'width': width,
+            'height': height,
+            'tile_size': tile_size,
+            'format': image_format,
+            'extension': extension,
+            **levels,
+            'tiles': tiles,
+            'created_at': time.time()
+        }
+        with open(os.path.join(directory, 'image.dzi'), 'w', encoding='utf-8') as f:
+            f.write(DZI_TEMPLATE.format(tile_size=tile_size, ext=extension, width=width, height=height))
+        # manifest 最后写入，它的修改时间就是金字塔的生成时间
+        with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        return manifest
+
+    def _cleanup(self):
+        """删除过期的金字塔，间隔不足 CLEANUP_INTERVAL 时跳过"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < self.CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = now
+
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stored_at = os.stat(os.path.join(path, 'manifest.json')).st_mtime
+            except FileNotFoundError:
+                # 生成失败残留的临时目录
+                if name.endswith('.tmp') and now - os.path.getmtime(path) > self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            except OSError:
+                continue
+            if now - stored_at > self.ttl:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"清理过期瓦片金字塔 {removed} 个")
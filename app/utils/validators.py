@@ -6,7 +6,7 @@
 
 import re
 from urllib.parse import urlparse
-from typing import Optional, Tuple
+from typing import Any, List, Optional, Tuple
 
 
 def validate_url(url: str) -> Tuple[bool, Optional[str]]:
@@ -61,20 +61,271 @@ def validate_viewport_size(width: int, height: int) -> Tuple[bool, Optional[str]
     return True, None
 
 
-def validate_wait_time(wait_time: int) -> Tuple[bool, Optional[str]]:
+def validate_wait_time(wait_time: Any, limit: float = 60) -> Tuple[bool, Optional[str]]:
     """
     验证等待时间
     
     Args:
         wait_time: 等待时间（秒）
+        limit: 服务允许的最长等待时间（秒）
         
     Returns:
         (是否有效, 错误信息)
     """
+    if isinstance(wait_time, bool) or not isinstance(wait_time, (int, float)):
+        return False, "等待时间必须是数字"
+    
     if wait_time < 0:
         return False, "等待时间不能为负数"
     
-    if wait_time > 60:
-        return False, "等待时间不能超过60秒"
+    if wait_time > limit:
+        return False, f"等待时间不能超过{limit}秒"
+    
+    return True, None
+
+
+def validate_milliseconds(value: Any, name: str, limit: int = 10000) -> Tuple[bool, Optional[str]]:
+    """
+    验证毫秒时长参数
+    
+    Args:
+        value: 参数值（毫秒）
+        name: 参数名，用于错误信息
+        limit: 允许的最大值
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= limit:
+        return False, f"{name} 必须是0-{limit}之间的整数（毫秒）"
+    
+    return True, None
+
+
+def validate_wait_strategy(wait_strategy: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证等待策略
+    
+    Args:
+        wait_strategy: 等待策略
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if wait_strategy not in ('auto', 'fixed'):
+        return False, "等待策略必须是 auto 或 fixed"
+    
+    return True, None
+
+
+def validate_cache_mode(cache_mode: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证缓存控制参数
+    
+    Args:
+        cache_mode: 缓存控制参数
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if cache_mode not in ('default', 'bypass', 'refresh'):
+        return False, "缓存控制参数必须是 default、bypass 或 refresh"
+    
+    return True, None
+
+
+def validate_return_format(return_format: str, tiles_enabled: bool = True) -> Tuple[bool, Optional[str]]:
+    """
+    验证返回格式
+    
+    Args:
+        return_format: 返回格式
+        tiles_enabled: 是否配置了瓦片存储
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if return_format not in ('base64', 'file', 'tiles'):
+        return False, "返回格式必须是 base64、file 或 tiles"
+    
+    if return_format == 'tiles' and not tiles_enabled:
+        return False, "未配置瓦片存储（TILE_STORE_DIR），不支持 tiles 返回格式"
+    
+    return True, None
+
+
+def validate_image_format(image_format: str, quality: Optional[int] = None) -> Tuple[bool, Optional[str]]:
+    """
+    验证图片格式和质量
+    
+    Args:
+        image_format: 图片格式
+        quality: jpeg/webp 的压缩质量
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if image_format not in ('png', 'jpeg', 'webp'):
+        return False, "图片格式必须是 png、jpeg 或 webp"
+    
+    if quality is not None and (not isinstance(quality, int) or not 1 <= quality <= 100):
+        return False, "图片质量必须是1-100之间的整数"
+    
+    return True, None
+
+
+def validate_scale(scale: float, max_width: Optional[int] = None) -> Tuple[bool, Optional[str]]:
+    """
+    验证输出缩放参数
+    
+    Args:
+        scale: 缩放比例
+        max_width: 输出的最大宽度
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if not isinstance(scale, (int, float)) or not 0.1 <= scale <= 2:
+        return False, "缩放比例必须在0.1到2之间"
+    
+    if max_width is not None and (not isinstance(max_width, int) or not 16 <= max_width <= 4096):
+        return False, "最大宽度必须是16-4096之间的整数"
+    
+    return True, None
+
+
+def validate_full_page(mode: str, max_height: Optional[int], limit: int) -> Tuple[bool, Optional[str]]:
+    """
+    验证完整页面截图参数
+    
+    Args:
+        mode: 截图方式
+        max_height: 截取的最大高度（CSS像素）
+        limit: 服务允许的最大高度
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if mode not in ('auto', 'single', 'tiled'):
+        return False, "完整页面截图方式必须是 auto、single 或 tiled"
+    
+    if isinstance(max_height, bool) or not isinstance(max_height, int) or not 1 <= max_height <= limit:
+        return False, f"最大高度必须是1-{limit}之间的整数"
+    
+    return True, None
+
+
+def validate_auto_scroll(auto_scroll: Any, budget: Any) -> Tuple[bool, Optional[str]]:
+    """
+    验证自动滚动参数
+    
+    Args:
+        auto_scroll: 是否自动滚动
+        budget: 时间预算（秒）
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if not isinstance(auto_scroll, bool):
+        return False, "auto_scroll 必须是布尔值"
+    
+    if isinstance(budget, bool) or not isinstance(budget, (int, float)) or not 0 < budget <= 60:
+        return False, "自动滚动的时间预算必须在0到60秒之间"
+    
+    return True, None
+
+
+def validate_thumbnail_widths(widths: List[int]) -> Tuple[bool, Optional[str]]:
+    """
+    验证缩略图宽度列表
+    
+    Args:
+        widths: 缩略图宽度列表
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if len(widths) > 8:
+        return False, "缩略图最多8个尺寸"
+    
+    for width in widths:
+        if not isinstance(width, int) or not 16 <= width <= 4096:
+            return False, "缩略图宽度必须是16-4096之间的整数"
+    
+    return True, None
+
+
+def validate_clip(clip: Any) -> Tuple[bool, Optional[str]]:
+    """
+    验证截图区域
+    
+    Args:
+        clip: {'x', 'y', 'width', 'height'}，为None时表示不限制区域
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if clip is None:
+        return True, None
+    
+    if not isinstance(clip, dict):
+        return False, "clip 必须是包含 x、y、width、height 的对象"
+    
+    for key in ('x', 'y', 'width', 'height'):
+        value = clip.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False, f"clip.{key} 必须是数字"
+    
+    if clip['x'] < 0 or clip['y'] < 0:
+        return False, "clip 的坐标不能为负数"
+    
+    if clip['width'] <= 0 or clip['height'] <= 0:
+        return False, "clip 的宽高必须大于0"
+    
+    if clip['width'] > 16384 or clip['height'] > 16384:
+        return False, "clip 的宽高不能超过16384像素"
+    
+    return True, None
+
+
+def validate_block_rules(rules: Any) -> Tuple[bool, Optional[str]]:
+    """
+    验证请求拦截规则
+    
+    Args:
+        rules: 规则列表，每项为资源类型（image、media、font、stylesheet）、
+               trackers 或URL通配符
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if not isinstance(rules, list):
+        return False, "block 必须是规则列表"
+    
+    if len(rules) > 100:
+        return False, "拦截规则最多100条"
+    
+    for rule in rules:
+        if not isinstance(rule, str) or not rule or len(rule) > 512:
+            return False, "拦截规则必须是长度不超过512的非空字符串"
+        if rule not in ('image', 'media', 'font', 'stylesheet', 'trackers') and not re.search(r'[*./]', rule):
+            return False, f"未知的拦截规则: {rule}，应为 image、media、font、stylesheet、trackers 或URL通配符"
+    
+    return True, None
+
+
+def validate_boolean(value: Any, name: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证布尔参数
+    
+    Args:
+        value: 参数值
+        name: 参数名，用于错误信息
+        
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if not isinstance(value, bool):
+        return False, f"{name} 必须是布尔值"
     
     return True, None
@@ -5,6 +5,7 @@
 """
 
 import os
+import json
 from typing import Dict, Any
 
 
@@ -20,22 +21,123 @@ class Config:
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 9000))
     
+    # 服务前端：flask（Flask 内置服务器，每个请求一个线程）或 async（aiohttp 事件循环，截图请求不占用线程）
+    SERVER_MODE = os.environ.get('SERVER_MODE', 'flask')
+    ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 16))  # async 模式下执行其余 Flask 接口的线程数
+    ASYNC_STREAM_THREADS = int(os.environ.get('ASYNC_STREAM_THREADS', 16))  # async 模式下读取流式响应（批量截图等）的线程数
+    
     # 截图服务配置
     DEFAULT_VIEWPORT_WIDTH = int(os.environ.get('DEFAULT_VIEWPORT_WIDTH', 1920))
     DEFAULT_VIEWPORT_HEIGHT = int(os.environ.get('DEFAULT_VIEWPORT_HEIGHT', 1080))
     DEFAULT_WAIT_TIME = int(os.environ.get('DEFAULT_WAIT_TIME', 3))
     MAX_WAIT_TIME = int(os.environ.get('MAX_WAIT_TIME', 60))
     
-    # Chrome配置
+    # 页面就绪检测配置：auto 为自适应检测（wait_time 作为上限），fixed 为固定等待
+    DEFAULT_WAIT_STRATEGY = os.environ.get('DEFAULT_WAIT_STRATEGY', 'auto')
+    NETWORK_IDLE_MS = int(os.environ.get('NETWORK_IDLE_MS', 500))
+    DOM_QUIET_MS = int(os.environ.get('DOM_QUIET_MS', 300))
+    AUTO_SCROLL_BUDGET = float(os.environ.get('AUTO_SCROLL_BUDGET', 10))  # auto_scroll 的默认时间预算（秒）
+    
+    # 图片输出配置
+    DEFAULT_IMAGE_QUALITY = int(os.environ.get('DEFAULT_IMAGE_QUALITY', 80))  # jpeg/webp 默认压缩质量
+    MAX_PAGE_HEIGHT = int(os.environ.get('MAX_PAGE_HEIGHT', 50000))  # 完整页面截取的最大高度（CSS像素），请求可以调低
+    
+    # 浏览器池配置
+    BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', min(4, os.cpu_count() or 1)))
+    BROWSER_POOL_TIMEOUT = int(os.environ.get('BROWSER_POOL_TIMEOUT', 30))  # 等待空闲浏览器的最长时间（秒）
+    
+    # 浏览器健康监控和回收配置
+    PAGE_LOAD_TIMEOUT = int(os.environ.get('PAGE_LOAD_TIMEOUT', 30))  # 页面加载超时（秒）
+    BROWSER_CALL_TIMEOUT = int(os.environ.get('BROWSER_CALL_TIMEOUT', 90))  # 单次截图看门狗（秒），超时强制结束浏览器
+    BROWSER_MAX_PAGES = int(os.environ.get('BROWSER_MAX_PAGES', 500))  # 渲染多少个页面后重启浏览器，0为不限制
+    BROWSER_MAX_RSS_MB = int(os.environ.get('BROWSER_MAX_RSS_MB', 1024))  # 浏览器进程树内存上限（MB），0为不限制
+    BROWSER_HEALTH_INTERVAL = int(os.environ.get('BROWSER_HEALTH_INTERVAL', 30))  # 空闲实例健康检查间隔（秒）
+    
+    # 启动预热配置：启动时先完整截取一次本地测试页面（WARMUP_URL 为空时使用内置页面）
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+    WARMUP_URL = os.environ.get('WARMUP_URL', '')
+    
+    # 渲染模式：thread（进程内浏览器池）或 process（每个浏览器一个独立工作进程）
+    RENDER_MODE = os.environ.get('RENDER_MODE', 'thread')
+    RENDER_TIMEOUT = int(os.environ.get('RENDER_TIMEOUT', 120))  # process模式下单次渲染的最长时间（秒）
+    
+    # 截图缓存配置（内存LRU + 磁盘两级，CACHE_DISK_DIR 为空时只使用内存层）
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 3600))  # 缓存有效期（秒）
+    CACHE_MEMORY_MAX_BYTES = int(os.environ.get('CACHE_MEMORY_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_DISK_DIR = os.environ.get('CACHE_DISK_DIR', '/tmp/websnap-cache')
+    CACHE_DISK_MAX_BYTES = int(os.environ.get('CACHE_DISK_MAX_BYTES', 1024 * 1024 * 1024))
+    
+    # 瓦片金字塔输出配置（format 为 tiles 时使用，TILE_STORE_DIR 为空时不启用）
+    TILE_STORE_DIR = os.environ.get('TILE_STORE_DIR', '/tmp/websnap-tiles')
+    TILE_STORE_TTL = int(os.environ.get('TILE_STORE_TTL', 24 * 3600))  # 金字塔保留时间（秒）
+    TILE_SIZE = int(os.environ.get('TILE_SIZE', 256))  # 瓦片边长（像素）
+    
+    # 默认是否在独立的浏览器上下文中截图（请求间不共享 Cookie、存储和缓存）
+    DEFAULT_ISOLATE = os.environ.get('DEFAULT_ISOLATE', 'false').lower() == 'true'
+    
+    # 默认请求拦截规则（逗号分隔，如 trackers,font），请求未指定 block 时使用
+    DEFAULT_BLOCK = [rule for rule in os.environ.get('DEFAULT_BLOCK', '').split(',') if rule]
+    
+    # 异步任务配置
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 100))  # 排队任务上限，超出返回429
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 600))  # 任务结果保留时间（秒）
+    
+    # 批量截图配置
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 500))  # 单次批量请求的最大项数
+    
+    # Chrome配置（所有配置档共用的启动参数）
+    CHROME_BINARY = os.environ.get('CHROME_BINARY', '/usr/bin/chromium')
     CHROME_OPTIONS = [
         '--headless',
         '--no-sandbox',
         '--disable-dev-shm-usage',
         '--disable-gpu',
+        '--disable-web-security',
+        '--disable-features=VizDisplayCompositor',
         '--disable-extensions',
         '--disable-plugins',
-        '--disable-images',  # 可选：禁用图片加载以提高速度
-        '--disable-javascript',  # 可选：禁用JavaScript
+    ]
+    USER_AGENT = os.environ.get(
+        'USER_AGENT',
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/91.0.4472.124 Safari/537.36'
+    )
+    
+    # 渲染配置档：每个配置档有自己的附加启动参数、默认视口、等待策略和独立的浏览器池，
+    # 未设置的项使用上面的全局默认值。可通过 RENDER_PROFILES_JSON 环境变量新增或覆盖配置档
+    RENDER_PROFILES: Dict[str, Dict[str, Any]] = {
+        'default': {},
+        'fast': {
+            'chrome_options': ['--blink-settings=imagesEnabled=false'],
+            'block': ['image', 'media', 'font'],
+            'viewport_width': 1280,
+            'viewport_height': 720,
+            'wait_time': 2,
+            'pool_size': 1
+        },
+        'desktop-hq': {
+            'chrome_options': ['--force-device-scale-factor=2', '--hide-scrollbars'],
+            'viewport_width': 1920,
+            'viewport_height': 1080,
+            'wait_time': 10,
+            'pool_size': 1
+        },
+        'mobile': {
+            'chrome_options': ['--force-device-scale-factor=2', '--hide-scrollbars'],
+            'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 '
+                          '(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1',
+            'viewport_width': 390,
+            'viewport_height': 844,
+            'wait_time': 5,
+            'pool_size': 1
+        },
+        **json.loads(os.environ.get('RENDER_PROFILES_JSON', '{}'))
+    }
+    DEFAULT_RENDER_PROFILE = os.environ.get('DEFAULT_RENDER_PROFILE', 'default')
+    # 启动时预先创建浏览器池的配置档（逗号分隔），默认配置档总是启用
+    ENABLED_RENDER_PROFILES = [
+        name for name in os.environ.get('ENABLED_RENDER_PROFILES', 'default').split(',') if name
     ]
     
     # 日志配置
@@ -62,6 +164,7 @@ class ProductionConfig(Config):
     """生产环境配置"""
     DEBUG = False
     LOG_LEVEL = 'WARNING'
+    SERVER_MODE = os.environ.get('SERVER_MODE', 'async')
 
 
 class TestingConfig(Config):
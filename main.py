@@ -7,7 +7,6 @@ WebSnap 主入口
 import os
 import logging
 from app.app import create_app
-from app.core.screenshot_service import ScreenshotService
 from config.settings import config
 
 # 配置日志
@@ -17,16 +16,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 创建Flask应用
+# 创建Flask应用（不启动浏览器）
 app = create_app(os.environ.get('FLASK_ENV', 'default'))
 
-# 创建全局截图服务实例
-screenshot_service = ScreenshotService()
+# 截图服务运行时，浏览器池由它统一启动和关闭
+runtime = app.extensions['websnap']
 
 
 def cleanup():
     """清理资源"""
-    screenshot_service.close()
+    runtime.close()
 
 
 if __name__ == '__main__':
@@ -36,11 +35,21 @@ if __name__ == '__main__':
         logger.info(f"环境: {os.environ.get('FLASK_ENV', 'default')}")
         logger.info(f"端口: {config_class.PORT}")
         
-        app.run(
-            host=config_class.HOST,
-            port=config_class.PORT,
-            debug=config_class.DEBUG
-        )
+        if config_class.SERVER_MODE == 'async':
+            # 截图请求在事件循环中排队等待浏览器，不占用线程；其余接口桥接到 Flask
+            from app.async_server import run_async_server
+            logger.info("服务前端: async")
+            run_async_server(app, config_class.HOST, config_class.PORT)
+        else:
+            # debug 模式下 reloader 的父进程只负责监控文件，浏览器只在实际处理请求的子进程中启动
+            if not config_class.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+                runtime.start()
+            
+            app.run(
+                host=config_class.HOST,
+                port=config_class.PORT,
+                debug=config_class.DEBUG
+            )
     except KeyboardInterrupt:
         logger.info("服务正在关闭...")
     finally:
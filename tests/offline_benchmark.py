@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSnap 离线基准测试
+
+启动本地HTTP夹具服务器提供几类有代表性的页面，不依赖外网和已运行的服务：
+- static: 纯静态图文页面
+- images: 大量图片（每张图片有网络延迟）
+- spa: 单页应用，内容由延迟返回的XHR渲染
+- tall: 超长页面，完整页面截图
+- tall-tiled: 同一超长页面，分段滚动截图后拼接
+- lazy: 懒加载图片
+- lazy-scroll: 同一懒加载页面，截图前自动滚动
+- cjk: 中文长文，使用多种字重的字体
+
+在当前进程中分别直接调用 ScreenshotService（service 模式）和通过 HTTP API（api 模式，
+经过浏览器池并发）截图，统计 p50/p95/p99 延迟和吞吐量，可保存为JSON基线并与基线对比，
+超出阈值时以非零状态码退出，便于在CI中使用。
+
+用法:
+    python tests/offline_benchmark.py --save-baseline tests/benchmark_baseline.json
+    python tests/offline_benchmark.py --baseline tests/benchmark_baseline.json
+    python tests/offline_benchmark.py --mode api --concurrency 4 --scenarios spa,tall
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 默认的回归阈值：p95 延迟变慢或吞吐量下降超过该比例视为回归
+DEFAULT_TOLERANCE = 0.25
+
+# 系统中常见的中文字体位置，找到时作为 cjk 页面的网络字体提供
+CJK_FONT_CANDIDATES = [
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/wqy-microhei/wqy-microhei.ttc',
+    '/System/Library/Fonts/PingFang.ttc'
+]
+
+CJK_TEXT = '网页截图服务需要在页面完全渲染后再截图，字体、图片和异步数据都会影响等待时间。'
+
+PAGE_STYLE = """
+<style>
+body { margin: 0; font-family: sans-serif; color: #222; }
+header { background: #2d6cdf; color: #fff; padding: 24px 40px; }
+section { padding: 24px 40px; border-bottom: 1px solid #eee; }
+.grid { display: flex; flex-wrap: wrap; gap: 12px; }
+.grid img { width: 280px; height: 210px; }
+</style>
+"""
+
+
+def _page(title: str, body: str, head: str = '') -> str:
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'{PAGE_STYLE}{head}</head><body><header><h1>{title}</h1></header>{body}</body></html>')
+
+
+def _static_page() -> str:
+    sections = ''.join(
+        f'<section><h2>段落 {index}</h2><p>{"Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8}</p>'
+        f'<ul>{"".join(f"<li>条目 {item}</li>" for item in range(5))}</ul></section>'
+        for index in range(12)
+    )
+    return _page('static', sections)
+
+
+def _images_page() -> str:
+    images = ''.join(f'<img src="/img/{index}.png?delay=80" alt="{index}">' for index in range(40))
+    return _page('images', f'<section class="grid">{images}</section>')
+
+
+def _spa_page() -> str:
+    script = """
+<script>
+function render(items) {
+    var list = document.getElementById('app');
+    items.forEach(function (item) {
+        var element = document.createElement('div');
+        element.className = 'item';
+        element.textContent = item;
+        list.appendChild(element);
+    });
+}
+setTimeout(function () {
+    fetch('/api/items?delay=600&count=30').then(function (r) { return r.json(); }).then(function (data) {
+        render(data.items);
+        var xhr = new XMLHttpRequest();
+        xhr.open('GET', '/api/items?delay=300&count=20');
+        xhr.onload = function () { render(JSON.parse(xhr.responseText).items); };
+        xhr.send();
+    });
+}, 200);
+</script>
+"""
+    return _page('spa', '<section id="app"></section>' + script)
+
+
+def _tall_page() -> str:
+    sections = ''.join(
+        f'<section style="height: 600px; background: hsl({index * 7 % 360}, 60%, 92%)">'
+        f'<h2>区块 {index}</h2><p>{"长页面内容。" * 40}</p></section>'
+        for index in range(50)
+    )
+    return _page('tall', sections)
+
+
+def _lazy_page() -> str:
+    native = ''.join(f'<img loading="lazy" src="/img/{index}.png?delay=50" alt="">' for index in range(24))
+    observed = ''.join(f'<img class="lazy" data-src="/img/{index + 100}.png?delay=50" alt="">' for index in range(24))
+    script = """
+<script>
+var observer = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+            entry.target.src = entry.target.dataset.src;
+            observer.unobserve(entry.target);
+        }
+    });
+});
+document.querySelectorAll('img.lazy').forEach(function (img) { observer.observe(img); });
+</script>
+"""
+    return _page('lazy', f'<section style="height: 1500px">首屏</section>'
+                         f'<section class="grid">{native}</section><section class="grid">{observed}</section>' + script)
+
+
+def _cjk_page() -> str:
+    head = """
+<style>
+@font-face { font-family: 'BenchCJK'; src: url('/fonts/cjk?delay=300') ; font-weight: 400; }
+@font-face { font-family: 'BenchCJK'; src: url('/fonts/cjk?delay=300&weight=700') ; font-weight: 700; }
+body { font-family: 'BenchCJK', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei', sans-serif; }
+p { font-size: 18px; line-height: 1.8; }
+</style>
+"""
+    sections = ''.join(
+        f'<section><h2>第 {index} 章</h2><p>{CJK_TEXT * 12}</p><p><b>{CJK_TEXT * 4}</b></p></section>'
+        for index in range(20)
+    )
+    return _page('cjk', sections, head)
+
+
+PAGES = {
+    '/static.html': _static_page,
+    '/images.html': _images_page,
+    '/spa.html': _spa_page,
+    '/tall.html': _tall_page,
+    '/lazy.html': _lazy_page,
+    '/cjk.html': _cjk_page
+}
+
+# 场景：页面路径和截图参数
+SCENARIOS = {
+    'static': {'path': '/static.html', 'options': {'full_page': False}},
+    'images': {'path': '/images.html', 'options': {'full_page': True}},
+    'spa': {'path': '/spa.html', 'options': {'full_page': False, 'wait_for_selector': '#app .item'}},
+    'tall': {'path': '/tall.html', 'options': {'full_page': True}},
+    'tall-tiled': {'path': '/tall.html', 'options': {'full_page': True, 'full_page_mode': 'tiled'}},
+    'lazy': {'path': '/lazy.html', 'options': {'full_page': True}},
+    'lazy-scroll': {'path': '/lazy.html', 'options': {'full_page': True, 'auto_scroll': True}},
+    'cjk': {'path': '/cjk.html', 'options': {'full_page': True}}
+}
+
+
+class FixtureServer:
+    """在后台线程运行的本地夹具服务器，监听 127.0.0.1 的随机端口"""
+
+    def __init__(self):
+        self._images: Dict[int, bytes] = {}
+        self._font = self._load_font()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fixture-server', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @staticmethod
+    def _load_font() -> Optional[bytes]:
+        for path in CJK_FONT_CANDIDATES:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+        return None
+
+    def _image(self, index: int) -> bytes:
+        """生成纯色PNG，按编号缓存"""
+        if index not in self._images:
+            from PIL import Image
+            buffer = io.BytesIO()
+            Image.new('RGB', (560, 420), ((index * 37) % 256, (index * 91) % 256, (index * 53) % 256)).save(buffer, 'PNG')
+            self._images[index] = buffer.getvalue()
+        return self._images[index]
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                time.sleep(int(query.get('delay', ['0'])[0]) / 1000)
+
+                if parsed.path in PAGES:
+                    self._send(200, PAGES[parsed.path]().encode('utf-8'), 'text/html; charset=utf-8')
+                elif parsed.path.startswith('/img/'):
+                    index = int(parsed.path[len('/img/'):].split('.')[0])
+                    self._send(200, fixture._image(index), 'image/png')
+                elif parsed.path == '/api/items':
+                    count = int(query.get('count', ['10'])[0])
+                    body = json.dumps({'items': [f'数据 {index}' for index in range(count)]})
+                    self._send(200, body.encode('utf-8'), 'application/json')
+                elif parsed.path == '/fonts/cjk' and fixture._font is not None:
+                    self._send(200, fixture._font, 'font/collection')
+                else:
+                    self._send(404, b'not found', 'text/plain')
+
+        return Handler
+
+    def start(self) -> 'FixtureServer':
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentile(values: List[float], p: float) -> float:
+    """线性插值的百分位数，p 取 0-100"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    """统计一个场景的延迟分布和吞吐量"""
+    stats: Dict[str, Any] = {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput': len(latencies) / wall_seconds if wall_seconds > 0 else 0.0
+    }
+    if latencies:
+        stats.update(
+            p50=percentile(latencies, 50),
+            p95=percentile(latencies, 95),
+            p99=percentile(latencies, 99),
+            mean=sum(latencies) / len(latencies),
+            max=max(latencies)
+        )
+    return stats
+
+
+def run_service_benchmark(base_url: str, scenarios: List[str], iterations: int) -> Dict[str, Dict[str, Any]]:
+    """直接调用单个 ScreenshotService 依次截图，测量渲染本身的耗时"""
+    from app.core.screenshot_service import ScreenshotService
+    from config.settings import Config
+
+    service = ScreenshotService(
+        Config.DEFAULT_VIEWPORT_WIDTH, Config.DEFAULT_VIEWPORT_HEIGHT,
+        chrome_options=Config.CHROME_OPTIONS,
+        user_agent=Config.USER_AGENT,
+        binary_location=Config.CHROME_BINARY,
+        page_load_timeout=Config.PAGE_LOAD_TIMEOUT
+    )
+    results = {}
+    try:
+        for name in scenarios:
+            scenario = SCENARIOS[name]
+            url = base_url + scenario['path']
+            options = dict(scenario['options'], wait_time=10)
+            # 第一次截图不计入统计
+            service.take_screenshot(url, **options)
+
+            latencies, errors = [], 0
+            started = time.perf_counter()
+            for _ in range(iterations):
+                request_started = time.perf_counter()
+                if service.take_screenshot(url, **options) is None:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - request_started)
+            results[name] = summarize(latencies, errors, time.perf_counter() - started)
+            _print_stats('service', name, results[name])
+    finally:
+        service.close()
+    return results
+
+
+def run_api_benchmark(base_url: str, scenarios: List[str], iterations: int,
+                      concurrency: int) -> Dict[str, Dict[str, Any]]:
+    """通过 HTTP API（Flask test client）并发截图，包含浏览器池排队和响应构造的开销"""
+    from app.app import create_app
+
+    app = create_app('production')
+    runtime = app.extensions['websnap']
+    runtime.start(wait=True)
+    if not runtime.ready:
+        raise RuntimeError(f"截图服务启动失败: {runtime.error}")
+
+    def request_once(url: str, options: Dict[str, Any]) -> Tuple[bool, float]:
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post(
+            '/api/v1/screenshot/screenshot',
+            json=dict(options, url=url, wait_time=10, cache='bypass'),
+            headers={'Accept': 'image/png'}
+        )
+        response.get_data()
+        return response.status_code == 200, time.perf_counter() - started
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark') as executor:
+            for name in scenarios:
+                scenario = SCENARIOS[name]
+                url = base_url + scenario['path']
+                # 每个浏览器先截一次，不计入统计
+                list(executor.map(lambda _: request_once(url, scenario['options']), range(concurrency)))
+
+                started = time.perf_counter()
+                outcomes = list(executor.map(lambda _: request_once(url, scenario['options']), range(iterations)))
+                latencies = [elapsed for ok, elapsed in outcomes if ok]
+                results[name] = summarize(latencies, len(outcomes) - len(latencies), time.perf_counter() - started)
+                _print_stats('api', name, results[name])
+    finally:
+        runtime.close()
+    return results
+
+
+def _print_stats(mode: str, name: str, stats: Dict[str, Any]):
+    if 'p50' not in stats:
+        print(f"  [{mode}] {name:<8} 全部失败（{stats['errors']} 次）")
+        return
+    print(f"  [{mode}] {name:<8} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s "
+          f"吞吐量={stats['throughput']:.2f}/s 错误={stats['errors']}")
+
+
+def compare(results: Dict[str, Dict[str, Dict[str, Any]]], baseline: Dict[str, Any],
+            tolerance: Optional[float] = None) -> List[str]:
+    """
+    与基线对比
+
+    Args:
+        results: 本次结果 {模式: {场景: 统计}}
+        baseline: 基线文件内容
+        tolerance: 允许的变化比例，为空时使用基线中保存的阈值
+
+    Returns:
+        回归说明列表，为空表示没有回归
+    """
+    if tolerance is None:
+        tolerance = baseline.get('thresholds', {}).get('tolerance', DEFAULT_TOLERANCE)
+
+    regressions = []
+    for mode, scenarios in results.items():
+        for name, stats in scenarios.items():
+            base = baseline.get('results', {}).get(mode, {}).get(name)
+            if not base:
+                continue
+            if stats['errors'] > base.get('errors', 0):
+                regressions.append(f"[{mode}] {name}: 错误数 {base.get('errors', 0)} -> {stats['errors']}")
+            if 'p95' in stats and 'p95' in base and stats['p95'] > base['p95'] * (1 + tolerance):
+                regressions.append(f"[{mode}] {name}: p95 {base['p95']:.3f}s -> {stats['p95']:.3f}s")
+            if stats['throughput'] < base['throughput'] * (1 - tolerance):
+                regressions.append(f"[{mode}] {name}: 吞吐量 {base['throughput']:.2f}/s -> {stats['throughput']:.2f}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSnap 离线基准测试')
+    parser.add_argument('--mode', choices=['service', 'api', 'both'], default='both', help='测试模式')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='场景列表，逗号分隔')
+    parser.add_argument('--iterations', type=int, default=10, help='每个场景的截图次数')
+    parser.add_argument('--concurrency', type=int, default=2, help='api 模式的并发数（同时也是浏览器池大小）')
+    parser.add_argument('--output', help='把结果保存为JSON文件')
+    parser.add_argument('--save-baseline', help='把结果保存为基线文件')
+    parser.add_argument('--baseline', help='与基线文件对比，有回归时以状态码1退出')
+    parser.add_argument('--tolerance', type=float, help=f'允许的变化比例，默认取基线中的值或 {DEFAULT_TOLERANCE}')
+    parser.add_argument('--serve', action='store_true', help='只启动夹具服务器，便于手动查看页面')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}，可用: {', '.join(SCENARIOS)}")
+
+    # 在导入应用之前设置，避免缓存命中和日志输出干扰测量
+    os.environ.update(
+        CACHE_ENABLED='false',
+        LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'),
+        BROWSER_POOL_SIZE=str(args.concurrency),
+        ENABLED_RENDER_PROFILES='default'
+    )
+    sys.path.insert(0, ROOT)
+
+    fixture = FixtureServer().start()
+    print("=" * 60)
+    print("WebSnap 离线基准测试")
+    print(f"夹具服务器: {fixture.base_url}")
+    print("=" * 60)
+
+    if args.serve:
+        print("按 Ctrl+C 退出")
+        try:
+            fixture.thread.join()
+        except KeyboardInterrupt:
+            pass
+        fixture.close()
+        return
+
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    try:
+        if args.mode in ('service', 'both'):
+            print("\nScreenshotService:")
+            results['service'] = run_service_benchmark(fixture.base_url, scenarios, args.iterations)
+        if args.mode in ('api', 'both'):
+            print(f"\nHTTP API（并发 {args.concurrency}）:")
+            results['api'] = run_api_benchmark(fixture.base_url, scenarios, args.iterations, args.concurrency)
+    finally:
+        fixture.close()
+
+    report = {
+        'settings': {
+            'mode': args.mode,
+            'scenarios': scenarios,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': int(time.time())
+        },
+        'thresholds': {'tolerance': args.tolerance if args.tolerance is not None else DEFAULT_TOLERANCE},
+        'results': results
+    }
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print("\n与基线对比:")
+        if regressions:
+            for regression in regressions:
+                print(f"  ❌ {regression}")
+            sys.exit(1)
+        print("  ✅ 没有超出阈值的回归")
+
+
+if __name__ == '__main__':
+    main()
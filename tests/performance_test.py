@@ -2,15 +2,22 @@
 # -*- coding: utf-8 -*-
 """
 WebSnap 性能测试脚本
+
+open-loop 测试类型按固定到达速率（可带爬坡和分阶段计划）持续发送请求，
+记录HDR风格的延迟直方图和按类型分类的错误，用于寻找部署的真实饱和点:
+    python tests/performance_test.py --test-type open-loop --rate 5 --duration 60 --ramp-up 10 --output run.json
+    python tests/performance_test.py --test-type open-loop --stages 2:30,4:30,8:30 --compare run.json
 """
 
 import requests
 import time
+import math
 import statistics
+import threading
 import concurrent.futures
 import json
 import base64
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import argparse
 import sys
 
@@ -164,6 +171,92 @@ class PerformanceTester:
         
         return results
     
+    def test_open_loop(self, params: Dict[str, Any], stages: List[Tuple[float, float, float]],
+                       max_in_flight: int = 256, timeout: float = 60) -> Dict[str, Any]:
+        """
+        开环压测：按计划的到达时间发出请求，不等待前一个请求完成
+        
+        延迟从计划发出的时间算起，客户端来不及发出时的排队时间也计入延迟，
+        避免闭环测试中服务变慢、请求随之变少而掩盖排队（coordinated omission）。
+        
+        Args:
+            params: 请求参数
+            stages: 速率计划，[(起始速率, 结束速率, 持续秒数), ...]，速率单位为请求/秒，阶段内线性变化
+            max_in_flight: 同时进行的最大请求数（客户端线程数），超出的请求在客户端排队
+            timeout: 单个请求的超时时间（秒）
+            
+        Returns:
+            包含延迟直方图、错误分类和逐秒时间线的结果
+        """
+        schedule = build_schedule(stages)
+        total_seconds = sum(stage[2] for stage in stages)
+        print(f"开环压测: {len(schedule)} 个请求，{total_seconds:.0f} 秒，最大并发 {max_in_flight}")
+        
+        latency = LatencyHistogram()
+        service_time = LatencyHistogram()
+        errors: Dict[str, int] = {}
+        timeline: Dict[int, Dict[str, int]] = {}
+        lock = threading.Lock()
+        local = threading.local()
+        
+        def send(intended: float):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            started = time.perf_counter()
+            error = None
+            try:
+                response = session.post(f"{self.base_url}/screenshot", json=params, timeout=timeout,
+                                        headers={'Accept': 'image/png'})
+                if response.status_code != 200:
+                    error = f"http_{response.status_code}"
+                elif not response.headers.get('Content-Type', '').startswith('image/'):
+                    error = 'invalid_response'
+            except requests.exceptions.Timeout:
+                error = 'timeout'
+            except requests.exceptions.ConnectionError:
+                error = 'connection_error'
+            except Exception as e:
+                error = type(e).__name__
+            finished = time.perf_counter()
+            
+            second = int(intended - origin)
+            with lock:
+                bucket = timeline.setdefault(second, {'sent': 0, 'ok': 0, 'errors': 0})
+                bucket['sent'] += 1
+                if error is None:
+                    bucket['ok'] += 1
+                    latency.record(finished - intended)
+                    service_time.record(finished - started)
+                else:
+                    bucket['errors'] += 1
+                    errors[error] = errors.get(error, 0) + 1
+        
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='open-loop')
+        origin = time.perf_counter()
+        for offset in schedule:
+            intended = origin + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, intended)
+        executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - origin
+        
+        completed = latency.count
+        return {
+            'requests': len(schedule),
+            'completed': completed,
+            'errors': errors,
+            'error_rate': (len(schedule) - completed) / len(schedule) if schedule else 0.0,
+            'target_rate': len(schedule) / total_seconds if total_seconds else 0.0,
+            'throughput': completed / elapsed if elapsed else 0.0,
+            'duration': elapsed,
+            'latency': latency.summary(),
+            'service_time': service_time.summary(),
+            'timeline': [dict(second=second, **timeline[second]) for second in sorted(timeline)]
+        }
+    
     def analyze_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """分析测试结果"""
         if not results:
@@ -246,14 +339,207 @@ class PerformanceTester:
                 print(f"  {error}: {count} 次")
 
 
+class LatencyHistogram:
+    """
+    HDR 风格的延迟直方图
+    
+    以微秒为单位按对数-线性分桶：每个2的幂区间再细分为128个子桶，
+    相对误差小于1%，内存占用与样本数无关。
+    """
+    
+    SUB_BUCKET_BITS = 8
+    
+    def __init__(self):
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+    
+    def _key(self, micros: int) -> Tuple[int, int]:
+        exponent = max(0, micros.bit_length() - self.SUB_BUCKET_BITS)
+        return exponent, micros >> exponent
+    
+    @staticmethod
+    def _value(key: Tuple[int, int]) -> float:
+        """子桶的代表值（区间中点，秒）"""
+        exponent, sub_bucket = key
+        low = sub_bucket << exponent
+        high = (sub_bucket + 1) << exponent
+        return (low + high - 1) / 2 / 1e6
+    
+    def record(self, seconds: float):
+        key = self._key(max(0, int(seconds * 1e6)))
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+    
+    def percentile(self, p: float) -> float:
+        """p 取 0-100"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                return min(self._value(key), self.max)
+        return self.max
+    
+    def summary(self) -> Dict[str, Any]:
+        """分位数（秒），包含可用于重建直方图的分桶计数"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'min': self.min,
+            'mean': self.total / self.count,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p99.9': self.percentile(99.9),
+            'max': self.max,
+            'buckets': [[exponent, sub_bucket, count]
+                        for (exponent, sub_bucket), count in sorted(self.counts.items())]
+        }
+
+
+def build_schedule(stages: List[Tuple[float, float, float]]) -> List[float]:
+    """
+    按速率计划生成每个请求的发出时间（相对开始的秒数）
+    
+    阶段内速率从起始速率线性变化到结束速率，累计请求数每增加1就安排一个请求。
+    """
+    schedule = []
+    offset = 0.0
+    accumulated = 0.0
+    step = 0.001
+    for start_rate, end_rate, seconds in stages:
+        elapsed = 0.0
+        while elapsed < seconds:
+            rate = start_rate + (end_rate - start_rate) * elapsed / seconds
+            accumulated += rate * step
+            while accumulated >= 1:
+                accumulated -= 1
+                schedule.append(offset + elapsed)
+            elapsed += step
+        offset += seconds
+    return schedule
+
+
+def parse_stages(rate: float, duration: float, ramp_up: float, stages: Optional[str]) -> List[Tuple[float, float, float]]:
+    """
+    解析速率计划
+    
+    --stages 形如 "5:30,10:30,20:60"（速率:秒数），相邻阶段之间线性过渡 ramp_up 秒；
+    否则为先用 ramp_up 秒从0升到 rate，再以 rate 持续 duration 秒。
+    """
+    if not stages:
+        plan = [(0.0, rate, ramp_up)] if ramp_up > 0 else []
+        return plan + [(rate, rate, duration)]
+    
+    plan = []
+    previous = 0.0
+    for item in stages.split(','):
+        stage_rate, stage_seconds = (float(part) for part in item.split(':'))
+        if ramp_up > 0:
+            plan.append((previous, stage_rate, ramp_up))
+        plan.append((stage_rate, stage_rate, stage_seconds))
+        previous = stage_rate
+    return plan
+
+
+def compare_runs(current: Dict[str, Any], previous: Dict[str, Any]):
+    """打印本次开环压测与保存的结果之间的差异"""
+    def change(new: float, old: float) -> str:
+        if not old:
+            return ''
+        return f"（{(new - old) / old * 100:+.1f}%）"
+    
+    print("\n与保存的结果对比:")
+    print(f"  {'指标':<12}{'之前':>12}{'本次':>12}")
+    for name in ['p50', 'p90', 'p99', 'p99.9', 'max']:
+        old = previous['latency'].get(name)
+        new = current['latency'].get(name)
+        if old is None or new is None:
+            continue
+        print(f"  {name:<12}{old:>11.3f}s{new:>11.3f}s {change(new, old)}")
+    print(f"  {'吞吐量':<12}{previous['throughput']:>10.2f}/s{current['throughput']:>10.2f}/s "
+          f"{change(current['throughput'], previous['throughput'])}")
+    print(f"  {'错误率':<12}{previous['error_rate'] * 100:>11.2f}%{current['error_rate'] * 100:>11.2f}%")
+
+
+def print_open_loop_summary(result: Dict[str, Any]):
+    """打印开环压测摘要"""
+    print("\n" + "="*60)
+    print("开环压测摘要")
+    print("="*60)
+    print(f"计划请求数: {result['requests']}（目标速率 {result['target_rate']:.2f}/s）")
+    print(f"成功请求数: {result['completed']}（吞吐量 {result['throughput']:.2f}/s）")
+    print(f"错误率: {result['error_rate'] * 100:.2f}%")
+    
+    for title, key in [('延迟（从计划发出时间算起）', 'latency'), ('服务时间（从实际发出时间算起）', 'service_time')]:
+        stats = result[key]
+        if not stats['count']:
+            continue
+        print(f"\n{title}:")
+        for name in ['p50', 'p90', 'p99', 'p99.9', 'max']:
+            print(f"  {name:<6} {stats[name]:.3f}s")
+    
+    if result['errors']:
+        print("\n错误统计:")
+        for error, count in sorted(result['errors'].items(), key=lambda item: -item[1]):
+            print(f"  {error}: {count} 次")
+
+
+def run_open_loop(tester: PerformanceTester, args):
+    """执行开环压测，保存结果并与之前的结果对比"""
+    params = {
+        'url': args.test_url,
+        'wait_time': 3,
+        'full_page': True,
+        'cache': 'bypass'
+    }
+    stages = parse_stages(args.rate, args.duration, args.ramp_up, args.stages)
+    result = tester.test_open_loop(params, stages, args.max_in_flight)
+    print_open_loop_summary(result)
+    
+    result_file = args.output or f"open_loop_results_{int(time.time())}.json"
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'test_info': {
+                'service_url': args.url,
+                'test_url': args.test_url,
+                'stages': stages,
+                'max_in_flight': args.max_in_flight,
+                'timestamp': int(time.time())
+            },
+            'open_loop': result
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\n测试结果已保存到: {result_file}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare_runs(result, json.load(f)['open_loop'])
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='网页截图服务性能测试')
     parser.add_argument('--url', default='http://localhost:9000', help='服务URL')
     parser.add_argument('--test-url', default='https://platform.kangfx.com', help='测试目标URL')
     parser.add_argument('--concurrent', type=int, default=5, help='并发请求数')
-    parser.add_argument('--test-type', choices=['concurrent', 'websites', 'viewport', 'wait-time', 'all'], 
-                       default='all', help='测试类型')
+    parser.add_argument('--test-type', choices=['concurrent', 'websites', 'viewport', 'wait-time', 'open-loop', 'all'], 
+                       default='all', help='测试类型（open-loop 不包含在 all 中）')
+    parser.add_argument('--rate', type=float, default=2, help='open-loop: 目标速率（请求/秒）')
+    parser.add_argument('--duration', type=float, default=60, help='open-loop: 以目标速率持续的秒数')
+    parser.add_argument('--ramp-up', type=float, default=0, help='open-loop: 爬坡秒数，速率从0（或上一阶段）线性升到目标')
+    parser.add_argument('--stages', help='open-loop: 分阶段计划，如 2:30,4:30,8:30（速率:秒数），指定时忽略 --rate 和 --duration')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='open-loop: 客户端最大并发请求数')
+    parser.add_argument('--output', help='open-loop: 结果JSON文件，默认按时间戳命名')
+    parser.add_argument('--compare', help='open-loop: 与之前保存的结果JSON对比')
     
     args = parser.parse_args()
     
@@ -279,6 +565,10 @@ def main():
     tester = PerformanceTester(args.url)
     all_results = []
     
+    if args.test_type == 'open-loop':
+        run_open_loop(tester, args)
+        return
+    
     # 基本参数
     base_params = {
         'url': args.test_url,
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSnap 启动时间基准测试
+
+每一轮在新的子进程中测量：
+- 导入应用模块的耗时（不应启动浏览器）
+- create_app 的耗时（不应启动浏览器）
+- 从 start() 到就绪（浏览器池并行启动并完成预热）的耗时
+- 就绪后第一次截图的耗时
+
+用法:
+    python tests/startup_benchmark.py --rounds 5 --pool-size 2
+    python tests/startup_benchmark.py --no-warmup --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS = ['import_seconds', 'create_app_seconds', 'ready_seconds', 'first_capture_seconds']
+
+
+def run_child() -> Dict[str, Any]:
+    """在当前进程中测量一轮启动，结果以JSON打印到标准输出的最后一行"""
+    sys.path.insert(0, ROOT)
+
+    started = time.perf_counter()
+    from app.app import create_app
+    from app.core.runtime import WARMUP_FIXTURE
+    imported = time.perf_counter()
+
+    app = create_app('production')
+    created = time.perf_counter()
+
+    runtime = app.extensions['websnap']
+    runtime.start(wait=True)
+    ready = time.perf_counter()
+    if not runtime.ready:
+        runtime.close()
+        return {'error': runtime.error}
+
+    screenshot = runtime.capture(WARMUP_FIXTURE.as_uri(), {'wait_time': 5, 'full_page': False}, 'bypass')
+    captured = time.perf_counter()
+    runtime.close()
+
+    return {
+        'import_seconds': imported - started,
+        'create_app_seconds': created - imported,
+        'ready_seconds': ready - created,
+        'first_capture_seconds': captured - ready,
+        'screenshot_size': len(screenshot) if screenshot else 0
+    }
+
+
+def run_round(env: Dict[str, str]) -> Dict[str, Any]:
+    """启动子进程执行一轮测量"""
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'],
+        env=env, cwd=ROOT, capture_output=True, text=True, timeout=600
+    )
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else '子进程异常退出'}
+    return json.loads(lines[-1])
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """统计各项耗时的中位数、最小值和最大值"""
+    succeeded = [result for result in results if 'error' not in result]
+    summary: Dict[str, Any] = {
+        'rounds': len(results),
+        'succeeded': len(succeeded),
+        'errors': [result['error'] for result in results if 'error' in result]
+    }
+    for metric in METRICS:
+        values = [result[metric] for result in succeeded]
+        if values:
+            summary[metric] = {
+                'median': statistics.median(values),
+                'min': min(values),
+                'max': max(values)
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSnap 启动时间基准测试')
+    parser.add_argument('--rounds', type=int, default=3, help='测量轮数')
+    parser.add_argument('--pool-size', type=int, help='浏览器池大小（BROWSER_POOL_SIZE）')
+    parser.add_argument('--mode', choices=['thread', 'process'], help='渲染模式（RENDER_MODE）')
+    parser.add_argument('--profiles', help='启用的渲染配置档（ENABLED_RENDER_PROFILES），如 default,fast')
+    parser.add_argument('--no-warmup', action='store_true', help='关闭启动预热，对比首次截图耗时')
+    parser.add_argument('--output', help='把结果保存为JSON文件')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child()))
+        return
+
+    env = dict(os.environ, CACHE_ENABLED='false', LOG_LEVEL='WARNING')
+    if args.pool_size:
+        env['BROWSER_POOL_SIZE'] = str(args.pool_size)
+    if args.mode:
+        env['RENDER_MODE'] = args.mode
+    if args.profiles:
+        env['ENABLED_RENDER_PROFILES'] = args.profiles
+    if args.no_warmup:
+        env['WARMUP_ENABLED'] = 'false'
+
+    print("=" * 50)
+    print("WebSnap 启动时间基准测试")
+    print("=" * 50)
+
+    results = []
+    for index in range(1, args.rounds + 1):
+        result = run_round(env)
+        results.append(result)
+        if 'error' in result:
+            print(f"第 {index} 轮失败: {result['error']}")
+        else:
+            print(f"第 {index} 轮: " + ', '.join(f"{metric}={result[metric]:.3f}s" for metric in METRICS))
+
+    summary = summarize(results)
+    print("\n中位数:")
+    for metric in METRICS:
+        if metric in summary:
+            print(f"  {metric:<22} {summary[metric]['median']:.3f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results, 'summary': summary}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图请求参数校验测试
+
+参数错误在截图之前返回400，不需要启动浏览器。
+"""
+
+import pytest
+
+from app.app import create_app
+
+
+@pytest.fixture(scope='module')
+def client():
+    app = create_app('testing')
+    yield app.test_client()
+    app.extensions['websnap'].close()
+
+
+def assert_bad_request(client, body, message):
+    """两个截图接口都返回400，错误信息包含 message"""
+    for path in ('/screenshot', '/api/v1/screenshot/screenshot'):
+        response = client.post(path, json={'url': 'https://example.com', **body})
+        assert response.status_code == 400, (path, body)
+        data = response.get_json()
+        assert data['success'] is False
+        assert message in data['error']
+
+
+@pytest.mark.parametrize('wait_time, message', [
+    ('5', '等待时间必须是数字'),
+    (None, '等待时间必须是数字'),
+    (True, '等待时间必须是数字'),
+    (-1, '等待时间不能为负数'),
+    (1e9, '等待时间不能超过'),
+])
+def test_invalid_wait_time(client, wait_time, message):
+    assert_bad_request(client, {'wait_time': wait_time}, message)
+
+
+@pytest.mark.parametrize('name', ['network_idle_ms', 'dom_quiet_ms'])
+@pytest.mark.parametrize('value', [-1, 1.5, '500', True, 10001])
+def test_invalid_readiness_durations(client, name, value):
+    assert_bad_request(client, {name: value}, name)
+
+
+@pytest.mark.parametrize('concurrency', [True, 0, -1, 1.5, '2', None])
+def test_invalid_batch_concurrency(client, concurrency):
+    response = client.post('/api/v1/screenshot/batch', json={
+        'items': [{'url': 'https://example.com'}],
+        'concurrency': concurrency
+    })
+    assert response.status_code == 400
+    assert 'concurrency' in response.get_json()['error']
+
+
+
+def test_selector_without_match_raises(monkeypatch):
+    """selector 没有匹配到元素时抛出 ElementNotFound，而不是返回None"""
+    from app.core.screenshot_service import ElementNotFound, ScreenshotService
+
+    class FakeDriver:
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: object()
+
+    monkeypatch.setattr(ScreenshotService, 'setup_driver', lambda self: setattr(self, 'driver', FakeDriver()))
+    monkeypatch.setattr(ScreenshotService, '_element_region', lambda self, selector: None)
+    service = ScreenshotService()
+    with pytest.raises(ElementNotFound):
+        service.take_screenshot('https://example.com', wait_strategy='fixed', wait_time=0, selector='#missing')
+
+
+def test_selector_without_match_returns_404(client, monkeypatch):
+    from app.core.runtime import ScreenshotRuntime
+    from app.core.screenshot_service import ElementNotFound
+
+    def capture(self, url, options, cache_mode='default', timer=None):
+        raise ElementNotFound(f"选择器 {options['selector']} 没有匹配到可截图的元素（不存在或尺寸为0）")
+
+    monkeypatch.setattr(ScreenshotRuntime, 'capture', capture)
+    for path in ('/screenshot', '/api/v1/screenshot/screenshot'):
+        response = client.post(path, json={'url': 'https://example.com', 'selector': '#missing'})
+        assert response.status_code == 404
+        assert '#missing' in response.get_json()['error']